@@ -0,0 +1,62 @@
+"""add report jobs
+
+Revision ID: 02e60411abb4
+Revises: selfxcdddasd
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "02e60411abb4"
+down_revision = "selfxcdddasd"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column("fmt", sa.String(length=8), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("start_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("end_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("scope_user_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum(
+                "queued",
+                "running",
+                "done",
+                "failed",
+                "cancelled",
+                name="report_job_status",
+            ),
+            nullable=False,
+        ),
+        sa.Column("rows_done", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("progress_message_id", sa.BigInteger(), nullable=True),
+        sa.Column("file_path", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_report_jobs_user_id", "report_jobs", ["user_id"])
+    op.create_index("ix_report_jobs_status", "report_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_report_jobs_status", table_name="report_jobs")
+    op.drop_index("ix_report_jobs_user_id", table_name="report_jobs")
+    op.drop_table("report_jobs")
+    sa.Enum(name="report_job_status").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,41 @@
+"""operation dedupe keys and processed updates
+
+Revision ID: 3b8d2f1c9a47
+Revises: 607009b161e9
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "3b8d2f1c9a47"
+down_revision = "607009b161e9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "operations", sa.Column("dedupe_key", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        "ux_operations_dedupe_key", "operations", ["dedupe_key"], unique=True
+    )
+
+    op.create_table(
+        "processed_updates",
+        sa.Column("update_id", sa.BigInteger(), primary_key=True),
+        sa.Column(
+            "processed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("processed_updates")
+    op.drop_index("ux_operations_dedupe_key", table_name="operations")
+    op.drop_column("operations", "dedupe_key")
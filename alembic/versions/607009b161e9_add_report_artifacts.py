@@ -0,0 +1,45 @@
+"""add report artifacts (telegram file_id cache)
+
+Revision ID: 607009b161e9
+Revises: 02e60411abb4
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "607009b161e9"
+down_revision = "02e60411abb4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "report_artifacts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("fmt", sa.String(length=8), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("start_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("end_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("scope_user_id", sa.Integer(), nullable=True),
+        sa.Column("file_id", sa.String(length=256), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_report_artifacts_lookup",
+        "report_artifacts",
+        ["fmt", "kind", "start_at", "end_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_report_artifacts_lookup", table_name="report_artifacts")
+    op.drop_table("report_artifacts")
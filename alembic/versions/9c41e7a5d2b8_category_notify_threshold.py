@@ -0,0 +1,25 @@
+"""category notify threshold
+
+Revision ID: 9c41e7a5d2b8
+Revises: 3b8d2f1c9a47
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "9c41e7a5d2b8"
+down_revision = "3b8d2f1c9a47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "categories", sa.Column("notify_threshold", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("categories", "notify_threshold")
@@ -0,0 +1,22 @@
+"""index operations.created_at
+
+Revision ID: a7f3c19e2b60
+Revises: d5e2a8c4f613
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "a7f3c19e2b60"
+down_revision = "d5e2a8c4f613"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_operations_created_at", "operations", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_operations_created_at", table_name="operations")
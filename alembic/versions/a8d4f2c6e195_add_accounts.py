@@ -0,0 +1,102 @@
+"""add accounts and transfers
+
+Revision ID: a8d4f2c6e195
+Revises: c3e7a1b5d924
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a8d4f2c6e195"
+down_revision = "c3e7a1b5d924"
+branch_labels = None
+depends_on = None
+
+
+DEFAULT_ACCOUNT = "Касса"
+
+
+def upgrade() -> None:
+    # ADD VALUE нельзя использовать в той же транзакции, где он добавлен
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE operation_type ADD VALUE IF NOT EXISTS 'transfer'")
+
+    op.create_table(
+        "accounts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=64), nullable=False, unique=True),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default="true"),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_table(
+        "account_balances",
+        sa.Column(
+            "account_id",
+            sa.Integer(),
+            sa.ForeignKey("accounts.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("balance", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(f"INSERT INTO accounts (name) VALUES ('{DEFAULT_ACCOUNT}')")
+
+    op.add_column(
+        "operations",
+        sa.Column(
+            "account_id", sa.Integer(), sa.ForeignKey("accounts.id"), nullable=True
+        ),
+    )
+    op.add_column(
+        "operations",
+        sa.Column(
+            "to_account_id", sa.Integer(), sa.ForeignKey("accounts.id"), nullable=True
+        ),
+    )
+    # вся прежняя история — в кассе (триггер закрытых периодов смену счёта
+    # пропускает: сумма, тип и дата не меняются)
+    op.execute(
+        "UPDATE operations SET account_id = "
+        f"(SELECT id FROM accounts WHERE name = '{DEFAULT_ACCOUNT}')"
+    )
+    op.alter_column("operations", "account_id", nullable=False)
+
+    # остаток кассы = доходы - расходы, включая архивные месяцы
+    op.execute(
+        f"""
+        INSERT INTO account_balances (account_id, balance)
+        SELECT a.id,
+            COALESCE((SELECT sum(CASE op_type WHEN 'income' THEN amount
+                                              WHEN 'expense' THEN -amount
+                                              ELSE 0 END)
+                      FROM operations), 0)
+            + COALESCE((SELECT sum(income - expense) FROM archived_periods), 0)
+        FROM accounts a WHERE a.name = '{DEFAULT_ACCOUNT}'
+        """
+    )
+
+    op.add_column(
+        "users",
+        sa.Column(
+            "default_account_id",
+            sa.Integer(),
+            sa.ForeignKey("accounts.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    # значение 'transfer' в enum остаётся: Postgres не умеет удалять значения
+    op.execute("DELETE FROM operations WHERE op_type = 'transfer'")
+    op.drop_column("users", "default_account_id")
+    op.drop_column("operations", "to_account_id")
+    op.drop_column("operations", "account_id")
+    op.drop_table("account_balances")
+    op.drop_table("accounts")
@@ -0,0 +1,159 @@
+"""partition operations by month
+
+Revision ID: b4c8e0d7a915
+Revises: a7f3c19e2b60
+Create Date: 2026-10-19
+
+`operations` becomes a table range-partitioned by `created_at` month.
+The primary key becomes (id, created_at): a partitioned table's unique
+constraints must include the partition key. For the same reason the dedupe
+key moves to the `operation_dedupe` side table. Partitions are created by
+`ensure_operation_partitions(from, to)` — at migration time for existing
+data, then by the bot's maintenance job a few months ahead.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "b4c8e0d7a915"
+down_revision = "a7f3c19e2b60"
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    "id, op_type, amount, comment, category_id, counterparty_id, "
+    "created_by_id, created_at"
+)
+
+ENSURE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION ensure_operation_partitions(
+    from_ts timestamptz, to_ts timestamptz
+) RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    m date := date_trunc('month', from_ts AT TIME ZONE 'UTC')::date;
+    last_m date := date_trunc('month', to_ts AT TIME ZONE 'UTC')::date;
+    part text;
+    created integer := 0;
+BEGIN
+    WHILE m <= last_m LOOP
+        part := 'operations_' || to_char(m, 'YYYY_MM');
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF operations '
+                'FOR VALUES FROM (%L) TO (%L)',
+                part,
+                m::timestamp AT TIME ZONE 'UTC',
+                (m + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        m := (m + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "operation_dedupe",
+        sa.Column("dedupe_key", sa.String(length=64), primary_key=True),
+        sa.Column("operation_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.execute(
+        "INSERT INTO operation_dedupe (dedupe_key, operation_id, created_at) "
+        "SELECT dedupe_key, id, created_at FROM operations "
+        "WHERE dedupe_key IS NOT NULL"
+    )
+
+    op.execute("ALTER TABLE operations RENAME TO operations_legacy")
+    op.execute(
+        "ALTER TABLE operations_legacy "
+        "RENAME CONSTRAINT operations_pkey TO operations_legacy_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_operations_created_at "
+        "RENAME TO ix_operations_legacy_created_at"
+    )
+    op.execute("ALTER SEQUENCE operations_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE operations (
+            id integer NOT NULL DEFAULT nextval('operations_id_seq'),
+            op_type operation_type NOT NULL,
+            amount integer NOT NULL,
+            comment text,
+            category_id integer
+                REFERENCES categories (id) ON DELETE SET NULL,
+            counterparty_id integer
+                CONSTRAINT fk_operations_counterparty_id
+                REFERENCES counterparties (id) ON DELETE SET NULL,
+            created_by_id integer NOT NULL
+                REFERENCES users (id) ON DELETE CASCADE,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute(ENSURE_PARTITIONS)
+    op.execute(
+        "SELECT ensure_operation_partitions("
+        "coalesce((SELECT min(created_at) FROM operations_legacy), now()), "
+        "now() + interval '3 months')"
+    )
+    op.execute(
+        f"INSERT INTO operations ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM operations_legacy"
+    )
+    op.execute("DROP TABLE operations_legacy")
+    op.execute("ALTER SEQUENCE operations_id_seq OWNED BY operations.id")
+    op.create_index("ix_operations_created_at", "operations", ["created_at"])
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE operations RENAME TO operations_partitioned")
+    op.execute(
+        "ALTER INDEX ix_operations_created_at "
+        "RENAME TO ix_operations_partitioned_created_at"
+    )
+    op.execute("ALTER SEQUENCE operations_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE operations (
+            id integer NOT NULL DEFAULT nextval('operations_id_seq'),
+            op_type operation_type NOT NULL,
+            amount integer NOT NULL,
+            comment text,
+            category_id integer
+                REFERENCES categories (id) ON DELETE SET NULL,
+            created_by_id integer NOT NULL
+                REFERENCES users (id) ON DELETE CASCADE,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            counterparty_id integer
+                CONSTRAINT fk_operations_counterparty_id
+                REFERENCES counterparties (id) ON DELETE SET NULL,
+            dedupe_key varchar(64),
+            CONSTRAINT operations_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        f"INSERT INTO operations ({COLUMNS}, dedupe_key) "
+        f"SELECT {', '.join('p.' + c.strip() for c in COLUMNS.split(','))}, "
+        "d.dedupe_key FROM operations_partitioned p "
+        "LEFT JOIN operation_dedupe d "
+        "ON d.operation_id = p.id AND d.created_at = p.created_at"
+    )
+    op.execute("DROP TABLE operations_partitioned")
+    op.execute("DROP FUNCTION ensure_operation_partitions(timestamptz, timestamptz)")
+    op.execute("ALTER SEQUENCE operations_id_seq OWNED BY operations.id")
+    op.create_index("ix_operations_created_at", "operations", ["created_at"])
+    op.create_index(
+        "ux_operations_dedupe_key", "operations", ["dedupe_key"], unique=True
+    )
+    op.drop_table("operation_dedupe")
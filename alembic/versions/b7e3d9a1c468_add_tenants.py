@@ -0,0 +1,197 @@
+"""add tenants
+
+Revision ID: b7e3d9a1c468
+Revises: a8d4f2c6e195
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "b7e3d9a1c468"
+down_revision = "a8d4f2c6e195"
+branch_labels = None
+depends_on = None
+
+
+DEFAULT_TENANT = "Гараж"
+
+# Таблицы с собственным tenant_id; budgets, account_balances и
+# digest_subscriptions принадлежат гаражу через категорию/счёт/пользователя
+TENANT_TABLES = (
+    "users",
+    "accounts",
+    "categories",
+    "counterparties",
+    "operations",
+    "monthly_expenses",
+    "report_jobs",
+    "report_artifacts",
+    "archived_periods",
+    "period_snapshots",
+)
+
+# Закрытые периоды теперь у каждого гаража свои
+GUARD_CLOSED_PERIODS = """
+CREATE OR REPLACE FUNCTION guard_closed_periods() RETURNS trigger AS $$
+DECLARE
+    closed timestamptz;
+    tenant integer;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        tenant := OLD.tenant_id;
+    ELSE
+        tenant := NEW.tenant_id;
+    END IF;
+    SELECT max(period_end) INTO closed FROM period_snapshots
+        WHERE tenant_id = tenant;
+    IF closed IS NULL THEN
+        RETURN COALESCE(NEW, OLD);
+    END IF;
+    IF TG_OP = 'UPDATE'
+        AND NEW.op_type = OLD.op_type
+        AND NEW.amount = OLD.amount
+        AND NEW.created_at = OLD.created_at THEN
+        RETURN NEW;
+    END IF;
+    IF (TG_OP <> 'INSERT' AND OLD.created_at < closed)
+        OR (TG_OP <> 'DELETE' AND NEW.created_at < closed) THEN
+        RAISE EXCEPTION 'period closed until %', closed
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+GUARD_CLOSED_PERIODS_GLOBAL = """
+CREATE OR REPLACE FUNCTION guard_closed_periods() RETURNS trigger AS $$
+DECLARE
+    closed timestamptz;
+BEGIN
+    SELECT max(period_end) INTO closed FROM period_snapshots;
+    IF closed IS NULL THEN
+        RETURN COALESCE(NEW, OLD);
+    END IF;
+    IF TG_OP = 'UPDATE'
+        AND NEW.op_type = OLD.op_type
+        AND NEW.amount = OLD.amount
+        AND NEW.created_at = OLD.created_at THEN
+        RETURN NEW;
+    END IF;
+    IF (TG_OP <> 'INSERT' AND OLD.created_at < closed)
+        OR (TG_OP <> 'DELETE' AND NEW.created_at < closed) THEN
+        RAISE EXCEPTION 'period closed until %', closed
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tenants",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=128), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.execute(f"INSERT INTO tenants (id, name) VALUES (1, '{DEFAULT_TENANT}')")
+    op.execute("SELECT setval('tenants_id_seq', 1)")
+
+    # всё, что уже есть, — первый гараж; DEFAULT + NOT NULL без перезаписи
+    # строк (и без UPDATE операций через триггер закрытых периодов)
+    for table in TENANT_TABLES:
+        op.add_column(
+            table,
+            sa.Column(
+                "tenant_id",
+                sa.Integer(),
+                sa.ForeignKey("tenants.id", ondelete="CASCADE"),
+                nullable=False,
+                server_default="1",
+            ),
+        )
+        op.alter_column(table, "tenant_id", server_default=None)
+
+    # индексы начинаются с tenant_id: запросы гаража читают только его строки
+    op.drop_index("ix_operations_created_at", table_name="operations")
+    op.create_index(
+        "ix_operations_tenant_created_at", "operations", ["tenant_id", "created_at"]
+    )
+    op.create_index("ix_users_tenant_id", "users", ["tenant_id"])
+    op.create_index(
+        "ix_categories_tenant_kind_name",
+        "categories",
+        ["tenant_id", "kind", "name"],
+    )
+    op.drop_index("ix_counterparties_name", table_name="counterparties")
+    op.create_index(
+        "ix_counterparties_tenant_name", "counterparties", ["tenant_id", "name"]
+    )
+    op.create_index(
+        "ix_monthly_expenses_tenant_day",
+        "monthly_expenses",
+        ["tenant_id", "day_of_month"],
+    )
+    op.drop_index("ix_report_artifacts_lookup", table_name="report_artifacts")
+    op.create_index(
+        "ix_report_artifacts_lookup",
+        "report_artifacts",
+        ["tenant_id", "fmt", "kind", "start_at", "end_at"],
+    )
+
+    # названия счетов и месяцы архива/снимков уникальны внутри гаража
+    op.drop_constraint("accounts_name_key", "accounts", type_="unique")
+    op.create_unique_constraint(
+        "uq_accounts_tenant_name", "accounts", ["tenant_id", "name"]
+    )
+    for table, name in (
+        ("archived_periods", "uq_archived_periods_start"),
+        ("period_snapshots", "uq_period_snapshots_start"),
+    ):
+        op.drop_constraint(name, table, type_="unique")
+        op.create_unique_constraint(name, table, ["tenant_id", "period_start"])
+
+    op.execute(GUARD_CLOSED_PERIODS)
+
+
+def downgrade() -> None:
+    # данные других гаражей в однотенантной схеме не разделить — удаляются
+    # каскадом (закрытые месяцы этих гаражей откатить не даст триггер)
+    op.execute("DELETE FROM tenants WHERE id <> 1")
+    op.execute(GUARD_CLOSED_PERIODS_GLOBAL)
+
+    for table, name in (
+        ("archived_periods", "uq_archived_periods_start"),
+        ("period_snapshots", "uq_period_snapshots_start"),
+    ):
+        op.drop_constraint(name, table, type_="unique")
+        op.create_unique_constraint(name, table, ["period_start"])
+    op.drop_constraint("uq_accounts_tenant_name", "accounts", type_="unique")
+    op.create_unique_constraint("accounts_name_key", "accounts", ["name"])
+
+    op.drop_index("ix_report_artifacts_lookup", table_name="report_artifacts")
+    op.create_index(
+        "ix_report_artifacts_lookup",
+        "report_artifacts",
+        ["fmt", "kind", "start_at", "end_at"],
+    )
+    op.drop_index("ix_monthly_expenses_tenant_day", table_name="monthly_expenses")
+    op.drop_index("ix_counterparties_tenant_name", table_name="counterparties")
+    op.create_index("ix_counterparties_name", "counterparties", ["name"])
+    op.drop_index("ix_categories_tenant_kind_name", table_name="categories")
+    op.drop_index("ix_users_tenant_id", table_name="users")
+    op.drop_index("ix_operations_tenant_created_at", table_name="operations")
+    op.create_index("ix_operations_created_at", "operations", ["created_at"])
+
+    for table in reversed(TENANT_TABLES):
+        op.drop_column(table, "tenant_id")
+    op.drop_table("tenants")
@@ -0,0 +1,36 @@
+"""add budgets
+
+Revision ID: c3e7a1b5d924
+Revises: f2a9c5d1e736
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c3e7a1b5d924"
+down_revision = "f2a9c5d1e736"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "budgets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "category_id",
+            sa.Integer(),
+            sa.ForeignKey("categories.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("limit_amount", sa.Integer(), nullable=False),
+        sa.Column("spent", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("category_id", "month", name="uq_budgets_category_month"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("budgets")
@@ -0,0 +1,23 @@
+"""add operations (tenant_id, id) index
+
+Revision ID: c5f1e8b2d937
+Revises: b7e3d9a1c468
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "c5f1e8b2d937"
+down_revision = "b7e3d9a1c468"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # max(id) гаража — версия данных для кэша выгрузок
+    op.create_index("ix_operations_tenant_id", "operations", ["tenant_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_operations_tenant_id", table_name="operations")
@@ -0,0 +1,36 @@
+"""add digest subscriptions
+
+Revision ID: d5e2a8c4f613
+Revises: 9c41e7a5d2b8
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "d5e2a8c4f613"
+down_revision = "9c41e7a5d2b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "digest_subscriptions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("period", sa.String(length=16), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.UniqueConstraint("user_id", "period", name="uq_digest_user_period"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("digest_subscriptions")
@@ -0,0 +1,41 @@
+"""add archived periods
+
+Revision ID: e1d6b3f8c042
+Revises: b4c8e0d7a915
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e1d6b3f8c042"
+down_revision = "b4c8e0d7a915"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_periods",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("file_path", sa.Text(), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("income", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("expense", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("reserve_in", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("reserve_out", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("period_start", name="uq_archived_periods_start"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("archived_periods")
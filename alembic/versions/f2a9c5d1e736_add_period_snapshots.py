@@ -0,0 +1,82 @@
+"""add period snapshots
+
+Revision ID: f2a9c5d1e736
+Revises: e1d6b3f8c042
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "f2a9c5d1e736"
+down_revision = "e1d6b3f8c042"
+branch_labels = None
+depends_on = None
+
+
+# Закрытые периоды неизменяемы: вставка, удаление и правка суммы/типа/даты
+# операций раньше конца последнего снимка отклоняются (в т.ч. при COPY).
+# Комментарий и категорию править можно — они не входят в снимок.
+GUARD_CLOSED_PERIODS = """
+CREATE OR REPLACE FUNCTION guard_closed_periods() RETURNS trigger AS $$
+DECLARE
+    closed timestamptz;
+BEGIN
+    SELECT max(period_end) INTO closed FROM period_snapshots;
+    IF closed IS NULL THEN
+        RETURN COALESCE(NEW, OLD);
+    END IF;
+    IF TG_OP = 'UPDATE'
+        AND NEW.op_type = OLD.op_type
+        AND NEW.amount = OLD.amount
+        AND NEW.created_at = OLD.created_at THEN
+        RETURN NEW;
+    END IF;
+    IF (TG_OP <> 'INSERT' AND OLD.created_at < closed)
+        OR (TG_OP <> 'DELETE' AND NEW.created_at < closed) THEN
+        RAISE EXCEPTION 'period closed until %', closed
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "period_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("income", sa.BigInteger(), nullable=False),
+        sa.Column("expense", sa.BigInteger(), nullable=False),
+        sa.Column("reserve_in", sa.BigInteger(), nullable=False),
+        sa.Column("reserve_out", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "closed_by_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+        sa.Column(
+            "closed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("period_start", name="uq_period_snapshots_start"),
+    )
+    op.execute(GUARD_CLOSED_PERIODS)
+    op.execute(
+        "CREATE TRIGGER operations_closed_periods "
+        "BEFORE INSERT OR UPDATE OR DELETE ON operations "
+        "FOR EACH ROW EXECUTE FUNCTION guard_closed_periods()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS operations_closed_periods ON operations")
+    op.execute("DROP FUNCTION IF EXISTS guard_closed_periods()")
+    op.drop_table("period_snapshots")
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import create_engine_and_session
+from app.repository import Repo
+from app.settings import Settings
+from app.utils.archive_files import ArchiveWriter
+
+logger = logging.getLogger(__name__)
+
+# Свежие месяцы не архивируем: текстовые отчёты, прогноз и сводки
+# читают только горячую таблицу
+MIN_AGE_MONTHS = 3
+
+
+def _month_start(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def oldest_allowed(today: date) -> date:
+    """First month that is still too fresh to archive."""
+    m = date(today.year, today.month, 1)
+    for _ in range(MIN_AGE_MONTHS):
+        m = (m - timedelta(days=1)).replace(day=1)
+    return m
+
+
+async def archive_month(session: AsyncSession, month: date, archive_dir: str) -> int:
+    """Moves one month partition of `operations` into zstd JSONL files, one
+    per tenant (`<archive_dir>/<tenant_id>/`), and records each tenant's
+    per-type totals. Returns archived row count, -1 if there is no such
+    partition (already archived or never existed).
+
+    Runs in the caller's transaction: the partition is dropped only when
+    the caller commits, after every file is fully written and fsynced.
+    """
+    if not await Repo(session).lock_operation_partition(month):
+        return -1
+
+    rows = 0
+    for tenant_id in await Repo(session).list_tenant_ids():
+        rows += await _archive_tenant_month(
+            Repo(session, tenant_id), month, archive_dir
+        )
+    await Repo(session).drop_operation_partition(month)
+    return rows
+
+
+async def _archive_tenant_month(repo: Repo, month: date, archive_dir: str) -> int:
+    start, end = _month_start(month), _month_start(_next_month(month))
+    tenant_dir = os.path.join(archive_dir, str(repo.tenant_id))
+    os.makedirs(tenant_dir, exist_ok=True)
+    path = os.path.join(tenant_dir, f"operations_{month:%Y_%m}.jsonl.zst")
+    loop = asyncio.get_running_loop()
+
+    writer = await loop.run_in_executor(None, ArchiveWriter, path)
+    try:
+        async for batch in repo.stream_operation_rows(
+            None, start, end - timedelta(microseconds=1)
+        ):
+            await loop.run_in_executor(None, writer.append_rows, batch)
+        await loop.run_in_executor(None, writer.finish)
+    except BaseException:
+        await loop.run_in_executor(None, writer.abort)
+        raise
+
+    sums = await repo.type_sums(start, end)
+    await repo.save_archived_period(
+        period_start=start,
+        period_end=end,
+        file_path=path,
+        rows=writer.rows,
+        income=sums.get("income", 0),
+        expense=sums.get("expense", 0),
+        reserve_in=sums.get("reserve_in", 0),
+        reserve_out=sums.get("reserve_out", 0),
+    )
+    return writer.rows
+
+
+async def _run(args: argparse.Namespace) -> None:
+    settings = Settings()
+    engine, session_maker = create_engine_and_session(settings)
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+
+    limit = oldest_allowed(datetime.now(timezone.utc).date())
+    before = date.fromisoformat(args.before + "-01") if args.before else limit
+    if before > limit:
+        raise SystemExit(f"months from {limit:%Y-%m} on are too fresh to archive")
+
+    try:
+        async with session_maker() as session:
+            firsts = [
+                await Repo(session, tenant_id).first_operation_at()
+                for tenant_id in await Repo(session).list_tenant_ids()
+            ]
+        first = min(filter(None, firsts), default=None)
+        if not first:
+            print("no operations")
+            return
+
+        month = date(first.year, first.month, 1)
+        while month < before:
+            started = time.monotonic()
+            # каждый месяц — своя транзакция: сбой не откатывает готовые
+            async with session_maker() as session:
+                rows = await archive_month(session, month, settings.ARCHIVE_DIR)
+                await session.commit()
+            if rows >= 0:
+                print(
+                    f"{month:%Y-%m}: archived {rows} rows "
+                    f"({time.monotonic() - started:.1f}s)",
+                    flush=True,
+                )
+            month = _next_month(month)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move old months of operations to compressed archive files"
+    )
+    parser.add_argument(
+        "--before",
+        default=None,
+        help=f"archive months before YYYY-MM (default: all older than "
+        f"{MIN_AGE_MONTHS} months)",
+    )
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import UserRole
 from app.repository import Repo
 from app.settings import Settings
+from app.tenancy import DEFAULT_TENANT_ID
 
 logger = logging.getLogger(__name__)
 
@@ -16,13 +17,19 @@ def _split_csv(s: str) -> list[str]:
 
 
 async def bootstrap_data(session: AsyncSession, settings: Settings) -> None:
-    repo = Repo(session)
+    # OWNER_TELEGRAM_ID — владелец первого гаража; остальные гаражи
+    # заводятся через `python -m app.tenants add`
+    repo = Repo(session, DEFAULT_TENANT_ID)
 
     # Create initial owner if users table is empty
     if await repo.count_users() == 0:
         await repo.create_user(settings.OWNER_TELEGRAM_ID, name="Owner", role=UserRole.owner)
         logger.info("Created initial owner user: %s", settings.OWNER_TELEGRAM_ID)
 
+    await seed_tenant(repo, settings)
+
+
+async def seed_tenant(repo: Repo, settings: Settings) -> None:
     # Ensure default categories
     await repo.ensure_default_categories(
         income_names=_split_csv(settings.DEFAULT_INCOME_CATEGORIES),
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.tenancy import session_tenant
+
+# Таблицы, изменение которых меняет балансы/тексты отчётов
+TRACKED_TABLES = {"operations", "categories", "counterparties", "users", "accounts"}
+
+# Флаг в session.info: в сессии есть незакоммиченные изменения данных
+DATA_CHANGED = "data_changed"
+# Ключ в session.info: гаражи, чьи данные изменила транзакция
+CHANGED_TENANTS = "changed_tenants"
+# Вместо id гаража: изменение касается всех (например, DROP секции)
+ALL_TENANTS = "*"
+
+# Канал NOTIFY: каждый коммит с изменениями данных (бот, CLI) сообщает о
+# них остальным процессам; payload "<tenant>:<origin>"
+DATA_CHANGED_CHANNEL = "data_changed"
+# Свои уведомления процесс пропускает — версию он уже поднял при коммите
+PROCESS_ORIGIN = uuid.uuid4().hex[:12]
+
+_MISSING = object()
+
+
+class DataVersion:
+    """Monotonic in-process data versions, one per tenant. Bumped on every
+    write of the tenant; any cached value computed under an older version is
+    stale. Writes of one garage never invalidate another garage's caches.
+
+    Writes of other processes arrive via NOTIFY (see
+    `app.services.data_changes`); `bump_all` invalidates every tenant, also
+    those never bumped in this process.
+    """
+
+    def __init__(self):
+        self._values: dict[int, int] = {}
+        self._base = 0
+
+    def get(self, tenant_id: int) -> int:
+        return self._base + self._values.get(tenant_id, 0)
+
+    def bump(self, tenant_id: int) -> int:
+        self._values[tenant_id] = self._values.get(tenant_id, 0) + 1
+        return self.get(tenant_id)
+
+    def bump_all(self) -> None:
+        self._base += 1
+
+
+data_version = DataVersion()
+
+
+class VersionedLRU:
+    """LRU cache whose entries are valid only for the data version they were
+    computed under.
+
+    Every tenant gets its own LRU of `maxsize` entries, so a busy garage
+    cannot evict the entries of the others.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._parts: dict[int, OrderedDict[Hashable, tuple[int, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tenant_id: int, key: Hashable, version: int) -> Any:
+        data = self._parts.get(tenant_id)
+        entry = data.get(key) if data is not None else None
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del data[key]
+            self.misses += 1
+            return _MISSING
+        data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, tenant_id: int, key: Hashable, value: Any, version: int) -> None:
+        data = self._parts.setdefault(tenant_id, OrderedDict())
+        data[key] = (version, value)
+        data.move_to_end(key)
+        while len(data) > self.maxsize:
+            data.popitem(last=False)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        size = sum(len(d) for d in self._parts.values())
+        return (
+            f"{self.name}: {size} (по {self.maxsize} на гараж, гаражей "
+            f"{len(self._parts)}), hit {self.hits} / miss {self.misses} "
+            f"({ratio:.0f}%)"
+        )
+
+
+balance_text_cache = VersionedLRU("balance", maxsize=4)
+report_text_cache = VersionedLRU("reports", maxsize=256)
+chart_cache = VersionedLRU("charts", maxsize=32)
+accounts_cache = VersionedLRU("accounts", maxsize=2)
+
+ALL_CACHES = [balance_text_cache, report_text_cache, chart_cache, accounts_cache]
+
+
+def mark_data_changed(session: Session, all_tenants: bool = False) -> None:
+    session.info[DATA_CHANGED] = True
+    changed = session.info.setdefault(CHANGED_TENANTS, set())
+    if all_tenants:
+        changed.add(ALL_TENANTS)
+        data_version.bump_all()
+    else:
+        tenant_id = session_tenant(session)
+        changed.add(tenant_id)
+        data_version.bump(tenant_id)
+
+
+def _bump_changed(session: Session) -> None:
+    changed = session.info.pop(CHANGED_TENANTS, None)
+    if not session.info.pop(DATA_CHANGED, False):
+        return
+    for tenant_id in changed or (session_tenant(session),):
+        if tenant_id == ALL_TENANTS:
+            data_version.bump_all()
+        else:
+            data_version.bump(tenant_id)
+
+
+async def memoize(
+    cache: VersionedLRU,
+    key: Hashable,
+    session,
+    compute: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Returns cached value for `key` or computes and stores it.
+
+    A session with its own uncommitted writes bypasses the cache: it must see
+    its writes, and other sessions must not see them before commit.
+    """
+    if session.info.get(DATA_CHANGED):
+        return await compute()
+
+    # версию берём ДО вычисления: если данные поменяются во время запроса,
+    # значение сразу окажется устаревшим
+    tenant_id = session_tenant(session)
+    version = data_version.get(tenant_id)
+    value = cache.get(tenant_id, key, version)
+    if value is not _MISSING:
+        return value
+    value = await compute()
+    cache.put(tenant_id, key, value, version)
+    return value
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent reads: while a query for `key` is in
+    flight, other callers await its result instead of issuing their own.
+
+    The leader runs the query on its own (per-update) session; followers only
+    receive the result, so no session is ever shared between coroutines.
+    Results must therefore be plain values, not session-bound ORM objects.
+
+    The query runs in its own task and every caller awaits it shielded: a
+    cancelled caller (timeout, dropped update) does not cancel the others.
+    A cancelled leader still holds its session until the query finishes if
+    followers are waiting, and cancels the query otherwise.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        session,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        # своя незакоммиченная запись -> нужен свой запрос
+        if session.info.get(DATA_CHANGED):
+            return await compute()
+
+        # после записи новые вызовы не присоединяются к старому запросу;
+        # запросы разных гаражей не объединяются никогда
+        tenant_id = session_tenant(session)
+        key = (tenant_id, key, data_version.get(tenant_id))
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.followers += 1
+            flight.followers += 1
+            try:
+                return await asyncio.shield(flight.task)
+            finally:
+                flight.followers -= 1
+
+        flight = _Flight(asyncio.create_task(compute()))
+        self._inflight[key] = flight
+        flight.task.add_done_callback(functools.partial(self._done, key, flight))
+        self.leaders += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                # запрос идёт на сессии лидера: её нельзя отдать, пока он не
+                # закончится; без ожидающих он больше никому не нужен
+                if not flight.followers:
+                    flight.task.cancel()
+                await asyncio.wait({flight.task})
+            raise
+
+    def _done(self, key: Hashable, flight: _Flight, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not task.cancelled():
+            # если никто не ждёт — без "exception was never retrieved"
+            task.exception()
+
+    def stats(self) -> str:
+        return (
+            f"{self.name}: запросов {self.leaders}, "
+            f"присоединились {self.followers}"
+        )
+
+
+balance_flight = SingleFlight("balance")
+categories_flight = SingleFlight("categories")
+report_flight = SingleFlight("reports")
+
+ALL_FLIGHTS = [balance_flight, categories_flight, report_flight]
+
+
+@event.listens_for(Session, "after_flush")
+def _track_orm_changes(session: Session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if getattr(obj, "__tablename__", None) in TRACKED_TABLES:
+            mark_data_changed(session)
+            return
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_other_processes(session: Session) -> None:
+    # финальный flush коммита ещё впереди — без него after_flush не успеет
+    # отметить изменения ORM
+    session.flush()
+    if not session.info.get(DATA_CHANGED):
+        return
+    # NOTIFY доставляется только после коммита, откат его отменяет
+    for tenant_id in session.info.get(CHANGED_TENANTS, ()):
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {
+                "channel": DATA_CHANGED_CHANNEL,
+                "payload": f"{tenant_id}:{PROCESS_ORIGIN}",
+            },
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session: Session) -> None:
+    # значения, посчитанные между записью и коммитом, устаревают
+    _bump_changed(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _bump_after_rollback(session: Session) -> None:
+    _bump_changed(session)
@@ -1,16 +1,158 @@
 from __future__ import annotations
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+import logging
+import time
 
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.sql import Executable
+
+from app.cache import DATA_CHANGED
 from app.settings import Settings
+from app.tenancy import session_tenant
+
+logger = logging.getLogger(__name__)
+
+# Ключ в session.info: sync-движок реплики (только у сессий бота)
+REPLICA = "replica"
+# Ключ в session.info: куда ушли чтения replica=True — {True (реплика),
+# False (основной)}; смешанный набор — чтения из разных снимков
+REPLICA_ROUTED = "replica_routed"
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def create_engine_and_session(settings: Settings):
-    engine = create_async_engine(settings.database_url_async, pool_pre_ping=True)
-    session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+class ReplicaRouting:
+    """Decides whether a read may go to the replica.
+
+    After a commit that changed data, reads of that tenant stay on the
+    primary for `window` seconds, until the replica has caught up: the
+    writer sees its own writes, and cached report texts are never built
+    from data older than the version they are cached under.
+    """
+
+    MAX_TENANTS = 10_000
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self._written: dict[int, float] = {}
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def note_write(self, tenant_id: int) -> None:
+        now = time.monotonic()
+        self._written[tenant_id] = now
+        if len(self._written) > self.MAX_TENANTS:
+            self._written = {
+                t: at for t, at in self._written.items() if now - at < self.window
+            }
+
+    def use_replica(self, session: Session) -> bool:
+        # своя незакоммиченная запись видна только на основном сервере
+        if session.info.get(DATA_CHANGED):
+            fresh = True
+        else:
+            at = self._written.get(session_tenant(session))
+            fresh = at is not None and time.monotonic() - at < self.window
+        if fresh:
+            self.primary_reads += 1
+        else:
+            self.replica_reads += 1
+        return not fresh
+
+    def stats(self) -> str:
+        return (
+            f"Реплика: чтений {self.replica_reads}, на основном после записи "
+            f"{self.primary_reads} (окно {self.window:.0f} с)"
+        )
+
+
+replica_routing = ReplicaRouting()
+
+
+class RoutingSession(Session):
+    """Sends statements marked `execution_options(replica=True)` to the
+    read-only engine, if the session has one and `replica_routing` allows.
+    Everything else, flushes included, goes to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get(REPLICA)
+        if (
+            replica is not None
+            and not self._flushing
+            and isinstance(clause, Executable)
+            and clause.get_execution_options().get("replica")
+        ):
+            routed = replica_routing.use_replica(self)
+            self.info.setdefault(REPLICA_ROUTED, set()).add(routed)
+            if routed:
+                return replica
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(Session, "after_commit", insert=True)
+def _note_committed_write(session: Session) -> None:
+    # раньше слушателя кэша, который снимает флаг DATA_CHANGED
+    if session.info.get(DATA_CHANGED):
+        replica_routing.note_write(session_tenant(session))
+
+
+def _create_engine(url: str, settings: Settings) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SEC,
+        pool_recycle=settings.DB_POOL_RECYCLE_SEC,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": (
+                settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+            ),
+        },
+    )
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _on_disconnect(ctx) -> None:
+        # SQLAlchemy уже сбросил пул: следующие checkout'ы получат новые
+        # соединения; упавший запрос повторяет вызывающий (см. dedupe)
+        if ctx.is_disconnect:
+            logger.warning(
+                "DB connection lost, pool invalidated | url=%s | err=%s",
+                engine.url.render_as_string(hide_password=True),
+                ctx.original_exception,
+            )
+
+    return engine
+
+
+def create_replica_engine(settings: Settings) -> AsyncEngine | None:
+    """Read-only engine for report queries; None when no replica is set."""
+    url = settings.database_url_replica_async
+    if not url:
+        return None
+    replica_routing.window = settings.REPLICA_READ_YOUR_WRITES_SEC
+    return _create_engine(url, settings)
+
+
+def create_engine_and_session(
+    settings: Settings, replica: AsyncEngine | None = None
+):
+    engine = _create_engine(settings.database_url_async, settings)
+    session_maker = async_sessionmaker(
+        engine,
+        expire_on_commit=False,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        info={REPLICA: replica.sync_engine} if replica is not None else None,
+    )
     return engine, session_maker
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Ключ в session.info: операции, записанные в текущей транзакции
+PENDING_OPS = "pending_ops"
+
+
+@dataclass(frozen=True)
+class OperationAdded:
+    tenant_id: int
+    op_id: int
+    op_type: str
+    amount: int
+    category_id: int | None
+    created_by_id: int
+    created_at: datetime
+
+
+_subscribers: list[Callable[[list[OperationAdded]], None]] = []
+
+
+def subscribe(callback: Callable[[list[OperationAdded]], None]) -> None:
+    """`callback` receives committed operations. It runs inside the commit,
+    so it must only enqueue work, never await or touch the session."""
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback: Callable[[list[OperationAdded]], None]) -> None:
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def record_operation(session, ev: OperationAdded) -> None:
+    session.info.setdefault(PENDING_OPS, []).append(ev)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    events = session.info.pop(PENDING_OPS, None)
+    if not events:
+        return
+    for callback in _subscribers:
+        try:
+            callback(events)
+        except Exception:
+            logger.exception("Operation event subscriber failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_OPS, None)
@@ -1,8 +1,23 @@
-from . import admin, common, finance, reports, counterparties, monthly_expenses
+from . import (
+    accounts,
+    admin,
+    budgets,
+    bulk,
+    common,
+    digests,
+    finance,
+    reports,
+    counterparties,
+    monthly_expenses,
+)
 
 __all__ = [
+    "accounts",
     "admin",
+    "budgets",
+    "bulk",
     "common",
+    "digests",
     "finance",
     "reports",
     "counterparties",
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.handlers.common import op_dedupe_key, render_balance_message
+from app.keyboards import cancel_menu, main_menu
+from app.models import User, UserRole
+from app.repository import Repo
+from app.states import AccountFlow, TransferFlow
+from app.utils.guards import (
+    require_owner,
+    require_owner_callback,
+    require_user,
+    require_user_callback,
+)
+from app.utils.money import parse_amount
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+router = Router()
+
+
+def accounts_actions_kb(role: UserRole) -> InlineKeyboardBuilder:
+    kb = InlineKeyboardBuilder()
+    if role != UserRole.viewer:
+        kb.button(text="🔁 Перевод между счетами", callback_data="tr:start")
+    if role == UserRole.owner:
+        kb.button(text="➕ Новый счёт", callback_data="acc:add")
+    kb.adjust(1)
+    return kb
+
+
+def pick_account_kb(
+    accounts: list[tuple[int, str, int]], prefix: str, skip: int | None = None
+) -> InlineKeyboardBuilder:
+    kb = InlineKeyboardBuilder()
+    for aid, name, balance in accounts:
+        if aid != skip:
+            kb.button(text=f"{name} ({balance} ₽)", callback_data=f"{prefix}:{aid}")
+    kb.adjust(1)
+    return kb
+
+
+async def accounts_text(repo: Repo) -> str:
+    accounts = await repo.account_balances()
+    lines = ["🏦 Счета", ""]
+    lines += [f"• {name}: {amount} ₽" for _, name, amount in accounts]
+    lines += ["", f"Всего: {sum(a for _, _, a in accounts)} ₽"]
+    return "\n".join(lines)
+
+
+@router.message(lambda m: m.text == "🏦 Счета")
+@router.message(Command("accounts"))
+async def accounts_main(
+    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+):
+    if not await require_user(message, user):
+        return
+    await state.clear()
+    await message.answer(
+        await accounts_text(Repo(session)),
+        reply_markup=accounts_actions_kb(user.role).as_markup(),
+    )
+
+
+# ---------- transfer ----------
+@router.callback_query(lambda c: c.data == "tr:start")
+async def transfer_start(
+    callback: CallbackQuery, session: AsyncSession, user: User | None
+):
+    if not await require_user_callback(callback, user, action="transfer_start"):
+        return
+    if user.role == UserRole.viewer:
+        await callback.answer("👁 Наблюдатель: операции запрещены.", show_alert=True)
+        return
+
+    accounts = await Repo(session).account_balances()
+    if len(accounts) < 2:
+        await callback.answer("Нужно хотя бы два счёта.", show_alert=True)
+        return
+
+    await callback.message.answer(
+        "Откуда переводим?",
+        reply_markup=pick_account_kb(accounts, "tr:from").as_markup(),
+    )
+    await callback.answer()
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("tr:from:"))
+async def transfer_from(
+    callback: CallbackQuery, session: AsyncSession, user: User | None
+):
+    if not await require_user_callback(callback, user, action="transfer_from"):
+        return
+
+    from_id = int(callback.data.split(":")[2])
+    accounts = await Repo(session).account_balances()
+    await callback.message.edit_text(
+        "Куда переводим?",
+        reply_markup=pick_account_kb(
+            accounts, f"tr:to:{from_id}", skip=from_id
+        ).as_markup(),
+    )
+    await callback.answer()
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("tr:to:"))
+async def transfer_to(
+    callback: CallbackQuery, session: AsyncSession, state: FSMContext, user
+):
+    if not await require_user_callback(callback, user, action="transfer_to"):
+        return
+
+    _, _, from_id, to_id = callback.data.split(":")
+    names = {aid: name for aid, name in await Repo(session).list_accounts()}
+    if int(from_id) not in names or int(to_id) not in names:
+        await callback.answer("Счёт не найден.", show_alert=True)
+        return
+
+    await state.set_state(TransferFlow.amount)
+    await state.update_data(from_account_id=int(from_id), to_account_id=int(to_id))
+    await callback.message.edit_text(
+        f"🔁 {names[int(from_id)]} → {names[int(to_id)]}"
+    )
+    await callback.message.answer(
+        "Введите сумму перевода (целое число, ₽):", reply_markup=cancel_menu()
+    )
+    await callback.answer()
+
+
+@router.message(TransferFlow.amount)
+async def transfer_amount(
+    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+):
+    amt = parse_amount(message.text)
+    if not amt:
+        await message.answer(
+            "Нужно целое положительное число.", reply_markup=cancel_menu()
+        )
+        return
+
+    if not user or user.role == UserRole.viewer:
+        audit.info("auth.denied | tg_id=%s | action=transfer", message.from_user.id)
+        await message.answer("⛔ Нет прав.")
+        await state.clear()
+        return
+
+    data = await state.get_data()
+    repo = Repo(session)
+    op, available = await repo.post_transfer(
+        data["from_account_id"],
+        data["to_account_id"],
+        amt,
+        user.id,
+        dedupe_key=op_dedupe_key(message),
+    )
+    if not op:
+        await message.answer(
+            f"На счёте недостаточно. Сейчас: {available} ₽", reply_markup=cancel_menu()
+        )
+        return
+
+    audit.info(
+        "account.transfer | user_id=%s | tg_id=%s | from=%s | to=%s | amount=%s",
+        user.id,
+        user.telegram_id,
+        data["from_account_id"],
+        data["to_account_id"],
+        amt,
+    )
+
+    await state.clear()
+    text = await render_balance_message(repo)
+    await message.answer(
+        "✅ Перевод записан.\n\n" + text, reply_markup=main_menu(user.role)
+    )
+
+
+# ---------- new account ----------
+@router.callback_query(lambda c: c.data == "acc:add")
+async def account_add_start(
+    callback: CallbackQuery, state: FSMContext, user: User | None
+):
+    if not await require_owner_callback(callback, user, action="account_add_start"):
+        return
+
+    await state.set_state(AccountFlow.add_name)
+    await callback.message.answer(
+        "Название нового счёта (например: Карта, Расчётный счёт):",
+        reply_markup=cancel_menu(),
+    )
+    await callback.answer()
+
+
+@router.message(AccountFlow.add_name)
+async def account_add_name(
+    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+):
+    if not await require_owner(message, user, action="account_add_name"):
+        await state.clear()
+        return
+
+    name = (message.text or "").strip()
+    repo = Repo(session)
+    ok, msg = await repo.create_account(name)
+    if not ok:
+        await message.answer(msg, reply_markup=cancel_menu())
+        return
+
+    audit.info("account.created | owner_tg=%s | name=%s", message.from_user.id, name)
+    await state.clear()
+    await message.answer(msg, reply_markup=main_menu(user.role))
@@ -1,19 +1,26 @@
 from __future__ import annotations
 
 import logging
+import os
+import tempfile
+from datetime import date, datetime, timezone
 
-from aiogram import Router
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.keyboards import cancel_menu, users_menu
+from app.cache import ALL_CACHES, ALL_FLIGHTS, data_version
+from app.periods import previous_month
+from app.keyboards import cancel_menu, main_menu, users_menu
 from app.models import User, UserRole
-from app.repository import Repo
+from app.repository import Repo, balance_lock_stats, budget_month
+from app.services.imports import ImportJob, ImportService
 from app.states import UserAdminFlow
 from app.models import CategoryKind
-from app.states import CategoryAdminFlow
+from app.states import CategoryAdminFlow, ImportFlow
 from app.utils.guards import require_owner, require_owner_callback
 
 logger = logging.getLogger(__name__)
@@ -74,9 +81,14 @@ def categories_list_kb(kind: CategoryKind, cats: list) -> InlineKeyboardBuilder:
     return kb
 
 
-def category_actions_kb(category_id: int) -> InlineKeyboardBuilder:
+def category_actions_kb(
+    category_id: int, kind: CategoryKind | None = None
+) -> InlineKeyboardBuilder:
     kb = InlineKeyboardBuilder()
     kb.button(text="✏️ Переименовать", callback_data=f"catrename:{category_id}")
+    kb.button(text="🔔 Порог уведомления", callback_data=f"catlimit:{category_id}")
+    if kind == CategoryKind.expense:
+        kb.button(text="💰 Бюджет на месяц", callback_data=f"catbudget:{category_id}")
     kb.button(text="🗑 Удалить", callback_data=f"catdel:{category_id}")
     kb.button(text="⬅️ К списку", callback_data="catback:list")
     kb.adjust(1)
@@ -347,9 +359,24 @@ async def categories_pick(
 
     await state.update_data(cat_kind=cat.kind.value, cat_id=cat.id)
 
+    threshold = f"{cat.notify_threshold} ₽" if cat.notify_threshold else "—"
+    text = (
+        f"🗂 Категория: *{cat.name}*\nТип: *{kind_ru(cat.kind)}*\n"
+        f"Порог уведомления: *{threshold}*"
+    )
+    if cat.kind == CategoryKind.expense:
+        budget = await repo.get_budget(
+            cat.id, budget_month(datetime.now(timezone.utc))
+        )
+        if budget:
+            text += (
+                f"\nБюджет на месяц: *{budget.spent} / {budget.limit_amount} ₽*"
+            )
+        else:
+            text += "\nБюджет на месяц: *—*"
     await callback.message.edit_text(
-        f"🗂 Категория: *{cat.name}*\nТип: *{kind_ru(cat.kind)}*",
-        reply_markup=category_actions_kb(cat.id).as_markup(),
+        text,
+        reply_markup=category_actions_kb(cat.id, cat.kind).as_markup(),
         parse_mode="Markdown",
     )
     await callback.answer()
@@ -408,6 +435,65 @@ async def categories_rename_apply(
     await message.answer(msg, reply_markup=categories_list_kb(kind, cats).as_markup())
 
 
+@router.callback_query(lambda c: c.data and c.data.startswith("catlimit:"))
+async def categories_threshold_start(
+    callback: CallbackQuery, state: FSMContext, user: User | None
+):
+    if not await require_owner_callback(
+        callback, user, action="categories_threshold_start"
+    ):
+        return
+
+    cat_id = int(callback.data.split(":", 1)[1])
+    await state.update_data(cat_id=cat_id)
+    await state.set_state(CategoryAdminFlow.threshold)
+
+    await callback.message.answer(
+        "Сумма, от которой владельцам придёт уведомление (0 — без порога):",
+        reply_markup=cancel_menu(),
+    )
+    await callback.answer()
+
+
+@router.message(CategoryAdminFlow.threshold)
+async def categories_threshold_apply(
+    message: Message, session: AsyncSession, state: FSMContext, user
+):
+    if not await require_owner(message, user, action="categories_threshold_apply"):
+        await state.clear()
+        return
+
+    raw = (message.text or "").replace(" ", "")
+    if not raw.isdigit():
+        await message.answer("Введите сумму числом.", reply_markup=cancel_menu())
+        return
+
+    data = await state.get_data()
+    cat_id = int(data["cat_id"])
+
+    repo = Repo(session)
+    ok, msg = await repo.set_category_threshold(cat_id, int(raw))
+    if not ok:
+        await state.clear()
+        await message.answer(msg, reply_markup=main_menu(user.role))
+        return
+
+    audit.info(
+        "category.threshold | owner_tg=%s | cat_id=%s | amount=%s",
+        message.from_user.id,
+        cat_id,
+        int(raw),
+    )
+
+    cat = await repo.get_category(cat_id)
+    cats = await repo.list_categories(cat.kind)
+
+    await state.clear()
+    await message.answer(
+        msg, reply_markup=categories_list_kb(cat.kind, cats).as_markup()
+    )
+
+
 @router.callback_query(lambda c: c.data and c.data.startswith("catdel:"))
 async def categories_delete(
     callback: CallbackQuery, session: AsyncSession, state: FSMContext, user
@@ -479,3 +565,218 @@ async def categories_back_list(
         parse_mode="Markdown",
     )
     await callback.answer()
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("catbudget:"))
+async def categories_budget_start(
+    callback: CallbackQuery, state: FSMContext, user: User | None
+):
+    if not await require_owner_callback(
+        callback, user, action="categories_budget_start"
+    ):
+        return
+
+    cat_id = int(callback.data.split(":", 1)[1])
+    await state.update_data(cat_id=cat_id)
+    await state.set_state(CategoryAdminFlow.budget)
+
+    await callback.message.answer(
+        "Лимит расходов категории на текущий месяц, ₽ (0 — снять бюджет):",
+        reply_markup=cancel_menu(),
+    )
+    await callback.answer()
+
+
+@router.message(CategoryAdminFlow.budget)
+async def categories_budget_apply(
+    message: Message, session: AsyncSession, state: FSMContext, user
+):
+    if not await require_owner(message, user, action="categories_budget_apply"):
+        await state.clear()
+        return
+
+    raw = (message.text or "").replace(" ", "")
+    if not raw.isdigit():
+        await message.answer("Введите сумму числом.", reply_markup=cancel_menu())
+        return
+
+    data = await state.get_data()
+    cat_id = int(data["cat_id"])
+    month = budget_month(datetime.now(timezone.utc))
+
+    repo = Repo(session)
+    ok, msg = await repo.set_budget(cat_id, month, int(raw))
+    await state.clear()
+    if not ok:
+        await message.answer(msg, reply_markup=main_menu(user.role))
+        return
+
+    audit.info(
+        "category.budget | owner_tg=%s | cat_id=%s | month=%s | amount=%s",
+        message.from_user.id,
+        cat_id,
+        f"{month:%Y-%m}",
+        int(raw),
+    )
+
+    cats = await repo.list_categories(CategoryKind.expense)
+    await message.answer(
+        msg, reply_markup=categories_list_kb(CategoryKind.expense, cats).as_markup()
+    )
+
+
+# ---------- history import ----------
+@router.message(Command("import"))
+async def import_start(message: Message, state: FSMContext, user: User | None):
+    if not await require_owner(message, user, action="import_start"):
+        return
+
+    await state.clear()
+    await state.set_state(ImportFlow.file)
+    await message.answer(
+        "📦 Импорт истории\n\n"
+        "Пришлите CSV (UTF-8) или XLSX с колонками:\n"
+        "type, amount, category, counterparty_name, comment, created_at_msk,\n"
+        "account, to_account\n"
+        "(как в выгрузке отчёта). Недостающие категории и контрагенты "
+        "будут созданы; счета ищутся по названию, без счёта — основной.\n\n"
+        "Файлы больше 20 МБ загружайте через CLI: python -m app.importer",
+        reply_markup=cancel_menu(),
+    )
+
+
+@router.message(ImportFlow.file, F.document)
+async def import_file(
+    message: Message,
+    state: FSMContext,
+    user: User | None,
+    import_service: ImportService,
+):
+    if not await require_owner(message, user, action="import_file"):
+        return
+
+    name = (message.document.file_name or "").lower()
+    suffix = ".xlsx" if name.endswith(".xlsx") else ".csv"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+
+    status = await message.answer("⏳ Импорт: загружаю файл…")
+    try:
+        await message.bot.download(message.document, destination=path)
+    except Exception:
+        os.unlink(path)
+        raise
+
+    # разбор и COPY — в фоне: слот чата и сессия из пула не держатся
+    ok, text = import_service.submit(
+        ImportJob(
+            chat_id=message.chat.id,
+            tg_id=message.from_user.id,
+            user_id=user.id,
+            tenant_id=user.tenant_id,
+            path=path,
+            message_id=status.message_id,
+        )
+    )
+    if not ok:
+        os.unlink(path)
+        await status.edit_text(f"❗ {text}")
+        return
+
+    await state.clear()
+    await status.edit_text(text)
+    await message.answer(
+        "Результат придёт в это сообщение.", reply_markup=main_menu(user.role)
+    )
+    audit.info("import.queued | tg_id=%s", message.from_user.id)
+
+
+# ---------- closed periods ----------
+@router.message(Command("close_month"))
+async def close_month(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    user: User | None,
+):
+    if not await require_owner(message, user, action="close_month"):
+        return
+
+    arg = (command.args or "").strip()
+    if arg:
+        try:
+            month = date.fromisoformat(arg + "-01")
+        except ValueError:
+            await message.answer("Формат: /close_month ГГГГ-ММ")
+            return
+    else:
+        month = previous_month(datetime.now(timezone.utc).date())
+
+    repo = Repo(session)
+    ok, msg = await repo.close_month(month, closed_by_id=user.id)
+    if ok:
+        audit.info(
+            "period.closed | tg_id=%s | month=%s",
+            message.from_user.id,
+            f"{month:%Y-%m}",
+        )
+        msg += " Операции за него больше не меняются."
+    await message.answer(("✅ " if ok else "❗ ") + msg)
+
+
+# ---------- runtime stats ----------
+@router.message(Command("stats"))
+async def runtime_stats(
+    message: Message,
+    user: User | None,
+    chat_queue=None,
+    processed_updates=None,
+    rate_limiter=None,
+    outbox=None,
+    notifier=None,
+    digest_scheduler=None,
+    chart_service=None,
+    replica_routing=None,
+    data_changes=None,
+    process_owner_id: int | None = None,
+):
+    if not await require_owner(message, user, action="runtime_stats"):
+        return
+
+    garage = f"Версия данных гаража: {data_version.get(user.tenant_id)}"
+    # счётчики общие для всех гаражей процесса — по ним виден чужой трафик
+    if user.telegram_id != process_owner_id:
+        audit.info(
+            "stats.garage_only | tg_id=%s | tenant_id=%s",
+            message.from_user.id,
+            user.tenant_id,
+        )
+        await message.answer(
+            f"📈 Статистика гаража\n\n{garage}\n\n"
+            "Счётчики процесса видны только владельцу бота."
+        )
+        return
+
+    lines = ["📈 Статистика процесса", "", garage]
+    lines += [f"Кэш {c.stats()}" for c in ALL_CACHES]
+    lines += [f"Single-flight {f.stats()}" for f in ALL_FLIGHTS]
+    lines.append(balance_lock_stats.stats())
+    if chat_queue is not None:
+        lines.append(chat_queue.stats())
+    if processed_updates is not None:
+        lines.append(processed_updates.stats())
+    if rate_limiter is not None:
+        lines.append(rate_limiter.stats())
+    if outbox is not None:
+        lines.append(outbox.stats())
+    if notifier is not None:
+        lines.append(notifier.stats())
+    if digest_scheduler is not None:
+        lines.append(digest_scheduler.stats())
+    if chart_service is not None:
+        lines.append(chart_service.stats())
+    if replica_routing is not None:
+        lines.append(replica_routing.stats())
+    if data_changes is not None:
+        lines.append(data_changes.stats())
+    await message.answer("\n".join(lines))
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Budget, User
+from app.repository import Repo, budget_month
+from app.utils.guards import require_user
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+router = Router()
+
+MONTHS_RU = [
+    "январь",
+    "февраль",
+    "март",
+    "апрель",
+    "май",
+    "июнь",
+    "июль",
+    "август",
+    "сентябрь",
+    "октябрь",
+    "ноябрь",
+    "декабрь",
+]
+
+
+def budget_warning(budget: Budget | None, amount: int) -> str | None:
+    """Warning text if `amount` pushes the budget over its limit."""
+    if not budget or budget.spent + amount <= budget.limit_amount:
+        return None
+    over = budget.spent + amount - budget.limit_amount
+    return (
+        f"⚠️ Бюджет категории: потрачено {budget.spent} из "
+        f"{budget.limit_amount} ₽, с этим расходом превышение на {over} ₽."
+    )
+
+
+def _bar(spent: int, limit: int, width: int = 10) -> str:
+    filled = min(width, spent * width // limit) if limit else width
+    return "▰" * filled + "▱" * (width - filled)
+
+
+@router.message(Command("budget"))
+async def budgets_status(message: Message, session: AsyncSession, user: User | None):
+    if not await require_user(message, user):
+        return
+
+    month = budget_month(datetime.now(timezone.utc))
+    rows = await Repo(session).budget_status(month)
+    title = f"💰 Бюджеты на {MONTHS_RU[month.month - 1]} {month.year}"
+    if not rows:
+        await message.answer(
+            f"{title}\n\nБюджетов нет. Владелец задаёт их в карточке категории "
+            "(🗂 Категории → категория расходов → 💰 Бюджет на месяц)."
+        )
+        return
+
+    lines = [title, ""]
+    for name, limit, spent in rows:
+        if spent > limit:
+            rest = f"перерасход {spent - limit} ₽"
+        else:
+            rest = f"осталось {limit - spent} ₽"
+        mark = "❗" if spent > limit else "•"
+        bar = _bar(spent, limit)
+        lines.append(f"{mark} {name}: {spent} / {limit} ₽ {bar} ({rest})")
+    await message.answer("\n".join(lines))
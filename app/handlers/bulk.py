@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+
+from aiogram import F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.handlers.common import render_balance_message
+from app.keyboards import cancel_menu, confirm_menu, main_menu
+from app.models import CategoryKind, OperationType, User, UserRole
+from app.repository import Repo
+from app.states import BulkFlow
+from app.utils.bulk_import import (
+    MAX_ROWS,
+    build_reference,
+    parse_bulk_csv,
+    parse_bulk_text,
+)
+from app.utils.guards import require_user
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+router = Router()
+
+MAX_ERRORS_SHOWN = 40
+MAX_CSV_BYTES = 2 * 1024 * 1024
+
+BULK_HELP = (
+    "📥 Пакетный ввод\n\n"
+    "Отправьте список операций — по одной в строке:\n"
+    "тип; сумма; категория; контрагент; комментарий\n\n"
+    "Например:\n"
+    "доход; 3500; Услуги; ; заправка Kia\n"
+    "расход; 1200; Расходники; ; баллон R134a\n\n"
+    "Контрагент и комментарий можно не указывать.\n"
+    "Или пришлите CSV-файл с колонками как в выгрузке отчёта."
+)
+
+
+async def _load_reference(repo: Repo) -> dict:
+    return build_reference(
+        await repo.list_categories(CategoryKind.income),
+        await repo.list_categories(CategoryKind.expense),
+        await repo.list_counterparties(active_only=True),
+    )
+
+
+def _errors_text(errors: list[str]) -> str:
+    shown = errors[:MAX_ERRORS_SHOWN]
+    text = "\n".join(f"• {e}" for e in shown)
+    if len(errors) > len(shown):
+        text += f"\n…и ещё {len(errors) - len(shown)}"
+    return text
+
+
+async def _handle_parsed(
+    message: Message, state: FSMContext, rows: list[dict], errors: list[str]
+):
+    if not rows and not errors:
+        await message.answer("Не нашёл ни одной строки.", reply_markup=cancel_menu())
+        return
+
+    if len(rows) + len(errors) > MAX_ROWS:
+        await message.answer(
+            f"Слишком много строк (максимум {MAX_ROWS} за раз).",
+            reply_markup=cancel_menu(),
+        )
+        return
+
+    if errors:
+        await message.answer(
+            f"❗ Ошибки ({len(errors)}), ничего не записано:\n\n"
+            f"{_errors_text(errors)}\n\n"
+            "Исправьте и отправьте список заново.",
+            reply_markup=cancel_menu(),
+        )
+        return
+
+    income_sum = sum(
+        r["amount"] for r in rows if r["op_type"] == OperationType.income.value
+    )
+    expense_sum = sum(
+        r["amount"] for r in rows if r["op_type"] == OperationType.expense.value
+    )
+
+    await state.update_data(bulk_rows=rows)
+    await state.set_state(BulkFlow.confirm)
+    await message.answer(
+        "Подтвердите пакет:\n\n"
+        f"📄 Строк: {len(rows)}\n"
+        f"🟢 Доходы: {income_sum} ₽\n"
+        f"🔴 Расходы: {expense_sum} ₽",
+        reply_markup=confirm_menu(),
+    )
+
+
+@router.message(lambda m: m.text == "📥 Пакетный ввод")
+async def bulk_start(message: Message, state: FSMContext, user: User | None):
+    if not await require_user(message, user):
+        return
+
+    if user.role == UserRole.viewer:
+        audit.info(
+            "auth.denied | tg_id=%s | user_id=%s | role=viewer | action=bulk",
+            message.from_user.id,
+            user.id,
+        )
+        await message.answer("👁 Наблюдатель: добавлять операции нельзя.")
+        return
+
+    await state.clear()
+    await state.set_state(BulkFlow.input)
+    await message.answer(BULK_HELP, reply_markup=cancel_menu())
+
+
+@router.message(BulkFlow.input, F.document)
+async def bulk_input_csv(
+    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+):
+    if not await require_user(message, user):
+        return
+
+    doc = message.document
+    if doc.file_size and doc.file_size > MAX_CSV_BYTES:
+        await message.answer("Файл слишком большой.", reply_markup=cancel_menu())
+        return
+
+    buf = await message.bot.download(doc)
+    repo = Repo(session)
+    rows, errors = parse_bulk_csv(buf.read(), await _load_reference(repo))
+    audit.info(
+        "bulk.parsed | tg_id=%s | source=csv | rows=%s | errors=%s",
+        message.from_user.id,
+        len(rows),
+        len(errors),
+    )
+    await _handle_parsed(message, state, rows, errors)
+
+
+@router.message(BulkFlow.input)
+async def bulk_input_text(
+    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+):
+    if not await require_user(message, user):
+        return
+
+    repo = Repo(session)
+    rows, errors = parse_bulk_text(message.text or "", await _load_reference(repo))
+    audit.info(
+        "bulk.parsed | tg_id=%s | source=text | rows=%s | errors=%s",
+        message.from_user.id,
+        len(rows),
+        len(errors),
+    )
+    await _handle_parsed(message, state, rows, errors)
+
+
+@router.message(BulkFlow.confirm)
+async def bulk_confirm(
+    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+):
+    if message.text != "✅ Подтвердить":
+        await message.answer(
+            "Нажмите ✅ Подтвердить или ❌ Отмена", reply_markup=confirm_menu()
+        )
+        return
+
+    if not user or user.role == UserRole.viewer:
+        audit.info("auth.denied | tg_id=%s | action=bulk_confirm", message.from_user.id)
+        await message.answer("⛔ Нет прав.")
+        await state.clear()
+        return
+
+    data = await state.get_data()
+    rows = data.get("bulk_rows") or []
+    if not rows:
+        await state.clear()
+        await message.answer(
+            "Сбилось состояние. Попробуйте снова.", reply_markup=main_menu(user.role)
+        )
+        return
+
+    repo = Repo(session)
+    income_sum = sum(
+        r["amount"] for r in rows if r["op_type"] == OperationType.income.value
+    )
+    expense_sum = sum(
+        r["amount"] for r in rows if r["op_type"] == OperationType.expense.value
+    )
+    account_id = await repo.default_account_id(user)
+    if expense_sum:
+        # как в post_checked: проверка и запись под одной блокировкой
+        await repo.lock_balance()
+    _, _, available = await repo.fresh_balance()
+    # весь пакет проводится по одному счёту — его остаток тоже предел
+    on_account = await repo.account_balance(account_id)
+    if min(available, on_account) + income_sum - expense_sum < 0:
+        await message.answer(
+            f"Недостаточно средств для пакета. Доступно: {available} ₽, "
+            f"на счёте: {on_account} ₽, "
+            f"пакет: +{income_sum} / -{expense_sum} ₽",
+            reply_markup=cancel_menu(),
+        )
+        return
+
+    count = await repo.add_operations_bulk(
+        rows, created_by_id=user.id, account_id=account_id
+    )
+
+    audit.info(
+        "op.bulk_added | user_id=%s | tg_id=%s | count=%s | income=%s | expense=%s",
+        user.id,
+        user.telegram_id,
+        count,
+        income_sum,
+        expense_sum,
+    )
+
+    await state.clear()
+    text = await render_balance_message(repo)
+    await message.answer(
+        f"✅ Записано операций: {count}.\n\n" + text,
+        reply_markup=main_menu(user.role),
+    )
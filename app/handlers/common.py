@@ -8,6 +8,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import balance_text_cache, memoize
 from app.keyboards import main_menu
 from app.models import User, UserRole
 from app.repository import Repo
@@ -26,12 +27,26 @@ ROLE_RU = {
 
 
 async def render_balance_message(repo: Repo) -> str:
-    bal, reserve, available = await repo.balance()
-    return (
-        f"💰 Баланс: {bal} ₽\n"
-        f"🔒 Резерв: {reserve} ₽\n"
-        f"🟢 Доступно: {available} ₽"
-    )
+    async def compute() -> str:
+        bal, reserve, available = await repo.balance()
+        text = (
+            f"💰 Баланс: {bal} ₽\n"
+            f"🔒 Резерв: {reserve} ₽\n"
+            f"🟢 Доступно: {available} ₽"
+        )
+        accounts = await repo.account_balances()
+        if len(accounts) > 1:
+            text += "\n\n" + "\n".join(
+                f"🏦 {name}: {amount} ₽" for _, name, amount in accounts
+            )
+        return text
+
+    return await memoize(balance_text_cache, "balance", repo.s, compute)
+
+
+def op_dedupe_key(message: Message) -> str:
+    """Ключ идемпотентности операции: сообщение, которым её подтвердили."""
+    return f"{message.chat.id}:{message.message_id}"
 
 
 # async def get_user_or_deny(repo: Repo, message: Message) -> Optional[object]:
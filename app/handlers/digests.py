@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Message
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from app.repository import Repo
+from app.services.digests import PERIOD_RU, DigestScheduler
+from app.utils.guards import require_user, require_user_callback
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+router = Router()
+
+WEEKDAYS_RU = [
+    "понедельникам",
+    "вторникам",
+    "средам",
+    "четвергам",
+    "пятницам",
+    "субботам",
+    "воскресеньям",
+]
+
+
+def digest_help(scheduler: DigestScheduler | None) -> str:
+    hour = scheduler.hour if scheduler else 21
+    weekday = scheduler.weekly_weekday if scheduler else 0
+    return (
+        "🗓 Сводки\n\n"
+        f"Ежедневная — каждый день в {hour}:00 (МСК), за вчера.\n"
+        f"Еженедельная — по {WEEKDAYS_RU[weekday]} в {hour}:00, за прошлую "
+        "неделю (пн–вс).\n\n"
+        "Нажмите, чтобы включить или выключить:"
+    )
+
+
+def digests_kb(subscribed: set[str]) -> InlineKeyboardBuilder:
+    kb = InlineKeyboardBuilder()
+    for period, title in PERIOD_RU.items():
+        mark = "✅" if period in subscribed else "⬜"
+        kb.button(text=f"{mark} {title}", callback_data=f"dg:{period}")
+    kb.adjust(1)
+    return kb
+
+
+@router.message(Command("digest"))
+async def digests_main(
+    message: Message,
+    session: AsyncSession,
+    user: User | None,
+    digest_scheduler: DigestScheduler | None = None,
+):
+    if not await require_user(message, user):
+        return
+
+    subscribed = await Repo(session).list_digest_periods(user.id)
+    await message.answer(
+        digest_help(digest_scheduler),
+        reply_markup=digests_kb(subscribed).as_markup(),
+    )
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("dg:"))
+async def digests_toggle(
+    callback: CallbackQuery, session: AsyncSession, user: User | None
+):
+    if not await require_user_callback(callback, user, action="digests_toggle"):
+        return
+
+    period = callback.data.split(":", 1)[1]
+    if period not in PERIOD_RU:
+        await callback.answer()
+        return
+
+    repo = Repo(session)
+    on = await repo.toggle_digest(user.id, period)
+    audit.info(
+        "digest.%s | user_id=%s | tg_id=%s | period=%s",
+        "on" if on else "off",
+        user.id,
+        user.telegram_id,
+        period,
+    )
+
+    subscribed = await repo.list_digest_periods(user.id)
+    await callback.message.edit_reply_markup(
+        reply_markup=digests_kb(subscribed).as_markup()
+    )
+    await callback.answer("Включено" if on else "Выключено")
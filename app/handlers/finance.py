@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+from datetime import datetime, timezone
 
 from aiogram import Router
 from aiogram.fsm.context import FSMContext
@@ -9,18 +10,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.keyboards import cancel_menu, confirm_menu, main_menu, reserve_menu
 from app.models import (
-    Category,
     CategoryKind,
     OperationType,
     User,
     UserRole,
     Counterparty,
 )
-from app.repository import Repo
+from app.repository import Repo, budget_month
 from app.states import ExpenseFlow, IncomeFlow, ReserveFlow
 from app.utils.guards import require_user
 from app.utils.money import parse_amount
-from app.handlers.common import render_balance_message
+from app.handlers.budgets import budget_warning
+from app.handlers.common import op_dedupe_key, render_balance_message
 
 logger = logging.getLogger(__name__)
 audit = logging.getLogger("audit")
@@ -37,6 +38,59 @@ def categories_kb(names: list[str]) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
 
 
+def accounts_kb(
+    accounts: list[tuple[int, str]], default_id: int
+) -> ReplyKeyboardMarkup:
+    # счёт по умолчанию — первой кнопкой
+    ordered = sorted(accounts, key=lambda a: a[0] != default_id)
+    rows = [[KeyboardButton(text=name)] for _, name in ordered]
+    rows.append([KeyboardButton(text="❌ Отмена")])
+    return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
+
+
+async def ask_account(
+    message: Message, repo: Repo, state: FSMContext, user: User, next_state
+) -> bool:
+    """Asks for the account if there are several; with one account stores it
+    and returns False so the caller goes straight to the next step."""
+    accounts = await repo.list_accounts()
+    default_id = await repo.default_account_id(user)
+    if len(accounts) < 2:
+        await state.update_data(account_id=default_id)
+        return False
+
+    await state.set_state(next_state)
+    await message.answer(
+        "Выберите счёт:", reply_markup=accounts_kb(accounts, default_id)
+    )
+    return True
+
+
+async def pick_account(
+    message: Message, repo: Repo, state: FSMContext, user: User
+) -> bool:
+    """Handles the account button; remembers it as the user's default."""
+    text = (message.text or "").strip()
+    accounts = await repo.list_accounts()
+    account_id = next((aid for aid, name in accounts if name == text), None)
+    if account_id is None:
+        await message.answer(
+            "Выберите счёт кнопкой:",
+            reply_markup=accounts_kb(accounts, await repo.default_account_id(user)),
+        )
+        return False
+
+    await state.update_data(account_id=account_id, account_name=text)
+    if user.default_account_id != account_id:
+        await repo.set_default_account(user.id, account_id)
+    return True
+
+
+def account_line(data: dict) -> str:
+    name = data.get("account_name")
+    return f"🏦 Счёт: {name}\n" if name else ""
+
+
 def counterparties_kb(names: list[str]) -> ReplyKeyboardMarkup:
     rows = [[KeyboardButton(text="— Без контрагента")]]
     rows += [[KeyboardButton(text=n)] for n in names]
@@ -86,6 +140,22 @@ async def income_amount(
     await state.update_data(amount=amt)
 
     repo = Repo(session)
+    if not await ask_account(message, repo, state, user, IncomeFlow.account):
+        await ask_income_category(message, repo, state, user)
+
+
+@router.message(IncomeFlow.account)
+async def income_account(
+    message: Message, session: AsyncSession, state: FSMContext, user
+):
+    repo = Repo(session)
+    if await pick_account(message, repo, state, user):
+        await ask_income_category(message, repo, state, user)
+
+
+async def ask_income_category(
+    message: Message, repo: Repo, state: FSMContext, user: User
+):
     cats = await repo.list_categories(CategoryKind.income)
     if not cats:
         await message.answer(
@@ -129,7 +199,7 @@ async def income_comment(message: Message, session: AsyncSession, state: FSMCont
 
     data = await state.get_data()
     amt = int(data["amount"])
-    cat_obj = await session.get(Category, int(data["category_id"]))
+    cat_obj = await Repo(session).get_category(int(data["category_id"]))
 
     await state.update_data(comment=comment)
     await state.set_state(IncomeFlow.confirm)
@@ -137,6 +207,7 @@ async def income_comment(message: Message, session: AsyncSession, state: FSMCont
     await message.answer(
         "Подтвердите доход:\n\n"
         f"💵 Сумма: {amt} ₽\n"
+        f"{account_line(data)}"
         f"🏷 Категория: {cat_obj.name if cat_obj else ''}\n"
         f"📝 Комментарий: {comment or '—'}",
         reply_markup=confirm_menu(),
@@ -168,14 +239,18 @@ async def income_confirm(message: Message, session: AsyncSession, state: FSMCont
         category_id=int(data["category_id"]),
         comment=data.get("comment"),
         created_by_id=user.id,
+        dedupe_key=op_dedupe_key(message),
+        account_id=data.get("account_id"),
     )
 
     audit.info(
-        "op.added | user_id=%s | tg_id=%s | type=income | amount=%s | category_id=%s",
+        "op.added | user_id=%s | tg_id=%s | type=income | amount=%s | category_id=%s"
+        " | account_id=%s",
         user.id,
         user.telegram_id,
         data["amount"],
         data["category_id"],
+        data.get("account_id"),
     )
 
     await state.clear()
@@ -226,6 +301,22 @@ async def expense_amount(
         return
 
     await state.update_data(amount=amt)
+    if not await ask_account(message, repo, state, user, ExpenseFlow.account):
+        await ask_expense_category(message, repo, state, user)
+
+
+@router.message(ExpenseFlow.account)
+async def expense_account(
+    message: Message, session: AsyncSession, state: FSMContext, user
+):
+    repo = Repo(session)
+    if await pick_account(message, repo, state, user):
+        await ask_expense_category(message, repo, state, user)
+
+
+async def ask_expense_category(
+    message: Message, repo: Repo, state: FSMContext, user: User
+):
     cats = await repo.list_categories(CategoryKind.expense)
     if not cats:
         await message.answer(
@@ -256,6 +347,15 @@ async def expense_category(message: Message, session: AsyncSession, state: FSMCo
         return
 
     await state.update_data(category_id=cat.id)
+
+    # сумма уже введена, категория известна только теперь — здесь и
+    # предупреждаем о бюджете (не запрещаем)
+    data = await state.get_data()
+    budget = await repo.get_budget(cat.id, budget_month(datetime.now(timezone.utc)))
+    warning = budget_warning(budget, int(data["amount"]))
+    if warning:
+        await message.answer(warning)
+
     cps = await repo.list_counterparties(active_only=True)
     if not cps:
         # если контрагентов нет — пропускаем шаг
@@ -315,7 +415,7 @@ async def expense_comment(message: Message, session: AsyncSession, state: FSMCon
 
     data = await state.get_data()
     amt = int(data["amount"])
-    cat_obj = await session.get(Category, int(data["category_id"]))
+    cat_obj = await Repo(session).get_category(int(data["category_id"]))
 
     await state.update_data(comment=comment)
     await state.set_state(ExpenseFlow.confirm)
@@ -325,6 +425,7 @@ async def expense_comment(message: Message, session: AsyncSession, state: FSMCon
     await message.answer(
         "Подтвердите расход:\n\n"
         f"💸 Сумма: {amt} ₽\n"
+        f"{account_line(data)}"
         f"🏷 Категория: {cat_obj.name if cat_obj else ''}\n"
         f"🏢 Контрагент: {cp_name}\n"
         f"📝 Комментарий: {comment or '—'}",
@@ -351,22 +452,35 @@ async def expense_confirm(message: Message, session: AsyncSession, state: FSMCon
         return
 
     data = await state.get_data()
-    await repo.add_operation(
+    op, available = await repo.post_checked(
         op_type=OperationType.expense,
         amount=int(data["amount"]),
         category_id=int(data["category_id"]),
         comment=data.get("comment"),
         created_by_id=user.id,
         counterparty_id=data.get("counterparty_id"),
+        dedupe_key=op_dedupe_key(message),
+        account_id=data.get("account_id"),
     )
+    if not op:
+        # пока заполняли форму, деньги успели потратить
+        await state.clear()
+        account = data.get("account_name")
+        await message.answer(
+            f"Недостаточно средств. Доступно: {available} ₽"
+            + (f" (с учётом счёта «{account}»)" if account else ""),
+            reply_markup=main_menu(user.role),
+        )
+        return
 
     audit.info(
-        "op.added | user_id=%s | tg_id=%s | type=expense | amount=%s | category_id=%s | counterparty_id=%s",
+        "op.added | user_id=%s | tg_id=%s | type=expense | amount=%s | category_id=%s | counterparty_id=%s | account_id=%s",
         user.id,
         user.telegram_id,
         data["amount"],
         data["category_id"],
         data.get("counterparty_id"),
+        data.get("account_id"),
     )
 
     await state.clear()
@@ -429,17 +543,20 @@ async def reserve_add_amount(
         await state.clear()
         return
 
-    _, _, available = await repo.balance()
-    if amt > available:
+    op, available = await repo.post_checked(
+        OperationType.reserve_in,
+        amt,
+        user.id,
+        category_id=None,
+        comment="reserve",
+        dedupe_key=op_dedupe_key(message),
+    )
+    if not op:
         await message.answer(
             f"Недостаточно средств. Доступно: {available} ₽", reply_markup=cancel_menu()
         )
         return
 
-    await repo.add_operation(
-        OperationType.reserve_in, amt, user.id, category_id=None, comment="reserve"
-    )
-
     audit.info(
         "reserve.in | user_id=%s | tg_id=%s | amount=%s", user.id, user.telegram_id, amt
     )
@@ -493,17 +610,20 @@ async def reserve_remove_amount(
         await state.clear()
         return
 
-    _, reserve, _ = await repo.balance()
-    if amt > reserve:
+    op, reserve = await repo.post_checked(
+        OperationType.reserve_out,
+        amt,
+        user.id,
+        category_id=None,
+        comment="reserve",
+        dedupe_key=op_dedupe_key(message),
+    )
+    if not op:
         await message.answer(
             f"В резерве недостаточно. Сейчас: {reserve} ₽", reply_markup=cancel_menu()
         )
         return
 
-    await repo.add_operation(
-        OperationType.reserve_out, amt, user.id, category_id=None, comment="reserve"
-    )
-
     audit.info(
         "reserve.out | user_id=%s | tg_id=%s | amount=%s",
         user.id,
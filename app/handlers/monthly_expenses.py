@@ -302,9 +302,10 @@ async def me_apply(callback: CallbackQuery, session: AsyncSession, user: User |
     y, m = now.year, now.month
     created = 0
     skipped = 0
+    applied = await repo.monthly_expenses_applied(y, m)
 
     for me in items:
-        if await repo.monthly_expense_applied(me.id, y, m):
+        if me.id in applied:
             skipped += 1
             continue
 
@@ -320,6 +321,7 @@ async def me_apply(callback: CallbackQuery, session: AsyncSession, user: User |
             category_id=me.category_id,
             counterparty_id=me.counterparty_id,
             comment=base_comment,
+            dedupe_key=f"me:{me.id}:{y:04d}-{m:02d}",
         )
         created += 1
 
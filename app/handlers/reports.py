@@ -5,18 +5,26 @@ from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
 from aiogram import Router
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import BufferedInputFile, CallbackQuery, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import FSInputFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import memoize, report_flight, report_text_cache
 from app.handlers.common import render_balance_message
 from app.models import Operation, OperationType, UserRole, User
 from app.repository import Repo
-from app.utils.csv_export import export_operations_csv
-from app.utils.guards import require_user, require_user_callback
+from app.services.charts import ChartService
+from app.services.exports import ExportJob, ExportService
+from app.utils.forecast import (
+    DEFAULT_WINDOW_DAYS,
+    daily_rates,
+    project,
+    template_dates,
+)
+from app.utils.guards import require_owner, require_user, require_user_callback
 
 logger = logging.getLogger(__name__)
 audit = logging.getLogger("audit")
@@ -45,6 +53,7 @@ def report_period_inline(prefix: str = "rp") -> InlineKeyboardBuilder:
     kb.button(text="1 день", callback_data=f"{prefix}:1")
     kb.button(text="3 дня", callback_data=f"{prefix}:3")
     kb.button(text="7 дней", callback_data=f"{prefix}:7")
+    kb.button(text="30 дней", callback_data=f"{prefix}:30")
     kb.button(text="Свой период (CSV)", callback_data=f"{prefix}:custom")
     kb.adjust(1)
     return kb
@@ -53,11 +62,20 @@ def report_period_inline(prefix: str = "rp") -> InlineKeyboardBuilder:
 def owner_export_inline(prefix: str = "re") -> InlineKeyboardBuilder:
     kb = InlineKeyboardBuilder()
     kb.button(text="📄 Выгрузить CSV", callback_data=f"{prefix}:csv")
+    kb.button(text="📊 Выгрузить XLSX", callback_data=f"{prefix}:xlsx")
+    kb.button(text="📈 График", callback_data=f"{prefix}:chart")
     kb.adjust(1)
     return kb
 
 
 # ---------- helpers ----------
+OP_ICONS = {
+    OperationType.income: "🟢",
+    OperationType.expense: "🔴",
+    OperationType.transfer: "🔁",
+}
+
+
 def _op_types_from_kind(kind: str):
     if kind == "income":
         return [OperationType.income]
@@ -101,6 +119,8 @@ def _type_ru(t: OperationType | None) -> str:
         return "Расход"
     if t in (OperationType.reserve_in, OperationType.reserve_out):
         return "Резерв"
+    if t == OperationType.transfer:
+        return "Перевод"
     return "—"
 
 
@@ -163,11 +183,7 @@ def format_ops_compact_by_day(ops: list, *, is_owner: bool) -> str:
         lines.append(f"{_day_title(d, today)}:")
         items = sorted(by_day[d], key=lambda x: x[0], reverse=True)
         for _, o in items:
-            icon = (
-                "🟢"
-                if o.op_type == OperationType.income
-                else "🔴" if o.op_type == OperationType.expense else "🛡"
-            )
+            icon = OP_ICONS.get(o.op_type, "🛡")
             who = ""
             if is_owner:
                 created_by = getattr(o, "created_by", None)
@@ -205,7 +221,8 @@ def _scope_created_by_id(user) -> int | None:
 
 async def _generate_report_text(
     repo: Repo, user, kind: str, start_msk: datetime, end_msk: datetime
-) -> tuple[str, list]:
+) -> tuple[str, int]:
+    """Returns (report text, operations count)."""
     op_types = _op_types_from_kind(kind)
     created_by_id = _scope_created_by_id(user)
 
@@ -246,7 +263,7 @@ async def _generate_report_text(
     if not is_owner:
         body += "\n\n(Показаны только ваши операции.)"
 
-    return header + body, ops
+    return header + body, len(ops)
 
 
 # ---------- Handlers ----------
@@ -289,7 +306,7 @@ async def report_pick_period(
 
     repo = Repo(session)
 
-    period = callback.data.split(":", 1)[1]  # 1/3/7/custom
+    period = callback.data.split(":", 1)[1]  # 1/3/7/30/custom
     data = await state.get_data()
     kind = data.get("report_kind", "all")
 
@@ -307,15 +324,33 @@ async def report_pick_period(
         await callback.answer("Неизвестный период.", show_alert=True)
         return
 
-    if days not in (1, 3, 7):
+    if days not in (1, 3, 7, 30):
         await callback.answer(
-            "Доступны пресеты: 1/3/7 дней или свой период.", show_alert=True
+            "Доступны пресеты: 1/3/7/30 дней или свой период.", show_alert=True
         )
         return
 
     start_msk, end_msk = _period_from_days_msk(days)
 
-    text, ops = await _generate_report_text(repo, user, kind, start_msk, end_msk)
+    # Пресеты одинаковы для всех, пока данные не менялись — берём из памяти
+    cache_key = (
+        "preset",
+        kind,
+        days,
+        start_msk.date(),
+        _scope_created_by_id(user),
+        user.role == UserRole.owner,
+    )
+    text, ops_count = await memoize(
+        report_text_cache,
+        cache_key,
+        repo.s,
+        lambda: report_flight.do(
+            cache_key,
+            repo.s,
+            lambda: _generate_report_text(repo, user, kind, start_msk, end_msk),
+        ),
+    )
 
     # last_report сохраняем для ВСЕХ (нужно для CSV-кнопки)
     await state.update_data(
@@ -337,7 +372,7 @@ async def report_pick_period(
         user.role.value,
         kind,
         period,
-        len(ops),
+        ops_count,
     )
     await callback.answer()
 
@@ -361,13 +396,15 @@ async def report_custom_start(message: Message, state: FSMContext, user: User |
 
 @router.message(ReportCustomPeriod.end_date)
 async def report_custom_end(
-    message: Message, session: AsyncSession, state: FSMContext, user: User | None
+    message: Message,
+    state: FSMContext,
+    user: User | None,
+    export_service: ExportService,
 ):
 
     if not await require_user(message, user):
         return
 
-    repo = Repo(session)
     data = await state.get_data()
     kind = data.get("report_kind", "all")
     start_raw = data.get("custom_start")
@@ -395,42 +432,46 @@ async def report_custom_end(
     start_msk, _ = _msk_day_bounds(start_date)
     _, end_msk = _msk_day_bounds(end_date)
 
-    op_types = _op_types_from_kind(kind)
-    created_by_id = _scope_created_by_id(user)
-
-    ops = await repo.list_operations_filtered(
-        op_types=op_types,
-        start=_to_utc(start_msk),
-        end=_to_utc(end_msk),
-        created_by_id=created_by_id,
-    )
-
-    path = export_operations_csv(ops)
-    await message.answer_document(
-        FSInputFile(path, filename="report.csv"),
-        caption="📄 CSV-отчёт за выбранный период (открывается в Excel).",
+    ok, msg = await export_service.submit(
+        ExportJob(
+            chat_id=message.chat.id,
+            user_id=user.id,
+            tenant_id=user.tenant_id,
+            fmt="csv",
+            kind=kind,
+            start=_to_utc(start_msk),
+            end=_to_utc(end_msk),
+            created_by_id=_scope_created_by_id(user),
+            caption="📄 CSV-отчёт за выбранный период (открывается в Excel).",
+        )
     )
+    if not ok:
+        await message.answer(msg)
 
     audit.info(
-        "report.export.csv | tg_id=%s | role=%s | kind=%s | period=custom | ops=%s",
+        "report.export.requested | tg_id=%s | role=%s | kind=%s | fmt=csv"
+        " | period=custom | queued=%s",
         message.from_user.id,
         user.role.value,
         kind,
-        len(ops),
+        ok,
     )
 
     await state.clear()
     return
 
 
-@router.callback_query(lambda c: c.data == "re:csv")
-async def report_export_csv(
-    callback: CallbackQuery, session: AsyncSession, state: FSMContext, user: User | None
+@router.callback_query(lambda c: c.data in ("re:csv", "re:xlsx"))
+async def report_export_file(
+    callback: CallbackQuery,
+    state: FSMContext,
+    user: User | None,
+    export_service: ExportService,
 ):
-    if not await require_user_callback(callback, user, action="report_export_csv"):
+    if not await require_user_callback(callback, user, action="report_export_file"):
         return
 
-    repo = Repo(session)
+    fmt = callback.data.split(":", 1)[1]  # csv/xlsx
 
     data = await state.get_data()
     last = data.get("last_report")
@@ -446,27 +487,167 @@ async def report_export_csv(
         await callback.answer("Не смог прочитать параметры отчёта.", show_alert=True)
         return
 
-    op_types = _op_types_from_kind(kind)
-    created_by_id = _scope_created_by_id(user)  # worker/viewer -> свои, owner -> все
+    ok, msg = await export_service.submit(
+        ExportJob(
+            chat_id=callback.message.chat.id,
+            user_id=user.id,
+            tenant_id=user.tenant_id,
+            fmt=fmt,
+            kind=kind,
+            start=start,
+            end=end,
+            # worker/viewer -> свои, owner -> все
+            created_by_id=_scope_created_by_id(user),
+        )
+    )
 
-    ops = await repo.list_operations_filtered(
-        op_types=op_types,
-        start=start,
-        end=end,
-        created_by_id=created_by_id,
+    audit.info(
+        "report.export.requested | tg_id=%s | role=%s | kind=%s | fmt=%s | queued=%s",
+        callback.from_user.id,
+        user.role.value,
+        kind,
+        fmt,
+        ok,
     )
+    await callback.answer(None if ok else msg, show_alert=not ok)
+
+
+@router.callback_query(lambda c: c.data == "re:chart")
+async def report_chart(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    state: FSMContext,
+    user: User | None,
+    chart_service: ChartService,
+):
+    if not await require_user_callback(callback, user, action="report_chart"):
+        return
+
+    data = await state.get_data()
+    last = data.get("last_report")
+    if not last:
+        await callback.answer("Сначала сформируйте отчёт.", show_alert=True)
+        return
+
+    await callback.answer("Рисую график…")
+
+    start = datetime.fromisoformat(last["start_utc"])
+    end = datetime.fromisoformat(last["end_utc"])
+    start_day = start.astimezone(MSK).date()
+    end_day = end.astimezone(MSK).date()
 
-    path = export_operations_csv(ops)
-    await callback.message.answer_document(
-        FSInputFile(path, filename="report.csv"),
-        caption="📄 CSV-отчёт (открывается в Excel).",
+    png = await chart_service.period_chart(
+        Repo(session),
+        start,
+        end,
+        start_day,
+        end_day,
+        _scope_created_by_id(user),
+    )
+    await callback.message.answer_photo(
+        BufferedInputFile(png, filename="chart.png"),
+        caption=f"📈 {start_day:%d.%m.%Y} — {end_day:%d.%m.%Y}",
     )
 
     audit.info(
-        "report.export.csv | tg_id=%s | role=%s | kind=%s | ops=%s",
+        "report.chart | tg_id=%s | role=%s | start=%s | end=%s",
         callback.from_user.id,
         user.role.value,
-        kind,
-        len(ops),
+        start_day,
+        end_day,
+    )
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("rj:cancel:"))
+async def report_job_cancel(
+    callback: CallbackQuery, user: User | None, export_service: ExportService
+):
+    if not await require_user_callback(callback, user, action="report_job_cancel"):
+        return
+
+    job_id = int(callback.data.split(":")[-1])
+    ok, msg = await export_service.cancel(job_id, user)
+    await callback.answer(msg, show_alert=not ok)
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("rj:get:"))
+async def report_job_get(
+    callback: CallbackQuery, user: User | None, export_service: ExportService
+):
+    if not await require_user_callback(callback, user, action="report_job_get"):
+        return
+
+    job_id = int(callback.data.split(":")[-1])
+    ok, msg = await export_service.resend(job_id, user, callback.message.chat.id)
+    await callback.answer(msg, show_alert=not ok)
+
+
+# ---------- forecast ----------
+FORECAST_DEFAULT_DAYS = 30
+FORECAST_MAX_DAYS = 180
+FORECAST_CHECKPOINTS = (7, 14, 30, 60, 90, 180)
+
+
+@router.message(Command("forecast"))
+async def report_forecast(
+    message: Message,
+    command: CommandObject,
+    session: AsyncSession,
+    user: User | None,
+):
+    if not await require_owner(message, user, action="report_forecast"):
+        return
+
+    arg = (command.args or "").strip()
+    horizon = int(arg) if arg.isdigit() else FORECAST_DEFAULT_DAYS
+    horizon = max(1, min(horizon, FORECAST_MAX_DAYS))
+
+    repo = Repo(session)
+    today = datetime.now(MSK).date()
+    window_start = today - timedelta(days=DEFAULT_WINDOW_DAYS)
+    since = _to_utc(datetime.combine(window_start, datetime.min.time()))
+
+    rates = daily_rates(await repo.daily_totals(since), today)
+    templates = await repo.list_monthly_expenses(active_only=True)
+    applied = await repo.monthly_expenses_applied(today.year, today.month)
+    # days[0] — сегодня, поэтому "через horizon дн." — это days[horizon]
+    scheduled = template_dates(
+        [(me.id, me.title, me.day_of_month, me.amount) for me in templates],
+        applied,
+        today,
+        horizon + 1,
+    )
+    _, _, available = await repo.balance()
+    fc = project(available, rates, scheduled, today, horizon + 1)
+
+    lines = [
+        f"🔮 Прогноз «доступно» на {horizon} дн.",
+        "",
+        f"🟢 Сейчас: {available} ₽",
+        f"В среднем за день: +{fc.income_rate:.0f} / -{fc.expense_rate:.0f} ₽ "
+        f"(последние {DEFAULT_WINDOW_DAYS // 7} нед.)",
+    ]
+    if fc.scheduled:
+        lines += ["", "📅 Платежи по шаблонам:"]
+        lines += [
+            f"• {d:%d.%m} {title} — {amount} ₽" for d, title, amount in fc.scheduled
+        ]
+
+    lines += [""]
+    for n in FORECAST_CHECKPOINTS:
+        if n <= horizon:
+            day, bal = fc.days[n], fc.balance[n]
+            lines.append(f"Через {n} дн. ({day:%d.%m}): {bal:.0f} ₽")
+
+    if fc.first_negative:
+        lines += ["", f"❗ Доступно уйдёт в минус ~{fc.first_negative:%d.%m.%Y}"]
+    else:
+        lines += ["", "✅ В минус не уходит."]
+
+    audit.info(
+        "report.forecast | tg_id=%s | days=%s | negative=%s",
+        message.from_user.id,
+        horizon,
+        fc.first_negative,
     )
-    await callback.answer("Готово")
+    await message.answer("\n".join(lines))
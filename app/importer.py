@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import create_engine_and_session
+from app.models import CategoryKind, OperationType
+from app.repository import Repo
+from app.settings import Settings
+from app.utils.history_import import iter_source_records, parse_record
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+MAX_ERRORS_KEPT = 100
+
+CATEGORY_KIND = {
+    OperationType.income: CategoryKind.income,
+    OperationType.expense: CategoryKind.expense,
+}
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+
+async def import_history(
+    session: AsyncSession,
+    path: str,
+    created_by_id: int,
+    *,
+    batch_size: int = BATCH_SIZE,
+    progress: ProgressCallback | None = None,
+    tenant_id: int | None = None,
+) -> dict:
+    """Streams a CSV/XLSX file into `operations` via COPY.
+
+    Reading and parsing (openpyxl for XLSX) runs in a worker thread one
+    batch at a time, so the event loop only waits for COPY.
+    Missing categories/counterparties are created in bulk per batch. Accounts
+    are matched by name among the garage's active ones; rows without an
+    account go to the default one. Invalid rows, unknown accounts and rows
+    dated inside closed periods are skipped and reported.
+    Everything runs in the caller's transaction — commit/rollback is up to
+    the caller. `tenant_id` defaults to the tenant of the current update.
+    """
+    repo = Repo(session, tenant_id)
+    categories: dict[CategoryKind, dict[str, int]] = {
+        CategoryKind.income: {},
+        CategoryKind.expense: {},
+    }
+    counterparties: dict[str, int] = {}
+    errors: list[str] = []
+    error_count = 0
+    imported = 0
+    batch: list[dict] = []
+    # закрытые месяцы неизменяемы — такие строки отклонит триггер в БД
+    closed = await repo.closed_until()
+    # история без счёта — в счёт по умолчанию (касса); счета не создаём:
+    # у них остатки, опечатка в названии не должна заводить новый
+    default_account_id = await repo.default_account_id()
+    accounts = {name.casefold(): aid for aid, name in await repo.list_accounts()}
+
+    def resolve_accounts(line_no: int, row: dict) -> str | None:
+        for key, id_key in (("account", "account_id"), ("to_account", "to_account_id")):
+            name = row.pop(key)
+            if not name:
+                row[id_key] = default_account_id if key == "account" else None
+                continue
+            row[id_key] = accounts.get(name.casefold())
+            if row[id_key] is None:
+                return f"строка {line_no}: неизвестный счёт «{name}»"
+        return None
+
+    async def flush() -> None:
+        nonlocal imported
+        for kind, known in categories.items():
+            unseen = {
+                r["category"]
+                for r in batch
+                if r["category"] and CATEGORY_KIND.get(r["op_type"]) == kind
+            } - known.keys()
+            if unseen:
+                known.update(await repo.ensure_categories_bulk(kind, unseen))
+
+        unseen_cp = {r["counterparty"] for r in batch if r["counterparty"]}
+        unseen_cp -= counterparties.keys()
+        if unseen_cp:
+            counterparties.update(await repo.ensure_counterparties_bulk(unseen_cp))
+
+        records = []
+        for r in batch:
+            kind = CATEGORY_KIND.get(r["op_type"])
+            records.append(
+                (
+                    r["op_type"].value,
+                    r["amount"],
+                    r["comment"],
+                    categories[kind].get(r["category"]) if kind else None,
+                    counterparties.get(r["counterparty"]),
+                    created_by_id,
+                    r["account_id"],
+                    r["to_account_id"],
+                    r["created_at"],
+                )
+            )
+        imported += await repo.copy_operations(records)
+        batch.clear()
+        if progress:
+            await progress(imported)
+
+    source = iter_source_records(path)
+
+    def read_batch() -> list[tuple[int, dict | None, str | None]]:
+        parsed = []
+        for line_no, rec in source:
+            parsed.append((line_no, *parse_record(line_no, rec)))
+            if len(parsed) >= batch_size:
+                break
+        return parsed
+
+    try:
+        while parsed := await asyncio.to_thread(read_batch):
+            for line_no, row, err in parsed:
+                if row and closed and row["created_at"] < closed:
+                    row, err = None, f"строка {line_no}: период закрыт"
+                if row:
+                    err = resolve_accounts(line_no, row)
+                if err:
+                    error_count += 1
+                    if len(errors) < MAX_ERRORS_KEPT:
+                        errors.append(err)
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    await flush()
+    finally:
+        # закрывает XLSX, если импорт прервался; при отмене поток может ещё
+        # читать файл — тогда генератор закроется, когда дочитает пачку
+        try:
+            source.close()
+        except ValueError:
+            pass
+
+    if batch:
+        await flush()
+
+    return {"imported": imported, "error_count": error_count, "errors": errors}
+
+
+async def _run(args: argparse.Namespace) -> None:
+    settings = Settings()
+    engine, session_maker = create_engine_and_session(settings)
+    started = time.monotonic()
+
+    async def progress(done: int) -> None:
+        elapsed = time.monotonic() - started
+        print(f"imported {done} rows ({elapsed:.1f}s)", flush=True)
+
+    try:
+        async with session_maker() as session:
+            repo = Repo(session)
+            tg_id = args.user or settings.OWNER_TELEGRAM_ID
+            user = await repo.get_user_by_tg(tg_id)
+            if not user:
+                raise SystemExit(f"User with telegram_id={tg_id} not found")
+
+            stats = await import_history(
+                session,
+                args.path,
+                user.id,
+                batch_size=args.batch_size,
+                progress=progress,
+                # история — в гараж автора
+                tenant_id=user.tenant_id,
+            )
+            if stats["error_count"] and not args.skip_errors:
+                await session.rollback()
+                for e in stats["errors"]:
+                    print(e)
+                raise SystemExit(
+                    f"{stats['error_count']} invalid rows, nothing imported "
+                    "(use --skip-errors to import valid rows only)"
+                )
+            await session.commit()
+    finally:
+        await engine.dispose()
+
+    for e in stats["errors"]:
+        print(e)
+    print(
+        f"done: imported={stats['imported']} skipped={stats['error_count']} "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Import historical operations from CSV/XLSX"
+    )
+    parser.add_argument("path", help="CSV (UTF-8) or XLSX file")
+    parser.add_argument(
+        "--user",
+        type=int,
+        default=None,
+        help="Telegram ID to record as author (default: OWNER_TELEGRAM_ID)",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--skip-errors",
+        action="store_true",
+        help="Import valid rows even if some rows are invalid",
+    )
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,11 @@ def main_menu(role: UserRole | None = None) -> ReplyKeyboardMarkup:
     # Общие кнопки
     rows = [
         [KeyboardButton(text="🟢 Доход"), KeyboardButton(text="🔴 Расход")],
-        [KeyboardButton(text="🛡 Резерв"), KeyboardButton(text="ℹ️ Баланс")],
+        [
+            KeyboardButton(text="🛡 Резерв"),
+            KeyboardButton(text="🏦 Счета"),
+            KeyboardButton(text="ℹ️ Баланс"),
+        ],
     ]
 
     # Только владелец видит админку и "полные" отчёты
@@ -22,9 +26,20 @@ def main_menu(role: UserRole | None = None) -> ReplyKeyboardMarkup:
             2,
             [KeyboardButton(text="🗂 Категории"), KeyboardButton(text="🏢 Контрагенты")],
         )
-        rows.insert(3, [KeyboardButton(text="📅 Ежемесячные траты")])
+        rows.insert(
+            3,
+            [
+                KeyboardButton(text="📅 Ежемесячные траты"),
+                KeyboardButton(text="📥 Пакетный ввод"),
+            ],
+        )
+    elif role == UserRole.worker:
+        rows.insert(
+            1,
+            [KeyboardButton(text="📊 Отчёты"), KeyboardButton(text="📥 Пакетный ввод")],
+        )
     else:
-        # Работнику/наблюдателю можно оставить быстрый отчёт
+        # Наблюдателю можно оставить быстрый отчёт
         rows.insert(1, [KeyboardButton(text="📊 Отчёты")])
 
     return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
@@ -88,3 +103,17 @@ def expense_counterparty_kb(counterparties) -> InlineKeyboardBuilder:
         kb.button(text=cp.name, callback_data=f"ex:cp:{cp.id}")
     kb.adjust(1)
     return kb
+
+
+def report_job_progress_kb(job_id: int) -> InlineKeyboardBuilder:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="✖️ Отменить", callback_data=f"rj:cancel:{job_id}")
+    kb.adjust(1)
+    return kb
+
+
+def report_job_done_kb(job_id: int) -> InlineKeyboardBuilder:
+    kb = InlineKeyboardBuilder()
+    kb.button(text="⬇️ Скачать снова", callback_data=f"rj:get:{job_id}")
+    kb.adjust(1)
+    return kb
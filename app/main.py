@@ -7,15 +7,29 @@ from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.bootstrap import bootstrap_data
-from app.db import create_engine_and_session
+from app.db import create_engine_and_session, create_replica_engine, replica_routing
 from app.logging_config import setup_logging
+from app.middlewares.chat_queue import ChatQueueMiddleware
 from app.middlewares.db_session import DbSessionMiddleware
+from app.middlewares.dedupe import ProcessedUpdatesMiddleware
 from app.middlewares.user import UserMiddleware
+from app.services.charts import ChartService
+from app.services.data_changes import DataChangeListener
+from app.services.digests import DigestScheduler
+from app.services.exports import ExportService
+from app.services.imports import ImportService
+from app.services.notifier import Notifier
+from app.services.outbox import Outbox, RateLimitMiddleware
+from app.services.partitions import PartitionMaintainer
 from app.settings import Settings
 
 from app.handlers import (
+    accounts,
     admin,
+    budgets,
+    bulk,
     common,
+    digests,
     finance,
     reports,
     counterparties,
@@ -30,13 +44,77 @@ async def main() -> None:
     setup_logging(settings.LOG_LEVEL)
 
     bot = Bot(token=settings.BOT_TOKEN)
+    rate_limiter = RateLimitMiddleware(
+        global_rate=settings.SEND_GLOBAL_RATE,
+        chat_rate=settings.SEND_CHAT_RATE,
+    )
+    bot.session.middleware(rate_limiter)
     dp = Dispatcher(storage=MemoryStorage())
+    # /stats со счётчиками процесса — только владельцу первого гаража
+    dp["process_owner_id"] = settings.OWNER_TELEGRAM_ID
 
-    engine, session_maker = create_engine_and_session(settings)
+    # отчёты и выгрузки читают с реплики, если она настроена
+    replica = create_replica_engine(settings)
+    engine, session_maker = create_engine_and_session(settings, replica)
+    if replica is not None:
+        dp["replica_routing"] = replica_routing
+
+    chat_queue = ChatQueueMiddleware(
+        max_pending=settings.CHAT_QUEUE_MAX_PENDING,
+        max_parallel=settings.MAX_PARALLEL_CHATS,
+    )
+    dp.update.outer_middleware(chat_queue)
+    dp["chat_queue"] = chat_queue
 
     dp.update.middleware(DbSessionMiddleware(session_maker))
+    processed_updates = ProcessedUpdatesMiddleware()
+    dp.update.middleware(processed_updates)
+    dp["processed_updates"] = processed_updates
     dp.update.middleware(UserMiddleware())
 
+    export_service = ExportService(
+        bot,
+        session_maker,
+        workers=settings.EXPORT_WORKERS,
+        queue_size=settings.EXPORT_QUEUE_SIZE,
+        artifacts_dir=settings.REPORTS_DIR,
+        artifact_ttl_hours=settings.REPORT_ARTIFACT_TTL_HOURS,
+    )
+    dp["export_service"] = export_service
+
+    import_service = ImportService(
+        bot, session_maker, queue_size=settings.IMPORT_QUEUE_SIZE
+    )
+    dp["import_service"] = import_service
+
+    outbox = Outbox(bot, queue_size=settings.OUTBOX_QUEUE_SIZE)
+    dp["outbox"] = outbox
+    dp["rate_limiter"] = rate_limiter
+
+    notifier = Notifier(
+        session_maker,
+        outbox,
+        work_start=settings.NOTIFY_WORK_START,
+        work_end=settings.NOTIFY_WORK_END,
+        deviation_k=settings.NOTIFY_DEVIATION_K,
+    )
+    dp["notifier"] = notifier
+
+    digest_scheduler = DigestScheduler(
+        session_maker,
+        outbox,
+        hour=settings.DIGEST_HOUR,
+        weekly_weekday=settings.DIGEST_WEEKDAY,
+    )
+    dp["digest_scheduler"] = digest_scheduler
+
+    chart_service = ChartService(workers=settings.CHART_WORKERS)
+    dp["chart_service"] = chart_service
+
+    # записи CLI (импорт, архив, закрытие месяцев) сбрасывают кэши бота
+    data_changes = DataChangeListener(engine)
+    dp["data_changes"] = data_changes
+
     # Routers
     dp.include_router(common.router)
     dp.include_router(finance.router)
@@ -44,18 +122,44 @@ async def main() -> None:
     dp.include_router(admin.router)
     dp.include_router(counterparties.router)
     dp.include_router(monthly_expenses.router)
+    dp.include_router(bulk.router)
+    dp.include_router(digests.router)
+    dp.include_router(budgets.router)
+    dp.include_router(accounts.router)
 
     # Bootstrap DB data on startup
     async with session_maker() as session:
         await bootstrap_data(session, settings)
+        await processed_updates.load(session)
         await session.commit()
 
+    partitions = PartitionMaintainer(session_maker)
+    await partitions.start()
+
+    await export_service.start()
+    await import_service.start()
+    await outbox.start()
+    await notifier.start()
+    await digest_scheduler.start()
+    await chart_service.start()
+    await data_changes.start()
+
     logger.info("Bot started")
     try:
         await dp.start_polling(bot)
     finally:
+        await data_changes.stop()
+        await chart_service.stop()
+        await digest_scheduler.stop()
+        await notifier.stop()
+        await outbox.stop()
+        await import_service.stop()
+        await export_service.stop()
+        await partitions.stop()
         await bot.session.close()
         await engine.dispose()
+        if replica is not None:
+            await replica.dispose()
 
 
 if __name__ == "__main__":
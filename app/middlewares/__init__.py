@@ -1,3 +1,3 @@
-from . import db_session, user
+from . import chat_queue, db_session, dedupe, user
 
-__all__ = ["db_session", "user"]
+__all__ = ["chat_queue", "db_session", "dedupe", "user"]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class ChatQueueMiddleware(BaseMiddleware):
+    """Processes updates of one chat strictly one after another, different
+    chats in parallel (at most `max_parallel` at once).
+
+    Register as an outer update middleware, before the DB session one:
+    the next update of a chat starts only after the previous one has
+    committed, so a double-tapped "✅ Подтвердить" sees the cleared FSM state.
+    Updates beyond `max_pending` per chat are dropped.
+    """
+
+    def __init__(self, max_pending: int = 5, max_parallel: int = 16):
+        super().__init__()
+        self.max_pending = max_pending
+        self.max_parallel = max_parallel
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._pending: dict[int, int] = {}
+        self._slots = asyncio.Semaphore(max_parallel)
+
+        self.processed = 0
+        self.dropped = 0
+        self.depth_max = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @staticmethod
+    def _key(data: Dict[str, Any]) -> int | None:
+        chat = data.get("event_chat")
+        if chat:
+            return chat.id
+        user = data.get("event_from_user")
+        return user.id if user else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = self._key(data)
+        if key is None:
+            async with self._slots:
+                return await handler(event, data)
+
+        pending = self._pending.get(key, 0)
+        if pending >= self.max_pending:
+            self.dropped += 1
+            logger.warning("chat queue full, update dropped | chat_id=%s", key)
+            return None
+
+        self._pending[key] = pending + 1
+        self.depth_max = max(self.depth_max, pending + 1)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        started = time.monotonic()
+        try:
+            # сначала очередь своего чата, потом общий слот:
+            # ожидающий чат не занимает слот у остальных
+            async with lock, self._slots:
+                waited = time.monotonic() - started
+                if pending:
+                    self.waited += 1
+                    self.wait_total += waited
+                    self.wait_max = max(self.wait_max, waited)
+                self.processed += 1
+                return await handler(event, data)
+        finally:
+            left = self._pending[key] - 1
+            if left:
+                self._pending[key] = left
+            else:
+                del self._pending[key]
+                del self._locks[key]
+
+    def stats(self) -> str:
+        depth = sum(self._pending.values())
+        avg = (self.wait_total / self.waited * 1000) if self.waited else 0.0
+        return (
+            f"Очередь чатов: в работе {len(self._pending)} чат(ов), "
+            f"апдейтов {depth} (макс. на чат {self.depth_max}), "
+            f"обработано {self.processed}, отброшено {self.dropped}, "
+            f"ждали {self.waited} (ср. {avg:.0f} мс / макс. "
+            f"{self.wait_max * 1000:.0f} мс)"
+        )
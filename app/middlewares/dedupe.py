@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repository import Repo
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessedUpdatesMiddleware(BaseMiddleware):
+    """Skips Telegram updates that were already processed (redelivery after
+    a network error or restart).
+
+    Recent update_ids are kept in a bounded in-memory set; the source of
+    truth is the `processed_updates` table, written in the handler's own
+    transaction — an update whose handler failed is not marked. Register
+    after `DbSessionMiddleware`.
+
+    Its INSERT is the first statement of every update, so it is also where
+    a dead pooled connection shows up (the pool runs without pre-ping):
+    nothing has been sent yet, and the update is retried once on a fresh
+    connection.
+    """
+
+    def __init__(self, maxsize: int = 10_000, keep_days: int = 7):
+        super().__init__()
+        self.maxsize = maxsize
+        self.keep_days = keep_days
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self.skipped = 0
+        self.reconnects = 0
+
+    def _remember(self, update_id: int) -> None:
+        self._seen[update_id] = None
+        while len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+
+    async def load(self, session: AsyncSession) -> None:
+        """Prunes old rows and warms the in-memory set (call on startup)."""
+        repo = Repo(session)
+        before = datetime.now(timezone.utc) - timedelta(days=self.keep_days)
+        pruned = await repo.prune_processed_updates(before)
+        for update_id in reversed(await repo.recent_update_ids(self.maxsize)):
+            self._remember(update_id)
+        logger.info(
+            "processed updates loaded | cached=%s | pruned=%s", len(self._seen), pruned
+        )
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        update_id = event.update_id
+        if update_id in self._seen:
+            self.skipped += 1
+            logger.info("update skipped (already processed) | update_id=%s", update_id)
+            return None
+
+        if not await self._mark(data["session"], update_id):
+            self.skipped += 1
+            self._remember(update_id)
+            logger.info("update skipped (already processed) | update_id=%s", update_id)
+            return None
+
+        result = await handler(event, data)
+        self._remember(update_id)
+        return result
+
+    async def _mark(self, session: AsyncSession, update_id: int) -> bool:
+        try:
+            return await Repo(session).mark_update_processed(update_id)
+        except DBAPIError as e:
+            if not e.connection_invalidated:
+                raise
+            self.reconnects += 1
+            logger.warning("DB reconnect before update | update_id=%s", update_id)
+            await session.rollback()
+            return await Repo(session).mark_update_processed(update_id)
+
+    def stats(self) -> str:
+        return (
+            f"Повторные апдейты: пропущено {self.skipped}, "
+            f"в памяти {len(self._seen)}/{self.maxsize}, "
+            f"переподключений к БД {self.reconnects}"
+        )
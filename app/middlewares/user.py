@@ -3,6 +3,7 @@ from aiogram.types import TelegramObject
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repository import Repo
+from app.tenancy import TENANT, current_tenant
 
 
 class UserMiddleware(BaseMiddleware):
@@ -14,4 +15,16 @@ class UserMiddleware(BaseMiddleware):
             data["user"] = await repo.get_user_by_tg(tg_user.id)
         else:
             data["user"] = None
-        return await handler(event, data)
+
+        user = data["user"]
+        if user is None:
+            return await handler(event, data)
+
+        # дальше всё — в гараже пользователя: Repo(session) в хендлерах,
+        # кэши и версия данных
+        token = current_tenant.set(user.tenant_id)
+        session.info[TENANT] = user.tenant_id
+        try:
+            return await handler(event, data)
+        finally:
+            current_tenant.reset(token)
@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 import enum
-from datetime import datetime
+from datetime import date, datetime
 
 from sqlalchemy import (
     BigInteger,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -29,12 +32,32 @@ class OperationType(str, enum.Enum):
     expense = "expense"
     reserve_in = "reserve_in"  # move money into reserve
     reserve_out = "reserve_out"  # move money out of reserve
+    transfer = "transfer"  # move money between accounts (account -> to_account)
+
+
+class Tenant(Base):
+    """Гараж: отдельный бизнес со своими пользователями, счетами и операциями.
+
+    Все данные гаража несут tenant_id; Telegram-пользователь состоит ровно
+    в одном гараже.
+    """
+
+    __tablename__ = "tenants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(128), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
 
 
 class User(Base):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True
+    )
     telegram_id: Mapped[int] = mapped_column(
         BigInteger, unique=True, index=True, nullable=False
     )
@@ -46,10 +69,47 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
+    # счёт, выбранный пользователем в последний раз, — предлагается первым
+    default_account_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("accounts.id", ondelete="SET NULL"), nullable=True
+    )
 
     operations: Mapped[list["Operation"]] = relationship(back_populates="created_by")
 
 
+class Account(Base):
+    """Место хранения денег: касса, карта, расчётный счёт."""
+
+    __tablename__ = "accounts"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_accounts_tenant_name"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    name: Mapped[str] = mapped_column(String(64), nullable=False)
+    is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class AccountBalance(Base):
+    """Текущий остаток счёта, ведётся инкрементально при записи операций.
+
+    Отдельная таблица: часто обновляемая строка не трогает сам счёт.
+    """
+
+    __tablename__ = "account_balances"
+
+    account_id: Mapped[int] = mapped_column(
+        ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True
+    )
+    balance: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
 class CategoryKind(str, enum.Enum):
     income = "income"
     expense = "expense"
@@ -57,19 +117,37 @@ class CategoryKind(str, enum.Enum):
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_categories_tenant_kind_name", "tenant_id", "kind", "name"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
     kind: Mapped[CategoryKind] = mapped_column(
         Enum(CategoryKind, name="category_kind"), nullable=False
     )
     name: Mapped[str] = mapped_column(String(64), nullable=False)
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
+    # операция от этой суммы — уведомление владельцам
+    notify_threshold: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
 
 class Operation(Base):
+    """Секционирована по месяцам created_at (см. миграцию partition_operations),
+    поэтому created_at входит в первичный ключ."""
+
     __tablename__ = "operations"
+    __table_args__ = (
+        Index("ix_operations_tenant_created_at", "tenant_id", "created_at"),
+        Index("ix_operations_tenant_id", "tenant_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
     op_type: Mapped[OperationType] = mapped_column(
         Enum(OperationType, name="operation_type"), nullable=False
     )
@@ -90,19 +168,54 @@ class Operation(Base):
         ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
 
+    account_id: Mapped[int] = mapped_column(
+        ForeignKey("accounts.id"), nullable=False
+    )
+    # только для transfer: счёт-получатель
+    to_account_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("accounts.id"), nullable=True
+    )
+
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        primary_key=True,
     )
 
     created_by: Mapped[User] = relationship(back_populates="operations")
     category: Mapped[Category | None] = relationship()
     counterparty: Mapped[Optional["Counterparty"]] = relationship()
+    account: Mapped[Account] = relationship(foreign_keys=[account_id])
+    to_account: Mapped[Account | None] = relationship(foreign_keys=[to_account_id])
+
+
+class OperationDedupe(Base):
+    """Ключ идемпотентности операции ("chat_id:message_id" подтверждения).
+
+    Отдельная таблица: уникальный индекс на секционированной operations
+    обязан включать created_at, а ключ должен быть уникален глобально.
+    """
+
+    __tablename__ = "operation_dedupe"
+
+    dedupe_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    operation_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
 
 
 class Counterparty(Base):
     __tablename__ = "counterparties"
+    __table_args__ = (
+        Index("ix_counterparties_tenant_name", "tenant_id", "name"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
     name: Mapped[str] = mapped_column(String(128), nullable=False)
     comment: Mapped[str | None] = mapped_column(Text, nullable=True)
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
@@ -113,8 +226,14 @@ class Counterparty(Base):
 
 class MonthlyExpense(Base):
     __tablename__ = "monthly_expenses"
+    __table_args__ = (
+        Index("ix_monthly_expenses_tenant_day", "tenant_id", "day_of_month"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
 
     # Например: "Аренда", "Подписка", "Интернет", "Закупка фреона"
     title: Mapped[str] = mapped_column(String(128), nullable=False)
@@ -139,3 +258,214 @@ class MonthlyExpense(Base):
 
     category: Mapped[Optional["Category"]] = relationship()
     counterparty: Mapped[Optional["Counterparty"]] = relationship()
+
+
+class Budget(Base):
+    """Лимит расходов категории на месяц (по МСК).
+
+    `spent` ведётся инкрементально при записи расходов, чтобы проверка
+    бюджета не пересчитывала операции.
+    """
+
+    __tablename__ = "budgets"
+    __table_args__ = (
+        UniqueConstraint("category_id", "month", name="uq_budgets_category_month"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    category_id: Mapped[int] = mapped_column(
+        ForeignKey("categories.id", ondelete="CASCADE"), nullable=False
+    )
+    month: Mapped[date] = mapped_column(Date, nullable=False)  # 1-е число
+    limit_amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    spent: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    category: Mapped["Category"] = relationship()
+
+
+class ReportJobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    fmt: Mapped[str] = mapped_column(String(8), nullable=False)  # csv/xlsx
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)  # all/income/expense
+    start_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    end_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # фильтр по автору операций (worker/viewer видят только свои); NULL = все
+    scope_user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    status: Mapped[ReportJobStatus] = mapped_column(
+        Enum(ReportJobStatus, name="report_job_status"),
+        nullable=False,
+        default=ReportJobStatus.queued,
+        index=True,
+    )
+    rows_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    progress_message_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger, nullable=True
+    )
+    file_path: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    finished_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+
+class ReportArtifact(Base):
+    """Telegram file_id уже отправленного отчёта — повторно шлём по id,
+    без генерации и загрузки файла."""
+
+    __tablename__ = "report_artifacts"
+    __table_args__ = (
+        Index(
+            "ix_report_artifacts_lookup",
+            "tenant_id",
+            "fmt",
+            "kind",
+            "start_at",
+            "end_at",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    fmt: Mapped[str] = mapped_column(String(8), nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    start_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    end_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    scope_user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    file_id: Mapped[str] = mapped_column(String(256), nullable=False)
+    rows: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class ProcessedUpdate(Base):
+    """Уже обработанные Telegram update_id (защита от повторной доставки)."""
+
+    __tablename__ = "processed_updates"
+
+    update_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    processed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class DigestSubscription(Base):
+    """Подписка пользователя на сводку: daily / weekly."""
+
+    __tablename__ = "digest_subscriptions"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period", name="uq_digest_user_period"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    period: Mapped[str] = mapped_column(String(16), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class ArchivedPeriod(Base):
+    """Месяц, перенесённый из operations в сжатый файл (холодный архив).
+
+    Итоги по типам — снимок на момент архивации: баланс считается как
+    горячие операции + эти суммы.
+    """
+
+    __tablename__ = "archived_periods"
+    __table_args__ = (
+        UniqueConstraint(
+            "tenant_id", "period_start", name="uq_archived_periods_start"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    period_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    period_end: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    file_path: Mapped[str] = mapped_column(Text, nullable=False)
+    rows: Mapped[int] = mapped_column(Integer, nullable=False)
+    income: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    expense: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    reserve_in: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    reserve_out: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class PeriodSnapshot(Base):
+    """Закрытый месяц: накопленные итоги по типам на конец периода.
+
+    Строки неизменяемы; операции с created_at раньше последнего period_end
+    отклоняет триггер в БД. Баланс = последний снимок + операции после него.
+    """
+
+    __tablename__ = "period_snapshots"
+    __table_args__ = (
+        UniqueConstraint(
+            "tenant_id", "period_start", name="uq_period_snapshots_start"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tenant_id: Mapped[int] = mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    period_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    period_end: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    income: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    expense: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    reserve_in: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    reserve_out: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    closed_by_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    closed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
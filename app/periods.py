@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import create_engine_and_session
+from app.repository import BALANCE_TYPES, Repo
+from app.settings import Settings
+from app.tenancy import DEFAULT_TENANT_ID
+from app.utils.archive_files import ArchiveReader
+
+logger = logging.getLogger(__name__)
+
+
+def previous_month(today: date) -> date:
+    return (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+async def _recount(
+    repo: Repo, start: datetime | None, end: datetime
+) -> tuple[dict[str, int], int]:
+    """Sums [start, end) from scratch: hot rows and archive files, batch by
+    batch. Returns ({op_type: sum}, rows)."""
+    sums = {t.value: 0 for t in BALANCE_TYPES}
+    rows = 0
+    async for batch in repo.stream_type_amounts(start, end):
+        rows += len(batch)
+        for op_type, amount in batch:
+            if op_type.value in sums:
+                sums[op_type.value] += amount
+
+    loop = asyncio.get_running_loop()
+    for period in await repo.list_archived_periods(start, end):
+        if period.period_end > end or (start and period.period_start < start):
+            continue
+        reader = await loop.run_in_executor(
+            None, ArchiveReader, period.file_path, None, None, None
+        )
+        try:
+            while batch := await loop.run_in_executor(None, reader.next_batch):
+                rows += len(batch)
+                for rec in batch:
+                    if rec[1].value in sums:
+                        sums[rec[1].value] += rec[2]
+        finally:
+            await loop.run_in_executor(None, reader.close)
+    return sums, rows
+
+
+async def verify_snapshots(
+    session: AsyncSession, tenant_id: int = DEFAULT_TENANT_ID
+) -> list[str]:
+    """Recomputes every closed period of the tenant and its account balances
+    total; returns drift descriptions (empty when everything matches)."""
+    repo = Repo(session, tenant_id)
+    drift = []
+    acc = {t.value: 0 for t in BALANCE_TYPES}
+    prev_end = None
+    for snap in await repo.list_snapshots():
+        started = time.monotonic()
+        if prev_end and snap.period_start != prev_end:
+            drift.append(f"{snap.period_start:%Y-%m}: gap after {prev_end:%Y-%m-%d}")
+        sums, rows = await _recount(repo, prev_end, snap.period_end)
+        for key, value in sums.items():
+            acc[key] += value
+        bad = {
+            key: getattr(snap, key) - acc[key]
+            for key in acc
+            if getattr(snap, key) != acc[key]
+        }
+        if bad:
+            parts = ", ".join(f"{k} {d:+d}" for k, d in bad.items())
+            drift.append(f"{snap.period_start:%Y-%m}: snapshot drift {parts}")
+        print(
+            f"{snap.period_start:%Y-%m}: {rows} rows, "
+            f"{'DRIFT' if bad else 'ok'} ({time.monotonic() - started:.1f}s)",
+            flush=True,
+        )
+        prev_end = snap.period_end
+
+    # остатки счетов ведутся инкрементально — их сумма должна совпасть
+    # с доходами минус расходы за всю историю
+    sums, _ = await _recount(repo, prev_end, datetime.now(timezone.utc))
+    for key, value in sums.items():
+        acc[key] += value
+    diff = await repo.total_account_balance() - (acc["income"] - acc["expense"])
+    if diff:
+        drift.append(f"accounts: balance drift {diff:+d}")
+    return drift
+
+
+async def _run(args: argparse.Namespace) -> None:
+    settings = Settings()
+    engine, session_maker = create_engine_and_session(settings)
+    try:
+        async with session_maker() as session:
+            if args.command == "close":
+                month = (
+                    date.fromisoformat(args.month + "-01")
+                    if args.month
+                    else previous_month(datetime.now(timezone.utc).date())
+                )
+                ok, msg = await Repo(session, args.tenant).close_month(month)
+                if not ok:
+                    raise SystemExit(msg)
+                await session.commit()
+                print(msg)
+                return
+
+            drift = await verify_snapshots(session, args.tenant)
+    finally:
+        await engine.dispose()
+
+    for line in drift:
+        print(line)
+    if drift:
+        raise SystemExit(f"{len(drift)} problem(s) found")
+    print("all snapshots and account balances match")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Closed periods (month snapshots)")
+    parser.add_argument(
+        "--tenant",
+        type=int,
+        default=DEFAULT_TENANT_ID,
+        help=f"garage id (default: {DEFAULT_TENANT_ID})",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    close = sub.add_parser("close", help="close a month (default: previous one)")
+    close.add_argument("month", nargs="?", default=None, help="YYYY-MM")
+    sub.add_parser("verify", help="recompute snapshots and report drift")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,39 @@
 from __future__ import annotations
 
-from datetime import datetime
+import time
+from datetime import date, datetime, timezone
+from typing import AsyncIterator
+from zoneinfo import ZoneInfo
 
-from sqlalchemy import Select, and_, func, select
+from sqlalchemy import (
+    Select,
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
+from app.cache import (
+    accounts_cache,
+    balance_flight,
+    categories_flight,
+    mark_data_changed,
+    memoize,
+)
+from app.events import OperationAdded, record_operation
 from app.models import (
+    Account,
+    AccountBalance,
+    ArchivedPeriod,
+    Budget,
     Category,
     CategoryKind,
     Operation,
@@ -14,27 +41,148 @@ from app.models import (
     User,
     UserRole,
     Counterparty,
+    DigestSubscription,
     MonthlyExpense,
+    OperationDedupe,
+    PeriodSnapshot,
+    ProcessedUpdate,
+    ReportArtifact,
+    ReportJob,
+    ReportJobStatus,
+    Tenant,
+)
+from app.tenancy import TENANT, current_tenant
+
+OPERATION_COPY_COLUMNS = (
+    "op_type",
+    "amount",
+    "comment",
+    "category_id",
+    "counterparty_id",
+    "created_by_id",
+    "account_id",
+    "to_account_id",
+    "created_at",
 )
 
 
+MSK = ZoneInfo("Europe/Moscow")
+
+# Ключ advisory-lock'а для операций, уменьшающих "доступно"/резерв.
+# Приход (income) его не берёт — он не может увести баланс в минус.
+# Блокировки двухключевые (ключ, tenant_id): гаражи друг друга не ждут.
+BALANCE_LOCK_KEY = 7_001_001
+# Закрытие месяца гаража: эксклюзивно у close_month, разделяемо у записи
+# операций — закрытие ждёт незакоммиченные вставки только своего гаража
+PERIOD_CLOSE_LOCK_KEY = 7_001_002
+
+BALANCE_TYPES = (
+    OperationType.income,
+    OperationType.expense,
+    OperationType.reserve_in,
+    OperationType.reserve_out,
+)
+
+
+def account_deltas(
+    deltas: dict[int, int],
+    op_type: OperationType,
+    amount: int,
+    account_id: int,
+    to_account_id: int | None = None,
+) -> None:
+    """Adds the operation's effect on account balances to `deltas`.
+    Reserve moves only earmark money and leave accounts as they are."""
+    if op_type == OperationType.income:
+        deltas[account_id] = deltas.get(account_id, 0) + amount
+    elif op_type == OperationType.expense:
+        deltas[account_id] = deltas.get(account_id, 0) - amount
+    elif op_type == OperationType.transfer:
+        deltas[account_id] = deltas.get(account_id, 0) - amount
+        deltas[to_account_id] = deltas.get(to_account_id, 0) + amount
+
+
+def budget_month(dt: datetime) -> date:
+    """First day of the MSK month of `dt` — the key of `Budget.month`."""
+    d = dt.astimezone(MSK)
+    return date(d.year, d.month, 1)
+
+
+class LockStats:
+    """Counters for the balance lock (shown in /stats)."""
+
+    def __init__(self):
+        self.acquired = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, contended: bool, waited: float) -> None:
+        self.acquired += 1
+        if contended:
+            self.contended += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def stats(self) -> str:
+        avg = (self.wait_total / self.contended * 1000) if self.contended else 0.0
+        return (
+            f"balance lock: взято {self.acquired}, ждали {self.contended}, "
+            f"ожидание ср. {avg:.1f} мс / макс. {self.wait_max * 1000:.1f} мс"
+        )
+
+
+balance_lock_stats = LockStats()
+
+
 class Repo:
-    def __init__(self, session: AsyncSession):
+    """Data access for one tenant (garage).
+
+    `tenant_id` defaults to the tenant of the current update (set by
+    `UserMiddleware`); every query on tenant data is filtered by it, lookups
+    by id included, so an id from another garage is simply "not found".
+    """
+
+    def __init__(self, session: AsyncSession, tenant_id: int | None = None):
         self.s = session
+        self.tenant_id = tenant_id or current_tenant.get()
+        # кэши и версия данных берут гараж из сессии
+        session.info[TENANT] = self.tenant_id
+
+    def _own(self, model):
+        return model.tenant_id == self.tenant_id
+
+    # ----- Tenants -----
+    async def list_tenants(self) -> list[Tenant]:
+        res = await self.s.execute(select(Tenant).order_by(Tenant.id))
+        return list(res.scalars().all())
+
+    async def list_tenant_ids(self) -> list[int]:
+        res = await self.s.execute(select(Tenant.id).order_by(Tenant.id))
+        return list(res.scalars().all())
+
+    async def create_tenant(self, name: str) -> Tenant:
+        tenant = Tenant(name=" ".join((name or "").split()))
+        self.s.add(tenant)
+        await self.s.flush()
+        return tenant
 
     # ----- Users -----
     async def get_user_by_tg(self, telegram_id: int) -> User | None:
+        """Global lookup: a Telegram account belongs to exactly one garage."""
         res = await self.s.execute(
             select(User).where(User.telegram_id == telegram_id, User.is_active == True)
         )
         return res.scalar_one_or_none()
 
     async def count_users(self) -> int:
-        res = await self.s.execute(select(func.count(User.id)))
+        res = await self.s.execute(
+            select(func.count(User.id)).where(self._own(User))
+        )
         return int(res.scalar_one())
 
     async def list_users(self, active_only: bool = True) -> list[User]:
-        stmt = select(User).order_by(User.created_at.asc())
+        stmt = select(User).where(self._own(User)).order_by(User.created_at.asc())
         if active_only:
             stmt = stmt.where(User.is_active == True)
         res = await self.s.execute(stmt)
@@ -47,6 +195,8 @@ class Repo:
 
         if u:
             # 2) "добавление заново" = реактивация + обновление полей
+            # (отключённый в другом гараже переходит в этот)
+            u.tenant_id = self.tenant_id
             u.name = name
             u.role = role
             u.is_active = True
@@ -54,34 +204,190 @@ class Repo:
             return u
 
         # 3) иначе создаём нового
-        u = User(telegram_id=telegram_id, name=name, role=role, is_active=True)
+        u = User(
+            tenant_id=self.tenant_id,
+            telegram_id=telegram_id,
+            name=name,
+            role=role,
+            is_active=True,
+        )
         self.s.add(u)
         await self.s.flush()
         return u
 
     async def delete_user(self, telegram_id: int) -> bool:
-        res = await self.s.execute(select(User).where(User.telegram_id == telegram_id))
+        res = await self.s.execute(
+            select(User).where(User.telegram_id == telegram_id, self._own(User))
+        )
         user = res.scalar_one_or_none()
         if not user:
             return False
         user.is_active = False
         return True
 
-    # ----- Categories -----
-    async def list_categories(self, kind: CategoryKind) -> list[Category]:
+    # ----- Accounts -----
+    async def list_accounts(self) -> list[tuple[int, str]]:
+        """(id, name) of active accounts, cached until data changes."""
+
+        async def fetch() -> list[tuple[int, str]]:
+            res = await self.s.execute(
+                select(Account.id, Account.name)
+                .where(self._own(Account), Account.is_active == True)
+                .order_by(Account.id)
+            )
+            return [tuple(r) for r in res.all()]
+
+        return await memoize(accounts_cache, "active", self.s, fetch)
+
+    async def default_account_id(self, user: User | None = None) -> int:
+        """The user's last chosen account if still active, else the first."""
+        accounts = await self.list_accounts()
+        ids = [aid for aid, _ in accounts]
+        if user and user.default_account_id in ids:
+            return user.default_account_id
+        return ids[0]
+
+    async def set_default_account(self, user_id: int, account_id: int) -> None:
+        await self.s.execute(
+            update(User)
+            .where(User.id == user_id, self._own(User))
+            .values(default_account_id=account_id)
+        )
+
+    async def create_account(self, name: str) -> tuple[bool, str]:
+        name = (name or "").strip()
+        if not name:
+            return False, "Название пустое."
+        if len(name) > 64:
+            return False, "Слишком длинное название (макс. 64)."
         res = await self.s.execute(
-            select(Category)
-            .where(Category.kind == kind, Category.is_active == True)
-            .order_by(Category.name.asc())
+            select(Account).where(
+                self._own(Account), func.lower(Account.name) == name.lower()
+            )
         )
-        return list(res.scalars().all())
+        if res.scalar_one_or_none():
+            return False, "Такой счёт уже есть."
+        account = Account(tenant_id=self.tenant_id, name=name)
+        self.s.add(account)
+        await self.s.flush()
+        self.s.add(AccountBalance(account_id=account.id, balance=0))
+        await self.s.flush()
+        return True, f"✅ Счёт добавлен: {name}"
+
+    async def account_balances(self) -> list[tuple[int, str, int]]:
+        """(id, name, balance) of active accounts — one row per account."""
+        res = await self.s.execute(
+            select(
+                Account.id,
+                Account.name,
+                func.coalesce(AccountBalance.balance, 0),
+            )
+            .outerjoin(AccountBalance, AccountBalance.account_id == Account.id)
+            .where(self._own(Account), Account.is_active == True)
+            .order_by(Account.id)
+        )
+        return [(aid, name, int(bal)) for aid, name, bal in res.all()]
+
+    async def account_balance(self, account_id: int) -> int:
+        res = await self.s.execute(
+            select(AccountBalance.balance)
+            .join(Account, Account.id == AccountBalance.account_id)
+            .where(AccountBalance.account_id == account_id, self._own(Account))
+        )
+        return int(res.scalar_one_or_none() or 0)
+
+    async def total_account_balance(self) -> int:
+        res = await self.s.execute(
+            select(func.coalesce(func.sum(AccountBalance.balance), 0))
+            .join(Account, Account.id == AccountBalance.account_id)
+            .where(self._own(Account))
+        )
+        return int(res.scalar_one())
+
+    async def _move_accounts(self, deltas: dict[int, int]) -> None:
+        for account_id, delta in deltas.items():
+            if delta:
+                await self.s.execute(
+                    update(AccountBalance)
+                    .where(AccountBalance.account_id == account_id)
+                    .values(balance=AccountBalance.balance + delta)
+                )
+
+    async def post_transfer(
+        self,
+        from_account_id: int,
+        to_account_id: int,
+        amount: int,
+        created_by_id: int,
+        comment: str | None = None,
+        dedupe_key: str | None = None,
+    ) -> tuple[Operation | None, int]:
+        """Moves money between accounts if the source has enough.
+
+        Returns (operation, source balance before) — (None, balance) when
+        there is not enough. Checked under the balance lock like `post_checked`.
+        """
+        await self.lock_balance()
+        available = await self.account_balance(from_account_id)
+        if dedupe_key:
+            existing = await self.get_operation_by_dedupe_key(dedupe_key)
+            if existing:
+                return existing, available
+        if amount > available:
+            return None, available
+        op = await self.add_operation(
+            op_type=OperationType.transfer,
+            amount=amount,
+            created_by_id=created_by_id,
+            comment=comment,
+            dedupe_key=dedupe_key,
+            account_id=from_account_id,
+            to_account_id=to_account_id,
+        )
+        return op, available
+
+    # ----- Categories -----
+    async def list_categories(self, kind: CategoryKind) -> list[Category]:
+        """Active categories of `kind`.
+
+        Concurrent identical calls share one query; every caller gets its own
+        detached (transient) Category objects, so nothing is bound to another
+        update's session.
+        """
+
+        async def fetch() -> list[tuple]:
+            res = await self.s.execute(
+                select(Category.id, Category.name)
+                .where(
+                    self._own(Category),
+                    Category.kind == kind,
+                    Category.is_active == True,
+                )
+                .order_by(Category.name.asc())
+            )
+            return [tuple(r) for r in res.all()]
+
+        rows = await categories_flight.do(("categories", kind), self.s, fetch)
+        return [
+            Category(
+                id=cid,
+                tenant_id=self.tenant_id,
+                kind=kind,
+                name=name,
+                is_active=True,
+            )
+            for cid, name in rows
+        ]
 
     async def get_category_by_name(
         self, kind: CategoryKind, name: str
     ) -> Category | None:
         res = await self.s.execute(
             select(Category).where(
-                Category.kind == kind, Category.name == name, Category.is_active == True
+                self._own(Category),
+                Category.kind == kind,
+                Category.name == name,
+                Category.is_active == True,
             )
         )
         return res.scalar_one_or_none()
@@ -94,23 +400,114 @@ class Repo:
                 continue
             if not await self.get_category_by_name(CategoryKind.income, n):
                 self.s.add(
-                    Category(kind=CategoryKind.income, name=n.strip(), is_active=True)
+                    Category(
+                        tenant_id=self.tenant_id,
+                        kind=CategoryKind.income,
+                        name=n.strip(),
+                        is_active=True,
+                    )
                 )
         for n in expense_names:
             if not n:
                 continue
             if not await self.get_category_by_name(CategoryKind.expense, n):
                 self.s.add(
-                    Category(kind=CategoryKind.expense, name=n.strip(), is_active=True)
+                    Category(
+                        tenant_id=self.tenant_id,
+                        kind=CategoryKind.expense,
+                        name=n.strip(),
+                        is_active=True,
+                    )
+                )
+
+    async def ensure_categories_bulk(
+        self, kind: CategoryKind, names: set[str]
+    ) -> dict[str, int]:
+        """Returns name -> id for active categories, creating missing ones
+        with a single INSERT."""
+        names = {" ".join(n.split()) for n in names if n and n.strip()}
+        if not names:
+            return {}
+        res = await self.s.execute(
+            select(Category.name, Category.id).where(
+                self._own(Category),
+                Category.kind == kind,
+                Category.is_active == True,
+                Category.name.in_(names),
+            )
+        )
+        found = {name: cid for name, cid in res.all()}
+        missing = sorted(names - found.keys())
+        if missing:
+            res = await self.s.execute(
+                insert(Category)
+                .values(
+                    [
+                        {
+                            "tenant_id": self.tenant_id,
+                            "kind": kind,
+                            "name": n,
+                            "is_active": True,
+                        }
+                        for n in missing
+                    ]
                 )
+                .returning(Category.name, Category.id)
+            )
+            mark_data_changed(self.s)
+            found.update({name: cid for name, cid in res.all()})
+        return found
 
     async def get_category(self, category_id: int) -> Category | None:
-        res = await self.s.execute(select(Category).where(Category.id == category_id))
+        res = await self.s.execute(
+            select(Category).where(Category.id == category_id, self._own(Category))
+        )
         return res.scalar_one_or_none()
 
+    async def get_categories(self, ids: set[int]) -> dict[int, Category]:
+        if not ids:
+            return {}
+        res = await self.s.execute(
+            select(Category).where(Category.id.in_(ids), self._own(Category))
+        )
+        return {c.id: c for c in res.scalars().all()}
+
+    async def set_category_threshold(
+        self, category_id: int, amount: int | None
+    ) -> tuple[bool, str]:
+        cat = await self.get_category(category_id)
+        if not cat or not cat.is_active:
+            return False, "Категория не найдена."
+        cat.notify_threshold = amount or None
+        if cat.notify_threshold:
+            return True, f"✅ Порог уведомления: {amount} ₽"
+        return True, "✅ Порог уведомления снят."
+
+    async def category_amount_stats(
+        self, since: datetime
+    ) -> list[tuple[int, int, float, float]]:
+        """(category_id, count, avg, stddev) of amounts since `since`."""
+        res = await self.s.execute(
+            select(
+                Operation.category_id,
+                func.count(Operation.id),
+                func.avg(Operation.amount),
+                func.coalesce(func.stddev_samp(Operation.amount), 0),
+            )
+            .where(
+                self._own(Operation),
+                Operation.category_id.is_not(None),
+                Operation.created_at >= since,
+            )
+            .group_by(Operation.category_id)
+        )
+        return [(cid, int(n), float(avg), float(sd)) for cid, n, avg, sd in res.all()]
+
     async def category_usage_count(self, category_id: int) -> int:
         res = await self.s.execute(
-            select(func.count(Operation.id)).where(Operation.category_id == category_id)
+            select(func.count(Operation.id)).where(
+                self._own(Operation), Operation.category_id == category_id
+            )
         )
         return int(res.scalar_one())
 
@@ -120,7 +517,7 @@ class Repo:
         existing = await self.get_category_by_name(kind, name)
         if existing:
             return existing
-        cat = Category(kind=kind, name=name, is_active=True)
+        cat = Category(tenant_id=self.tenant_id, kind=kind, name=name, is_active=True)
         self.s.add(cat)
         await self.s.flush()
         return cat
@@ -159,9 +556,118 @@ class Repo:
         cat.is_active = False
         return True, "✅ Категория удалена."
 
+    # ----- Budgets -----
+    async def get_budget(self, category_id: int, month: date) -> Budget | None:
+        res = await self.s.execute(
+            select(Budget).where(
+                Budget.category_id == category_id, Budget.month == month
+            )
+        )
+        return res.scalar_one_or_none()
+
+    async def set_budget(
+        self, category_id: int, month: date, limit_amount: int
+    ) -> tuple[bool, str]:
+        """Sets the category's limit for `month`; 0 removes the budget. A new
+        budget starts with the month's spend so far."""
+        cat = await self.get_category(category_id)
+        if not cat or not cat.is_active or cat.kind != CategoryKind.expense:
+            return False, "Категория не найдена."
+
+        # расходы пишутся под этой же блокировкой — стартовый spent не
+        # разойдётся с инкрементом от параллельной записи
+        await self.lock_balance()
+        budget = await self.get_budget(category_id, month)
+        if not limit_amount:
+            if budget:
+                await self.s.delete(budget)
+            return True, "✅ Бюджет снят."
+
+        if budget:
+            budget.limit_amount = limit_amount
+        else:
+            start = datetime(month.year, month.month, 1, tzinfo=MSK)
+            end = datetime(
+                month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=MSK
+            )
+            res = await self.s.execute(
+                select(func.coalesce(func.sum(Operation.amount), 0)).where(
+                    self._own(Operation),
+                    Operation.op_type == OperationType.expense,
+                    Operation.category_id == category_id,
+                    Operation.created_at >= start,
+                    Operation.created_at < end,
+                )
+            )
+            self.s.add(
+                Budget(
+                    category_id=category_id,
+                    month=month,
+                    limit_amount=limit_amount,
+                    spent=int(res.scalar_one()),
+                )
+            )
+        await self.s.flush()
+        return True, f"✅ Бюджет на {month:%m.%Y}: {limit_amount} ₽"
+
+    async def budget_status(self, month: date) -> list[tuple[str, int, int]]:
+        """(category name, limit, spent) of every budget for `month`."""
+        res = await self.s.execute(
+            select(Category.name, Budget.limit_amount, Budget.spent)
+            .join(Category, Category.id == Budget.category_id)
+            .where(self._own(Category), Budget.month == month)
+            .order_by(Category.name)
+        )
+        return [(name, limit, int(spent)) for name, limit, spent in res.all()]
+
+    async def _add_budget_spend(self, spend: dict[tuple[int, date], int]) -> None:
+        """Adds expense amounts to `spent` of matching budgets, if any."""
+        for (category_id, month), amount in spend.items():
+            await self.s.execute(
+                update(Budget)
+                .where(Budget.category_id == category_id, Budget.month == month)
+                .values(spent=Budget.spent + amount)
+            )
+
+    # ----- Digests -----
+    async def list_digest_periods(self, user_id: int) -> set[str]:
+        res = await self.s.execute(
+            select(DigestSubscription.period).where(
+                DigestSubscription.user_id == user_id
+            )
+        )
+        return set(res.scalars().all())
+
+    async def toggle_digest(self, user_id: int, period: str) -> bool:
+        """Subscribes or unsubscribes; returns True if now subscribed."""
+        res = await self.s.execute(
+            delete(DigestSubscription).where(
+                DigestSubscription.user_id == user_id,
+                DigestSubscription.period == period,
+            )
+        )
+        if res.rowcount:
+            return False
+        self.s.add(DigestSubscription(user_id=user_id, period=period))
+        await self.s.flush()
+        return True
+
+    async def list_digest_subscribers(self, period: str) -> list[User]:
+        """Subscribers of every garage: the scheduler groups them itself."""
+        res = await self.s.execute(
+            select(User)
+            .join(DigestSubscription, DigestSubscription.user_id == User.id)
+            .where(DigestSubscription.period == period, User.is_active == True)
+        )
+        return list(res.scalars().all())
+
     # ----- Counterparties -----
     async def list_counterparties(self, active_only: bool = True) -> list[Counterparty]:
-        stmt = select(Counterparty).order_by(Counterparty.name.asc())
+        stmt = (
+            select(Counterparty)
+            .where(self._own(Counterparty))
+            .order_by(Counterparty.name.asc())
+        )
         if active_only:
             stmt = stmt.where(Counterparty.is_active.is_(True))
         res = await self.s.execute(stmt)
@@ -173,8 +679,9 @@ class Repo:
         q = (q or "").strip()
         stmt = (
             select(Counterparty)
-            .where(Counterparty.name.ilike(f"%{q}%"))
+            .where(self._own(Counterparty), Counterparty.name.ilike(f"%{q}%"))
             .order_by(Counterparty.name.asc())
+            .execution_options(replica=True)
         )
         if active_only:
             stmt = stmt.where(Counterparty.is_active.is_(True))
@@ -182,7 +689,9 @@ class Repo:
         return list(res.scalars().all())
 
     async def get_counterparty(self, cid: int) -> Counterparty | None:
-        res = await self.s.execute(select(Counterparty).where(Counterparty.id == cid))
+        res = await self.s.execute(
+            select(Counterparty).where(Counterparty.id == cid, self._own(Counterparty))
+        )
         return res.scalar_one_or_none()
 
     async def create_counterparty(
@@ -190,12 +699,47 @@ class Repo:
     ) -> Counterparty:
         name = " ".join((name or "").split())
         cp = Counterparty(
-            name=name, comment=(comment or "").strip() or None, is_active=True
+            tenant_id=self.tenant_id,
+            name=name,
+            comment=(comment or "").strip() or None,
+            is_active=True,
         )
         self.s.add(cp)
         await self.s.flush()
         return cp
 
+    async def ensure_counterparties_bulk(self, names: set[str]) -> dict[str, int]:
+        """Returns name -> id for active counterparties, creating missing ones
+        with a single INSERT."""
+        names = {" ".join(n.split()) for n in names if n and n.strip()}
+        if not names:
+            return {}
+        res = await self.s.execute(
+            select(Counterparty.name, Counterparty.id).where(
+                self._own(Counterparty),
+                Counterparty.is_active.is_(True),
+                Counterparty.name.in_(names),
+            )
+        )
+        found = {}
+        for name, cid in res.all():
+            found.setdefault(name, cid)
+        missing = sorted(names - found.keys())
+        if missing:
+            res = await self.s.execute(
+                insert(Counterparty)
+                .values(
+                    [
+                        {"tenant_id": self.tenant_id, "name": n, "is_active": True}
+                        for n in missing
+                    ]
+                )
+                .returning(Counterparty.name, Counterparty.id)
+            )
+            mark_data_changed(self.s)
+            found.update({name: cid for name, cid in res.all()})
+        return found
+
     async def update_counterparty(
         self, cid: int, *, name: str | None = None, comment: str | None = None
     ) -> tuple[bool, str]:
@@ -220,7 +764,9 @@ class Repo:
             return False, "Контрагент не найден."
 
         used = await self.s.execute(
-            select(func.count(Operation.id)).where(Operation.counterparty_id == cid)
+            select(func.count(Operation.id)).where(
+                self._own(Operation), Operation.counterparty_id == cid
+            )
         )
         if int(used.scalar_one()) > 0:
             return False, "Нельзя удалить: контрагент используется в операциях."
@@ -237,6 +783,7 @@ class Repo:
                 selectinload(MonthlyExpense.category),
                 selectinload(MonthlyExpense.counterparty),
             )
+            .where(self._own(MonthlyExpense))
             .order_by(MonthlyExpense.day_of_month.asc(), MonthlyExpense.title.asc())
         )
         if active_only:
@@ -251,7 +798,7 @@ class Repo:
                 selectinload(MonthlyExpense.category),
                 selectinload(MonthlyExpense.counterparty),
             )
-            .where(MonthlyExpense.id == me_id)
+            .where(MonthlyExpense.id == me_id, self._own(MonthlyExpense))
         )
         return res.scalar_one_or_none()
 
@@ -267,6 +814,7 @@ class Repo:
     ) -> MonthlyExpense:
         title = " ".join((title or "").split())
         me = MonthlyExpense(
+            tenant_id=self.tenant_id,
             title=title,
             day_of_month=int(day_of_month),
             amount=int(amount),
@@ -286,17 +834,221 @@ class Repo:
         me.is_active = False
         return True, "✅ Скрыто."
 
-    async def monthly_expense_applied(
-        self, me_id: int, year: int, month: int
-    ) -> bool:
-        marker = f"[ME:{me_id}:{year:04d}-{month:02d}]"
+    async def monthly_expenses_applied(self, year: int, month: int) -> set[int]:
+        """Ids of templates already applied in the month — one query for all
+        templates (by the "[ME:id:YYYY-MM]" comment marker)."""
+        period = f"{year:04d}-{month:02d}"
+        # шаблон применяется в своём месяце — фильтр по дате отсекает
+        # остальные секции operations; месяц по МСК начинается на 3 ч
+        # раньше UTC-месяца, так что сканируются две секции: хвост
+        # предыдущей и текущая
+        start = datetime(year, month, 1, tzinfo=MSK)
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=MSK)
+        me_id = func.substring(Operation.comment, rf"^\[ME:(\d+):{period}\]")
         res = await self.s.execute(
-            select(func.count(Operation.id)).where(
+            select(me_id)
+            .where(
+                self._own(Operation),
                 Operation.op_type == OperationType.expense,
-                Operation.comment.ilike(f"{marker}%"),
+                Operation.created_at >= start,
+                Operation.created_at < end,
+                Operation.comment.like(f"[ME:%:{period}]%"),
+            )
+            .distinct()
+        )
+        return {int(v) for v in res.scalars().all() if v}
+
+    async def daily_totals(
+        self, since: datetime
+    ) -> list[tuple[date, str, int | None, int]]:
+        """SQL aggregate for the forecast: (day MSK, op_type, category_id,
+        sum) of income/expense since `since`. Operations created from
+        monthly templates are left out — the forecast adds templates itself.
+        """
+        day = func.date(func.timezone("Europe/Moscow", Operation.created_at))
+        res = await self.s.execute(
+            select(
+                day,
+                Operation.op_type,
+                Operation.category_id,
+                func.sum(Operation.amount),
+            )
+            .where(
+                self._own(Operation),
+                Operation.op_type.in_([OperationType.income, OperationType.expense]),
+                Operation.created_at >= since,
+                or_(Operation.comment.is_(None), ~Operation.comment.like("[ME:%")),
+            )
+            .group_by(day, Operation.op_type, Operation.category_id)
+            .execution_options(replica=True)
+        )
+        return [(d, t.value, cid, int(s)) for d, t, cid, s in res.all()]
+
+    async def daily_type_totals(
+        self, start: datetime, end: datetime, created_by_id: int | None = None
+    ) -> list[tuple[date, str, int]]:
+        """SQL aggregate for charts: (day MSK, op_type, sum) within period."""
+        day = func.date(func.timezone("Europe/Moscow", Operation.created_at))
+        stmt = select(day, Operation.op_type, func.sum(Operation.amount)).group_by(
+            day, Operation.op_type
+        )
+        conds = self._operations_conds(None, start, end, created_by_id)
+        stmt = stmt.where(and_(*conds)).order_by(day).execution_options(replica=True)
+        res = await self.s.execute(stmt)
+        return [(d, t.value, int(s)) for d, t, s in res.all()]
+
+    async def net_before(
+        self, before: datetime, created_by_id: int | None = None
+    ) -> int:
+        """income - expense of operations created before `before`.
+
+        For the all-users scope it starts from the last closed-period
+        snapshot before `before` (archived months included), like
+        `type_totals`, and scans only operations after it.
+        """
+        net = 0
+        since = None
+        if not created_by_id:
+            snap = await self.snapshot_before(before)
+            if snap:
+                net = snap.income - snap.expense
+                since = snap.period_end
+
+        signed = case(
+            (Operation.op_type == OperationType.income, Operation.amount),
+            (Operation.op_type == OperationType.expense, -Operation.amount),
+            else_=0,
+        )
+        stmt = (
+            select(func.coalesce(func.sum(signed), 0))
+            .where(self._own(Operation), Operation.created_at < before)
+            .execution_options(replica=True)
+        )
+        if created_by_id:
+            stmt = stmt.where(Operation.created_by_id == created_by_id)
+        if since:
+            stmt = stmt.where(Operation.created_at >= since)
+        res = await self.s.execute(stmt)
+        net += int(res.scalar_one())
+        if not created_by_id:
+            net += await self.archived_sum(ArchivedPeriod.income, before, since)
+            net -= await self.archived_sum(ArchivedPeriod.expense, before, since)
+        return net
+
+    # ----- Report jobs -----
+    async def create_report_job(self, **fields) -> ReportJob:
+        job = ReportJob(
+            tenant_id=self.tenant_id,
+            status=ReportJobStatus.queued,
+            rows_done=0,
+            **fields,
+        )
+        self.s.add(job)
+        await self.s.flush()
+        return job
+
+    async def get_report_job(self, job_id: int) -> ReportJob | None:
+        res = await self.s.execute(
+            select(ReportJob).where(ReportJob.id == job_id, self._own(ReportJob))
+        )
+        return res.scalar_one_or_none()
+
+    async def update_report_job(self, job_id: int, **fields) -> None:
+        await self.s.execute(
+            update(ReportJob).where(ReportJob.id == job_id).values(**fields)
+        )
+
+    async def list_unfinished_report_jobs(self) -> list[ReportJob]:
+        """Unfinished jobs of every garage (restored at startup)."""
+        res = await self.s.execute(
+            select(ReportJob)
+            .where(
+                ReportJob.status.in_(
+                    [ReportJobStatus.queued, ReportJobStatus.running]
+                )
+            )
+            .order_by(ReportJob.id.asc())
+        )
+        return list(res.scalars().all())
+
+    async def list_expired_report_artifacts(self, before: datetime) -> list[ReportJob]:
+        res = await self.s.execute(
+            select(ReportJob).where(
+                ReportJob.file_path.is_not(None), ReportJob.finished_at < before
+            )
+        )
+        return list(res.scalars().all())
+
+    # ----- Report artifacts (telegram file_id cache) -----
+    @staticmethod
+    def _eq_or_null(col, value):
+        return col.is_(None) if value is None else col == value
+
+    async def get_report_artifact(
+        self,
+        fmt: str,
+        kind: str,
+        start: datetime | None,
+        end: datetime | None,
+        scope_user_id: int | None,
+    ) -> ReportArtifact | None:
+        res = await self.s.execute(
+            select(ReportArtifact)
+            .where(
+                self._own(ReportArtifact),
+                ReportArtifact.fmt == fmt,
+                ReportArtifact.kind == kind,
+                self._eq_or_null(ReportArtifact.start_at, start),
+                self._eq_or_null(ReportArtifact.end_at, end),
+                self._eq_or_null(ReportArtifact.scope_user_id, scope_user_id),
+            )
+            .order_by(ReportArtifact.id.desc())
+            .limit(1)
+        )
+        return res.scalar_one_or_none()
+
+    async def save_report_artifact(
+        self,
+        *,
+        fmt: str,
+        kind: str,
+        start: datetime | None,
+        end: datetime | None,
+        scope_user_id: int | None,
+        file_id: str,
+        rows: int,
+    ) -> None:
+        self.s.add(
+            ReportArtifact(
+                tenant_id=self.tenant_id,
+                fmt=fmt,
+                kind=kind,
+                start_at=start,
+                end_at=end,
+                scope_user_id=scope_user_id,
+                file_id=file_id,
+                rows=rows,
+            )
+        )
+        await self.s.flush()
+
+    async def invalidate_report_artifacts(
+        self, first: datetime, last: datetime
+    ) -> None:
+        """Drops cached reports whose period overlaps [first, last]."""
+        await self.s.execute(
+            delete(ReportArtifact).where(
+                self._own(ReportArtifact),
+                or_(
+                    ReportArtifact.start_at.is_(None),
+                    ReportArtifact.start_at <= last,
+                ),
+                or_(
+                    ReportArtifact.end_at.is_(None),
+                    ReportArtifact.end_at >= first,
+                ),
             )
         )
-        return int(res.scalar_one()) > 0
 
 
 # ----- Operations -----
@@ -308,19 +1060,472 @@ class Repo:
         category_id: int | None = None,
         counterparty_id: int | None = None,
         comment: str | None = None,
+        dedupe_key: str | None = None,
+        account_id: int | None = None,
+        to_account_id: int | None = None,
     ) -> Operation:
+        """Inserts an operation and moves its account balances. With
+        `dedupe_key` the insert is idempotent: a repeated call returns the
+        already existing operation. `account_id=None` — the default account."""
+        if dedupe_key:
+            # ключ занимаем первым: параллельный повтор ждёт нашего коммита
+            stmt = (
+                pg_insert(OperationDedupe)
+                .values(dedupe_key=dedupe_key)
+                .on_conflict_do_nothing()
+                .returning(OperationDedupe.dedupe_key)
+            )
+            if (await self.s.execute(stmt)).scalar_one_or_none() is None:
+                return await self.get_operation_by_dedupe_key(dedupe_key)
+
+        if account_id is None:
+            account_id = await self.default_account_id()
+        await self._hold_open_period()
         op = Operation(
+            tenant_id=self.tenant_id,
             op_type=op_type,
             amount=amount,
             created_by_id=created_by_id,
             category_id=category_id,
             counterparty_id=counterparty_id,
             comment=comment,
+            account_id=account_id,
+            to_account_id=to_account_id,
         )
         self.s.add(op)
         await self.s.flush()
+
+        deltas: dict[int, int] = {}
+        account_deltas(deltas, op_type, amount, account_id, to_account_id)
+        await self._move_accounts(deltas)
+
+        if dedupe_key:
+            await self.s.execute(
+                update(OperationDedupe)
+                .where(OperationDedupe.dedupe_key == dedupe_key)
+                .values(operation_id=op.id, created_at=op.created_at)
+            )
+        now = datetime.now(timezone.utc)
+        if op_type == OperationType.expense and category_id:
+            await self._add_budget_spend({(category_id, budget_month(now)): amount})
+        await self.invalidate_report_artifacts(now, now)
+        record_operation(
+            self.s,
+            OperationAdded(
+                tenant_id=self.tenant_id,
+                op_id=op.id,
+                op_type=op_type.value,
+                amount=amount,
+                category_id=category_id,
+                created_by_id=created_by_id,
+                created_at=now,
+            ),
+        )
         return op
 
+    async def get_operation_by_dedupe_key(self, dedupe_key: str) -> Operation | None:
+        res = await self.s.execute(
+            select(Operation)
+            .join(
+                OperationDedupe,
+                and_(
+                    OperationDedupe.operation_id == Operation.id,
+                    # created_at — ключ секционирования: ищем в одной секции
+                    OperationDedupe.created_at == Operation.created_at,
+                ),
+            )
+            .where(OperationDedupe.dedupe_key == dedupe_key)
+        )
+        return res.scalar_one_or_none()
+
+    async def mark_update_processed(self, update_id: int) -> bool:
+        """Records a Telegram update_id in the current transaction.
+        Returns False if it was already processed."""
+        stmt = (
+            pg_insert(ProcessedUpdate)
+            .values(update_id=update_id)
+            .on_conflict_do_nothing()
+            .returning(ProcessedUpdate.update_id)
+        )
+        return (await self.s.execute(stmt)).scalar_one_or_none() is not None
+
+    async def recent_update_ids(self, limit: int) -> list[int]:
+        res = await self.s.execute(
+            select(ProcessedUpdate.update_id)
+            .order_by(ProcessedUpdate.update_id.desc())
+            .limit(limit)
+        )
+        return list(res.scalars().all())
+
+    async def prune_processed_updates(self, before: datetime) -> int:
+        res = await self.s.execute(
+            delete(ProcessedUpdate).where(ProcessedUpdate.processed_at < before)
+        )
+        return res.rowcount or 0
+
+    async def lock_balance(self) -> None:
+        """Serializes balance-decreasing writes of the tenant until the end of
+        the current transaction (pg advisory xact lock). Other reads/writes
+        and other tenants are not blocked."""
+        params = {"k": BALANCE_LOCK_KEY, "t": self.tenant_id}
+        res = await self.s.execute(
+            text("SELECT pg_try_advisory_xact_lock(:k, :t)"), params
+        )
+        if res.scalar_one():
+            balance_lock_stats.record(False, 0.0)
+            return
+
+        started = time.monotonic()
+        await self.s.execute(text("SELECT pg_advisory_xact_lock(:k, :t)"), params)
+        balance_lock_stats.record(True, time.monotonic() - started)
+
+    async def _hold_open_period(self) -> None:
+        """Shared side of the tenant's period close lock, held until commit:
+        `close_month` waits for operations being written, writers do not
+        wait for each other."""
+        await self.s.execute(
+            text("SELECT pg_advisory_xact_lock_shared(:k, :t)"),
+            {"k": PERIOD_CLOSE_LOCK_KEY, "t": self.tenant_id},
+        )
+
+    async def post_checked(
+        self,
+        op_type: OperationType,
+        amount: int,
+        created_by_id: int,
+        category_id: int | None = None,
+        counterparty_id: int | None = None,
+        comment: str | None = None,
+        dedupe_key: str | None = None,
+        account_id: int | None = None,
+    ) -> tuple[Operation | None, int]:
+        """Atomic check-and-post for expense / reserve_in / reserve_out.
+
+        Takes the balance lock, re-reads the balance and inserts only if there
+        are enough funds ("доступно" for expense/reserve_in, reserve for
+        reserve_out). An expense must also fit the balance of its account
+        (`account_id`, default account if None), as in `post_transfer`.
+        Returns (operation or None, limit before the operation).
+        """
+        await self.lock_balance()
+        # только свежий запрос: ни кэш, ни чужой single-flight
+        _, reserve, available = await self.fresh_balance()
+        limit = reserve if op_type == OperationType.reserve_out else available
+        if op_type == OperationType.expense:
+            if account_id is None:
+                account_id = await self.default_account_id()
+            limit = min(limit, await self.account_balance(account_id))
+        if dedupe_key:
+            # повтор уже проведённой операции — средства уже списаны ею
+            existing = await self.get_operation_by_dedupe_key(dedupe_key)
+            if existing:
+                return existing, limit
+        if amount > limit:
+            return None, limit
+
+        op = await self.add_operation(
+            op_type=op_type,
+            amount=amount,
+            created_by_id=created_by_id,
+            category_id=category_id,
+            counterparty_id=counterparty_id,
+            comment=comment,
+            dedupe_key=dedupe_key,
+            account_id=account_id,
+        )
+        return op, limit
+
+    async def first_operation_at(self) -> datetime | None:
+        res = await self.s.execute(
+            select(func.min(Operation.created_at)).where(self._own(Operation))
+        )
+        return res.scalar_one()
+
+    async def max_operation_id(self, replica: bool = False) -> int:
+        """Cheap per-garage data version: changes on every insert of this
+        garage (one lookup in ix_operations_tenant_id). `replica=True` reads
+        it where report rows are read, see `stream_operation_rows`."""
+        res = await self.s.execute(
+            select(func.coalesce(func.max(Operation.id), 0))
+            .where(self._own(Operation))
+            .execution_options(replica=replica)
+        )
+        return int(res.scalar_one())
+
+    async def add_operations_bulk(
+        self, rows: list[dict], created_by_id: int, account_id: int | None = None
+    ) -> int:
+        """Inserts many operations with one multi-row INSERT.
+
+        `rows` — dicts with op_type/amount/category_id/counterparty_id/comment
+        (as produced by `app.utils.bulk_import`), all posted to `account_id`.
+        Returns inserted count.
+        """
+        if not rows:
+            return 0
+        if account_id is None:
+            account_id = await self.default_account_id()
+        values = [
+            {
+                "tenant_id": self.tenant_id,
+                "op_type": OperationType(r["op_type"]),
+                "amount": int(r["amount"]),
+                "created_by_id": created_by_id,
+                "category_id": r.get("category_id"),
+                "counterparty_id": r.get("counterparty_id"),
+                "comment": r.get("comment"),
+                "account_id": account_id,
+            }
+            for r in rows
+        ]
+        await self._hold_open_period()
+        await self.s.execute(insert(Operation).values(values))
+        mark_data_changed(self.s)
+        deltas: dict[int, int] = {}
+        for v in values:
+            account_deltas(deltas, v["op_type"], v["amount"], account_id)
+        await self._move_accounts(deltas)
+        now = datetime.now(timezone.utc)
+        spend: dict[tuple[int, date], int] = {}
+        for v in values:
+            if v["op_type"] == OperationType.expense and v["category_id"]:
+                key = (v["category_id"], budget_month(now))
+                spend[key] = spend.get(key, 0) + v["amount"]
+        await self._add_budget_spend(spend)
+        await self.invalidate_report_artifacts(now, now)
+        return len(values)
+
+    async def ensure_operation_partitions(
+        self, start: datetime, end: datetime
+    ) -> int:
+        """Creates missing monthly partitions of `operations` covering
+        [start, end]. Returns the number of partitions created."""
+        res = await self.s.execute(
+            text("SELECT ensure_operation_partitions(:start, :end)"),
+            {"start": start, "end": end},
+        )
+        return int(res.scalar_one())
+
+    # ----- Archive -----
+    async def list_archived_periods(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> list[ArchivedPeriod]:
+        """Archived months overlapping [start, end], newest first."""
+        stmt = (
+            select(ArchivedPeriod)
+            .where(self._own(ArchivedPeriod))
+            .order_by(ArchivedPeriod.period_start.desc())
+        )
+        if start:
+            stmt = stmt.where(ArchivedPeriod.period_end > start)
+        if end:
+            stmt = stmt.where(ArchivedPeriod.period_start <= end)
+        res = await self.s.execute(stmt)
+        return list(res.scalars().all())
+
+    async def archived_sum(
+        self,
+        column,
+        before: datetime | None = None,
+        since: datetime | None = None,
+    ) -> int:
+        stmt = select(func.coalesce(func.sum(column), 0)).where(
+            self._own(ArchivedPeriod)
+        )
+        if before:
+            stmt = stmt.where(ArchivedPeriod.period_end <= before)
+        if since:
+            stmt = stmt.where(ArchivedPeriod.period_start >= since)
+        res = await self.s.execute(stmt)
+        return int(res.scalar_one())
+
+    async def type_sums(self, start: datetime, end: datetime) -> dict[str, int]:
+        """{op_type: sum} for start <= created_at < end."""
+        res = await self.s.execute(
+            select(Operation.op_type, func.sum(Operation.amount))
+            .where(
+                self._own(Operation),
+                Operation.created_at >= start,
+                Operation.created_at < end,
+            )
+            .group_by(Operation.op_type)
+        )
+        return {t.value: int(s) for t, s in res.all()}
+
+    async def lock_operation_partition(self, month: date) -> bool:
+        """Blocks writes to the month's partition until commit. Returns False
+        if the partition does not exist."""
+        name = f"operations_{month:%Y_%m}"
+        res = await self.s.execute(text("SELECT to_regclass(:n)"), {"n": name})
+        if res.scalar_one() is None:
+            return False
+        await self.s.execute(text(f'LOCK TABLE "{name}" IN SHARE MODE'))
+        return True
+
+    async def drop_operation_partition(self, month: date) -> None:
+        await self.s.execute(text(f'DROP TABLE "operations_{month:%Y_%m}"'))
+        # секция общая для всех гаражей
+        mark_data_changed(self.s, all_tenants=True)
+
+    async def save_archived_period(self, **fields) -> ArchivedPeriod:
+        period = ArchivedPeriod(tenant_id=self.tenant_id, **fields)
+        self.s.add(period)
+        await self.s.flush()
+        return period
+
+    # ----- Closed periods -----
+    async def last_snapshot(self) -> PeriodSnapshot | None:
+        res = await self.s.execute(
+            select(PeriodSnapshot)
+            .where(self._own(PeriodSnapshot))
+            .order_by(PeriodSnapshot.period_end.desc())
+            .limit(1)
+        )
+        return res.scalar_one_or_none()
+
+    async def snapshot_before(self, before: datetime) -> PeriodSnapshot | None:
+        """The last snapshot of a period that ended by `before`."""
+        res = await self.s.execute(
+            select(PeriodSnapshot)
+            .where(self._own(PeriodSnapshot), PeriodSnapshot.period_end <= before)
+            .order_by(PeriodSnapshot.period_end.desc())
+            .limit(1)
+        )
+        return res.scalar_one_or_none()
+
+    async def closed_until(self) -> datetime | None:
+        """Operations before this moment belong to closed periods."""
+        last = await self.last_snapshot()
+        return last.period_end if last else None
+
+    async def list_snapshots(self) -> list[PeriodSnapshot]:
+        res = await self.s.execute(
+            select(PeriodSnapshot)
+            .where(self._own(PeriodSnapshot))
+            .order_by(PeriodSnapshot.period_start)
+        )
+        return list(res.scalars().all())
+
+    async def period_sums(
+        self, start: datetime | None, end: datetime
+    ) -> dict[str, int]:
+        """{op_type: sum} for [start, end) — hot operations plus archived
+        months inside the range. `start=None` means from the beginning."""
+        hot = (
+            select(Operation.op_type, func.sum(Operation.amount))
+            .where(
+                self._own(Operation),
+                Operation.created_at < end,
+                Operation.op_type.in_(BALANCE_TYPES),
+            )
+            .group_by(Operation.op_type)
+        )
+        archived = select(ArchivedPeriod).where(
+            self._own(ArchivedPeriod), ArchivedPeriod.period_end <= end
+        )
+        if start:
+            hot = hot.where(Operation.created_at >= start)
+            archived = archived.where(ArchivedPeriod.period_start >= start)
+
+        sums = {t.value: 0 for t in BALANCE_TYPES}
+        for t, total in (await self.s.execute(hot)).all():
+            sums[t.value] += int(total)
+        for period in (await self.s.execute(archived)).scalars().all():
+            for t in BALANCE_TYPES:
+                sums[t.value] += getattr(period, t.value)
+        return sums
+
+    async def close_month(
+        self, month: date, closed_by_id: int | None = None
+    ) -> tuple[bool, str]:
+        """Writes the cumulative snapshot as of the end of `month` (UTC, like
+        the partitions). Months are closed in order, only after they end."""
+        start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        end = datetime(
+            month.year + month.month // 12,
+            month.month % 12 + 1,
+            1,
+            tzinfo=timezone.utc,
+        )
+        if end > datetime.now(timezone.utc):
+            return False, "Месяц ещё не закончился."
+
+        # закрытия гаража идут по одному; запись его операций (разделяемая
+        # сторона блокировки) ждёт конца транзакции, дальше прошлое закроет
+        # триггер. Другие гаражи пишут как обычно.
+        await self.s.execute(
+            text("SELECT pg_advisory_xact_lock(:k, :t)"),
+            {"k": PERIOD_CLOSE_LOCK_KEY, "t": self.tenant_id},
+        )
+        last = await self.last_snapshot()
+        if last and last.period_end > start:
+            return False, "Этот месяц уже закрыт."
+        if last and last.period_end < start:
+            prev = last.period_end.astimezone(timezone.utc)
+            return False, f"Сначала закройте {prev:%m.%Y}."
+
+        if last:
+            base = {t.value: getattr(last, t.value) for t in BALANCE_TYPES}
+        else:
+            # первый снимок — один раз суммируем всю историю до месяца
+            base = await self.period_sums(None, start)
+        sums = await self.period_sums(start, end)
+        self.s.add(
+            PeriodSnapshot(
+                tenant_id=self.tenant_id,
+                period_start=start,
+                period_end=end,
+                closed_by_id=closed_by_id,
+                **{t.value: base[t.value] + sums[t.value] for t in BALANCE_TYPES},
+            )
+        )
+        await self.s.flush()
+        mark_data_changed(self.s)
+        return True, f"Месяц {start:%m.%Y} закрыт."
+
+    async def copy_operations(self, records: list[tuple]) -> int:
+        """Loads operations via asyncpg COPY inside the session transaction.
+
+        `records` are tuples in `OPERATION_COPY_COLUMNS` order, `op_type` as
+        its string value; all go to the repo's tenant. Much faster than ORM
+        inserts for historical loads.
+        """
+        if not records:
+            return 0
+        created = [r[OPERATION_COPY_COLUMNS.index("created_at")] for r in records]
+        # история может быть старше существующих секций
+        await self.ensure_operation_partitions(min(created), max(created))
+        await self._hold_open_period()
+
+        conn = await self.s.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            Operation.__tablename__,
+            records=[(*r, self.tenant_id) for r in records],
+            columns=(*OPERATION_COPY_COLUMNS, "tenant_id"),
+        )
+        mark_data_changed(self.s)
+
+        col = OPERATION_COPY_COLUMNS.index
+        deltas: dict[int, int] = {}
+        spend: dict[tuple[int, date], int] = {}
+        for r in records:
+            account_deltas(
+                deltas,
+                OperationType(r[col("op_type")]),
+                r[col("amount")],
+                r[col("account_id")],
+                r[col("to_account_id")],
+            )
+            cat_id = r[col("category_id")]
+            if r[col("op_type")] == OperationType.expense.value and cat_id:
+                key = (cat_id, budget_month(r[col("created_at")]))
+                spend[key] = spend.get(key, 0) + r[col("amount")]
+        await self._move_accounts(deltas)
+        await self._add_budget_spend(spend)
+        await self.invalidate_report_artifacts(min(created), max(created))
+        return len(records)
+
     async def list_operations_filtered(
         self,
         op_types: list[OperationType] | None,
@@ -334,6 +1539,8 @@ class Repo:
         Notes:
         - `start/end` must be timezone-aware (because `created_at` is timestamptz).
         - For worker/viewer "only my ops", pass `created_by_id`.
+        - Marked `replica=True` like other report reads: goes to the read-only
+          engine when the session has one (see `app.db.RoutingSession`).
         """
         stmt: Select = (
             select(Operation)
@@ -343,9 +1550,25 @@ class Repo:
                 selectinload(Operation.counterparty),
             )
             .order_by(Operation.created_at.desc())
+            .execution_options(replica=True)
         )
 
-        conds = []
+        conds = self._operations_conds(op_types, start, end, created_by_id)
+        stmt = stmt.where(and_(*conds))
+        if limit:
+            stmt = stmt.limit(limit)
+
+        res = await self.s.execute(stmt)
+        return list(res.scalars().all())
+
+    def _operations_conds(
+        self,
+        op_types: list[OperationType] | None,
+        start: datetime | None,
+        end: datetime | None,
+        created_by_id: int | None,
+    ) -> list:
+        conds = [self._own(Operation)]
         if op_types:
             conds.append(Operation.op_type.in_(op_types))
         if start:
@@ -354,13 +1577,95 @@ class Repo:
             conds.append(Operation.created_at <= end)
         if created_by_id:
             conds.append(Operation.created_by_id == created_by_id)
-        if conds:
-            stmt = stmt.where(and_(*conds))
-        if limit:
-            stmt = stmt.limit(limit)
+        return conds
+
+    async def stream_operation_rows(
+        self,
+        op_types: list[OperationType] | None,
+        start: datetime | None,
+        end: datetime | None,
+        created_by_id: int | None = None,
+        batch_size: int = 2000,
+    ) -> AsyncIterator[list[tuple]]:
+        """Yields batches of flat export rows from a server-side cursor.
+
+        Row: (id, op_type, amount, category_name, counterparty_id,
+        counterparty_name, comment, created_at, created_by_id, created_by_name,
+        account_name, to_account_name).
+        May read from the replica; the archiver's sessions have none, so it
+        always reads the primary before dropping a partition.
+        """
+        to_account = aliased(Account)
+        stmt = (
+            select(
+                Operation.id,
+                Operation.op_type,
+                Operation.amount,
+                Category.name,
+                Operation.counterparty_id,
+                Counterparty.name,
+                Operation.comment,
+                Operation.created_at,
+                Operation.created_by_id,
+                User.name,
+                Account.name,
+                to_account.name,
+            )
+            .outerjoin(Category, Category.id == Operation.category_id)
+            .outerjoin(Counterparty, Counterparty.id == Operation.counterparty_id)
+            .outerjoin(User, User.id == Operation.created_by_id)
+            .outerjoin(Account, Account.id == Operation.account_id)
+            .outerjoin(to_account, to_account.id == Operation.to_account_id)
+            .order_by(Operation.created_at.desc())
+            .execution_options(yield_per=batch_size, replica=True)
+        )
+        conds = self._operations_conds(op_types, start, end, created_by_id)
+        stmt = stmt.where(and_(*conds))
+
+        res = await self.s.stream(stmt)
+        async for part in res.partitions(batch_size):
+            yield [tuple(r) for r in part]
+
+    async def stream_type_amounts(
+        self, start: datetime | None, end: datetime, batch_size: int = 10000
+    ) -> AsyncIterator[list[tuple[OperationType, int]]]:
+        """Yields batches of (op_type, amount) for start <= created_at < end
+        from a server-side cursor."""
+        stmt = (
+            select(Operation.op_type, Operation.amount)
+            .where(self._own(Operation), Operation.created_at < end)
+            .execution_options(yield_per=batch_size)
+        )
+        if start:
+            stmt = stmt.where(Operation.created_at >= start)
+        res = await self.s.stream(stmt)
+        async for part in res.partitions(batch_size):
+            yield [tuple(r) for r in part]
 
+    async def operation_totals(
+        self,
+        op_types: list[OperationType] | None,
+        start: datetime | None,
+        end: datetime | None,
+        created_by_id: int | None = None,
+    ) -> list[tuple[OperationType, str | None, int, int]]:
+        """SQL aggregate: (op_type, category_name, count, sum) per category."""
+        stmt = (
+            select(
+                Operation.op_type,
+                Category.name,
+                func.count(Operation.id),
+                func.coalesce(func.sum(Operation.amount), 0),
+            )
+            .outerjoin(Category, Category.id == Operation.category_id)
+            .group_by(Operation.op_type, Category.name)
+            .order_by(Operation.op_type, Category.name)
+            .execution_options(replica=True)
+        )
+        conds = self._operations_conds(op_types, start, end, created_by_id)
+        stmt = stmt.where(and_(*conds))
         res = await self.s.execute(stmt)
-        return list(res.scalars().all())
+        return [(t, name, int(cnt), int(total)) for t, name, cnt, total in res.all()]
 
     # async def list_last_operations(
     #     self,
@@ -385,22 +1690,57 @@ class Repo:
     #     res = await self.s.execute(stmt)
     #     return list(res.scalars().all())
 
-    async def sum_by_type(self, op_type: OperationType) -> int:
-        res = await self.s.execute(
-            select(func.coalesce(func.sum(Operation.amount), 0)).where(
-                Operation.op_type == op_type
-            )
+    async def type_totals(self) -> dict[str, int]:
+        """{op_type: sum} over all time.
+
+        The last closed period's snapshot plus operations and archived months
+        after it, so the scan is limited to the open period.
+        """
+        last = await self.last_snapshot()
+        since = last.period_end if last else None
+
+        hot = (
+            select(Operation.op_type, func.sum(Operation.amount))
+            .where(self._own(Operation), Operation.op_type.in_(BALANCE_TYPES))
+            .group_by(Operation.op_type)
         )
-        return int(res.scalar_one())
+        archived = select(
+            *(
+                func.coalesce(func.sum(getattr(ArchivedPeriod, t.value)), 0)
+                for t in BALANCE_TYPES
+            )
+        ).where(self._own(ArchivedPeriod))
+        if since:
+            hot = hot.where(Operation.created_at >= since)
+            archived = archived.where(ArchivedPeriod.period_start >= since)
+
+        totals = {
+            t.value: getattr(last, t.value) if last else 0 for t in BALANCE_TYPES
+        }
+        for t, total in (await self.s.execute(hot)).all():
+            totals[t.value] += int(total)
+        arch = (await self.s.execute(archived)).one()
+        for t, total in zip(BALANCE_TYPES, arch):
+            totals[t.value] += int(total)
+        return totals
+
+    async def sum_by_type(self, op_type: OperationType) -> int:
+        return (await self.type_totals())[op_type.value]
 
     async def balance(self) -> tuple[int, int, int]:
-        """Returns (balance_total, reserve_balance, available)."""
-        inc = await self.sum_by_type(OperationType.income)
-        exp = await self.sum_by_type(OperationType.expense)
-        reserve_in = await self.sum_by_type(OperationType.reserve_in)
-        reserve_out = await self.sum_by_type(OperationType.reserve_out)
-        balance_total = inc - exp
-        reserve_balance = reserve_in - reserve_out
+        """Returns (balance_total, reserve_balance, available).
+
+        Concurrent calls are coalesced into one set of queries.
+        """
+        return await balance_flight.do("balance", self.s, self.fresh_balance)
+
+    async def fresh_balance(self) -> tuple[int, int, int]:
+        """Same as `balance`, always queried on this session."""
+        # баланс — сумма остатков счетов, O(число счетов); резерв — снимок
+        # закрытых месяцев + открытый период
+        balance_total = await self.total_account_balance()
+        totals = await self.type_totals()
+        reserve_balance = totals["reserve_in"] - totals["reserve_out"]
         available = balance_total - reserve_balance
         return balance_total, reserve_balance, available
 
@@ -0,0 +1,3 @@
+from . import charts, digests, exports, notifier, outbox, partitions
+
+__all__ = ["charts", "digests", "exports", "notifier", "outbox", "partitions"]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from app.cache import chart_cache, memoize
+from app.models import OperationType
+from app.repository import Repo
+from app.utils.charts import render_period_chart, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+class ChartService:
+    """PNG charts for a report period.
+
+    Data comes from SQL aggregates; matplotlib runs in a process pool, so
+    rendering never holds the event loop (or the GIL of the bot process).
+    Results are cached per (period, scope) for the current data version.
+    """
+
+    def __init__(self, *, workers: int):
+        self.workers = workers
+        self.executor: ProcessPoolExecutor | None = None
+        self.rendered = 0
+
+    async def start(self) -> None:
+        # spawn, не fork: копия процесса с asyncpg/aiohttp-соединениями и
+        # потоками может зависнуть в дочернем
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        # процессы поднимаются и импортируют matplotlib до первого графика
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers))
+        )
+
+    async def stop(self) -> None:
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def period_chart(
+        self,
+        repo: Repo,
+        start: datetime,
+        end: datetime,
+        start_day: date,
+        end_day: date,
+        created_by_id: int | None,
+    ) -> bytes:
+        key = ("chart", start_day, end_day, created_by_id)
+
+        async def compute() -> bytes:
+            daily = await repo.daily_type_totals(start, end, created_by_id)
+            totals = await repo.operation_totals(
+                [OperationType.expense], start, end, created_by_id
+            )
+            # для worker/viewer — накопленный итог своих операций с нуля
+            opening = await repo.net_before(start) if created_by_id is None else 0
+            title = f"{start_day:%d.%m.%Y} — {end_day:%d.%m.%Y}"
+            png = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                functools.partial(
+                    render_period_chart,
+                    title,
+                    start_day,
+                    end_day,
+                    daily,
+                    [(name, total) for _, name, _, total in totals],
+                    opening,
+                ),
+            )
+            self.rendered += 1
+            return png
+
+        return await memoize(chart_cache, key, repo.s, compute)
+
+    def stats(self) -> str:
+        return f"Графики: отрисовано {self.rendered}"
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.cache import ALL_TENANTS, DATA_CHANGED_CHANNEL, PROCESS_ORIGIN, data_version
+from app.db import replica_routing
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SEC = 60
+RECONNECT_SEC = 5
+
+
+class DataChangeListener:
+    """LISTENs for data changes committed by other processes — the CLI
+    importer, archiver and period closing — and bumps the data version of
+    the garage they touched, so cached balances and reports are rebuilt.
+
+    Holds one connection of the primary pool. While it is reconnecting
+    nothing is heard, so every (re)subscription invalidates all tenants.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._task: asyncio.Task | None = None
+        self.received = 0
+        self.reconnects = 0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop(), name="data-changes")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _on_notify(self, conn, pid, channel: str, payload: str) -> None:
+        tenant, _, origin = payload.partition(":")
+        if origin == PROCESS_ORIGIN:
+            return
+        self.received += 1
+        if tenant == ALL_TENANTS:
+            data_version.bump_all()
+            return
+        tenant_id = int(tenant)
+        data_version.bump(tenant_id)
+        # реплика могла ещё не получить чужую запись
+        replica_routing.note_write(tenant_id)
+
+    async def _listen(self) -> None:
+        async with self.engine.connect() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            try:
+                await raw.add_listener(DATA_CHANGED_CHANNEL, self._on_notify)
+                data_version.bump_all()
+                while True:
+                    await asyncio.sleep(KEEPALIVE_SEC)
+                    # без pre-ping разрыв иначе не заметить
+                    await raw.execute("SELECT 1")
+            finally:
+                # соединение с LISTEN не возвращаем в пул
+                await conn.invalidate()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.reconnects += 1
+                logger.warning("Data change listener lost connection", exc_info=True)
+            await asyncio.sleep(RECONNECT_SEC)
+
+    def stats(self) -> str:
+        return (
+            f"Изменения из других процессов: {self.received}, "
+            f"переподключений {self.reconnects}"
+        )
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.models import OperationType, User, UserRole
+from app.repository import Repo
+from app.services.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+
+MSK = ZoneInfo("Europe/Moscow")
+
+DAILY = "daily"
+WEEKLY = "weekly"
+
+PERIOD_RU = {
+    DAILY: "Ежедневная сводка",
+    WEEKLY: "Еженедельная сводка",
+}
+
+MAX_CATEGORIES = 10
+
+
+def digest_scope(user: User) -> tuple[int, int | None]:
+    # как в отчётах: worker/viewer видят только свои операции, владелец —
+    # все операции своего гаража
+    if user.role == UserRole.owner:
+        return user.tenant_id, None
+    return user.tenant_id, user.id
+
+
+async def build_digest_text(
+    repo: Repo, period: str, start: datetime, end: datetime, scope: int | None
+) -> str:
+    """One SQL aggregate per scope; the same text goes to every subscriber
+    of that scope."""
+    totals = await repo.operation_totals(
+        [OperationType.income, OperationType.expense], start, end, scope
+    )
+    income = [(n, c, s) for t, n, c, s in totals if t == OperationType.income]
+    expense = [(n, c, s) for t, n, c, s in totals if t == OperationType.expense]
+
+    last_day = (end - timedelta(microseconds=1)).astimezone(MSK)
+    if period == DAILY:
+        title = f"🗓 Сводка за {last_day:%d.%m.%Y}"
+    else:
+        title = (
+            f"🗓 Сводка за неделю {start.astimezone(MSK):%d.%m}–{last_day:%d.%m}"
+        )
+
+    lines = [
+        title,
+        "",
+        f"🟢 Доходы: {sum(s for _, _, s in income)} ₽ "
+        f"({sum(c for _, c, _ in income)} оп.)",
+        f"🔴 Расходы: {sum(s for _, _, s in expense)} ₽ "
+        f"({sum(c for _, c, _ in expense)} оп.)",
+    ]
+    if expense:
+        lines += ["", "Расходы по категориям:"]
+        top = sorted(expense, key=lambda r: r[2], reverse=True)
+        for name, _, total in top[:MAX_CATEGORIES]:
+            lines.append(f"• {name or 'Без категории'} — {total} ₽")
+        if len(top) > MAX_CATEGORIES:
+            lines.append(f"…и ещё {len(top) - MAX_CATEGORIES}")
+
+    if scope is None:
+        bal, reserve, available = await repo.balance()
+        lines += [
+            "",
+            f"💰 Баланс: {bal} ₽",
+            f"🔒 Резерв: {reserve} ₽",
+            f"🟢 Доступно: {available} ₽",
+        ]
+    else:
+        lines += ["", "(Только ваши операции.)"]
+    return "\n".join(lines)
+
+
+class DigestScheduler:
+    """Sends scheduled digests: daily at `hour`:00 MSK and weekly on
+    `weekly_weekday` (0 = Monday) at the same time. Digests cover only
+    finished days: yesterday, and the last full Monday–Sunday week.
+
+    Each report is computed once per scope (all operations of the garage for
+    owners, own operations for others) and fanned out through the outbox.
+    """
+
+    def __init__(
+        self, session_maker, outbox: Outbox, *, hour: int, weekly_weekday: int
+    ):
+        self.session_maker = session_maker
+        self.outbox = outbox
+        self.hour = hour
+        self.weekly_weekday = weekly_weekday
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop(), name="digests")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _next_run(self, now: datetime) -> datetime:
+        run = datetime.combine(now.date(), time(self.hour), tzinfo=MSK)
+        if run <= now:
+            run += timedelta(days=1)
+        return run
+
+    async def _loop(self) -> None:
+        while True:
+            run_at = self._next_run(datetime.now(MSK))
+            delay = (run_at - datetime.now(MSK)).total_seconds()
+            await asyncio.sleep(max(delay, 0))
+            try:
+                await self.send(DAILY, run_at)
+                if run_at.weekday() == self.weekly_weekday:
+                    await self.send(WEEKLY, run_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Digest run failed: run_at=%s", run_at)
+
+    @staticmethod
+    def window(period: str, run_at: datetime) -> tuple[datetime, datetime]:
+        """[start, end) in UTC of the digest sent at `run_at`: it ends at the
+        start of the run day, so the unfinished day is never included."""
+        today = datetime.combine(run_at.date(), time(0), tzinfo=MSK)
+        if period == DAILY:
+            start, end = today - timedelta(days=1), today
+        else:
+            monday = today - timedelta(days=run_at.weekday())
+            start, end = monday - timedelta(days=7), monday
+        return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+    async def send(self, period: str, run_at: datetime) -> int:
+        """Builds and enqueues `period` digests due at `run_at`."""
+        start, end = self.window(period, run_at)
+
+        async with self.session_maker() as session:
+            users = await Repo(session).list_digest_subscribers(period)
+            texts: dict[tuple[int, int | None], str] = {}
+            for u in users:
+                scope = digest_scope(u)
+                if scope not in texts:
+                    tenant_id, created_by_id = scope
+                    texts[scope] = await build_digest_text(
+                        Repo(session, tenant_id), period, start, end, created_by_id
+                    )
+
+        queued = 0
+        for u in users:
+            if self.outbox.send_message(u.telegram_id, texts[digest_scope(u)]):
+                queued += 1
+        self.sent += queued
+
+        audit.info(
+            "digest.sent | period=%s | users=%s | scopes=%s",
+            period,
+            queued,
+            len(texts),
+        )
+        return queued
+
+    def stats(self) -> str:
+        return f"Сводки: отправлено {self.sent}"
@@ -0,0 +1,524 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+from app.db import REPLICA_ROUTED
+from app.keyboards import report_job_done_kb, report_job_progress_kb
+from app.models import OperationType, ReportJobStatus, User, UserRole
+from app.repository import Repo
+from app.services.outbox import bulk_priority
+from app.utils.archive_files import ArchiveReader
+from app.utils.csv_export import CsvOperationsWriter
+from app.utils.xlsx_export import XlsxOperationsWriter
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+
+# fmt -> (writer, filename, caption)
+EXPORT_FORMATS = {
+    "csv": (
+        CsvOperationsWriter,
+        "report.csv",
+        "📄 CSV-отчёт (открывается в Excel).",
+    ),
+    "xlsx": (
+        XlsxOperationsWriter,
+        "report.xlsx",
+        "📊 Отчёт Excel (операции + итоги).",
+    ),
+}
+
+KIND_OP_TYPES = {
+    "income": [OperationType.income],
+    "expense": [OperationType.expense],
+    "all": None,
+}
+
+MAX_JOBS_PER_USER = 2
+PROGRESS_EVERY_SEC = 2.0
+JANITOR_EVERY_SEC = 3600
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _merge_totals(
+    totals: list[tuple], archived: dict[tuple, list[int]]
+) -> list[tuple]:
+    if not archived:
+        return totals
+    merged = {(t, name): [cnt, total] for t, name, cnt, total in totals}
+    for key, (cnt, total) in archived.items():
+        acc = merged.setdefault(key, [0, 0])
+        acc[0] += cnt
+        acc[1] += total
+    return [
+        (t, name, cnt, total)
+        for (t, name), (cnt, total) in sorted(
+            merged.items(),
+            key=lambda kv: (list(OperationType).index(kv[0][0]), kv[0][1] or ""),
+        )
+    ]
+
+
+@dataclass
+class ExportJob:
+    chat_id: int
+    user_id: int
+    tenant_id: int
+    fmt: str  # csv/xlsx
+    kind: str  # all/income/expense
+    start: datetime | None
+    end: datetime | None
+    created_by_id: int | None  # None -> все операции (owner)
+    caption: str | None = None
+    id: int | None = None
+    message_id: int | None = None
+    cancelled: bool = False
+
+    @property
+    def op_types(self) -> list[OperationType] | None:
+        return KIND_OP_TYPES.get(self.kind)
+
+
+class ExportService:
+    """Background report jobs: CSV/XLSX built off the event loop.
+
+    Every job is persisted in `report_jobs`, so queued work survives a
+    restart. Jobs are picked round-robin between users (one user's batch of
+    exports does not hold up everyone else), file formatting/writing runs in
+    a thread pool of `workers` threads. The user sees a progress message with
+    a cancel button; finished files stay in `artifacts_dir` for re-download
+    until they expire.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        session_maker,
+        *,
+        workers: int,
+        queue_size: int,
+        artifacts_dir: str,
+        artifact_ttl_hours: int,
+    ):
+        self.bot = bot
+        self.session_maker = session_maker
+        self.workers = workers
+        self.queue_size = queue_size
+        self.artifacts_dir = artifacts_dir
+        self.artifact_ttl = timedelta(hours=artifact_ttl_hours)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="export"
+        )
+        # user_id -> очередь его задач; порядок ключей = очередь round-robin
+        self._queues: dict[int, deque[ExportJob]] = {}
+        self._jobs: dict[int, ExportJob] = {}  # queued + running, by id
+        self._per_user: dict[int, int] = {}  # queued + running + reserved
+        self._reserved = 0  # принятые submit'ом, ещё не в очереди
+        self._cond = asyncio.Condition()
+        self._tasks: list[asyncio.Task] = []
+
+    # ----- lifecycle -----
+    async def start(self) -> None:
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        await self._restore()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"export-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(
+            asyncio.create_task(self._janitor(), name="export-janitor")
+        )
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _restore(self) -> None:
+        """Re-queues jobs left unfinished by the previous process."""
+        async with self.session_maker() as session:
+            rows = await Repo(session).list_unfinished_report_jobs()
+        for r in rows:
+            job = ExportJob(
+                chat_id=r.chat_id,
+                user_id=r.user_id,
+                tenant_id=r.tenant_id,
+                fmt=r.fmt,
+                kind=r.kind,
+                start=r.start_at,
+                end=r.end_at,
+                created_by_id=r.scope_user_id,
+                id=r.id,
+                message_id=r.progress_message_id,
+            )
+            await self._enqueue(job)
+        if rows:
+            logger.info("Restored %s report jobs", len(rows))
+
+    # ----- public API -----
+    async def submit(self, job: ExportJob) -> tuple[bool, str]:
+        if await self._send_cached(job):
+            return True, "Готово"
+        if len(self._jobs) + self._reserved >= self.queue_size:
+            return False, "Сейчас много выгрузок, попробуйте через минуту."
+        if self._per_user.get(job.user_id, 0) >= MAX_JOBS_PER_USER:
+            return False, "Ваши выгрузки уже готовятся, подождите."
+
+        # место занимаем до первого await: параллельные нажатия не обойдут
+        # лимиты, пока задача создаётся
+        self._reserved += 1
+        self._per_user[job.user_id] = self._per_user.get(job.user_id, 0) + 1
+        try:
+            async with self.session_maker() as session:
+                repo = Repo(session, job.tenant_id)
+                row = await repo.create_report_job(
+                    user_id=job.user_id,
+                    chat_id=job.chat_id,
+                    fmt=job.fmt,
+                    kind=job.kind,
+                    start_at=job.start,
+                    end_at=job.end,
+                    scope_user_id=job.created_by_id,
+                )
+                job.id = row.id
+                msg = await self.bot.send_message(
+                    job.chat_id,
+                    "⏳ Готовлю файл… В очереди.",
+                    reply_markup=report_job_progress_kb(job.id).as_markup(),
+                )
+                job.message_id = msg.message_id
+                await repo.update_report_job(
+                    job.id, progress_message_id=msg.message_id
+                )
+                await session.commit()
+        except BaseException:
+            self._reserved -= 1
+            self._release_user(job.user_id)
+            raise
+
+        self._reserved -= 1
+        await self._enqueue(job, reserved=True)
+        return True, "⏳ Готовлю файл…"
+
+    async def _send_cached(self, job: ExportJob) -> bool:
+        """Re-sends an already uploaded file by Telegram file_id: no DB scan,
+        no file generation, no upload."""
+        async with self.session_maker() as session:
+            cached = await Repo(session, job.tenant_id).get_report_artifact(
+                job.fmt, job.kind, job.start, job.end, job.created_by_id
+            )
+        if not cached:
+            return False
+
+        _, _, caption = EXPORT_FORMATS[job.fmt]
+        try:
+            await self.bot.send_document(
+                job.chat_id, cached.file_id, caption=job.caption or caption
+            )
+        except TelegramBadRequest as e:
+            logger.warning("Cached file_id rejected: id=%s err=%s", cached.id, e)
+            return False
+
+        audit.info(
+            "report.export.%s | chat_id=%s | kind=%s | ops=%s | cached=1",
+            job.fmt,
+            job.chat_id,
+            job.kind,
+            cached.rows,
+        )
+        return True
+
+    async def cancel(self, job_id: int, user: User) -> tuple[bool, str]:
+        job = self._jobs.get(job_id)
+        if not job:
+            return False, "Задача уже завершена."
+        if job.tenant_id != user.tenant_id or (
+            job.user_id != user.id and user.role != UserRole.owner
+        ):
+            return False, "Это не ваша задача."
+
+        async with self._cond:
+            q = self._queues.get(job.user_id)
+            queued = bool(q and job in q)
+            if queued:
+                q.remove(job)
+                if not q:
+                    del self._queues[job.user_id]
+
+        if queued:
+            # ещё не начиналась — закрываем сразу
+            self._forget(job)
+            await self._finish(job, ReportJobStatus.cancelled)
+            await self._edit(job, "✖️ Выгрузка отменена.")
+        else:
+            # выполняется — воркер остановится на ближайшей пачке строк
+            job.cancelled = True
+        audit.info("report.job.cancel | user_id=%s | job_id=%s", user.id, job_id)
+        return True, "Отменяю…"
+
+    async def resend(self, job_id: int, user: User, chat_id: int) -> tuple[bool, str]:
+        async with self.session_maker() as session:
+            row = await Repo(session, user.tenant_id).get_report_job(job_id)
+        if not row or (row.user_id != user.id and user.role != UserRole.owner):
+            return False, "Файл не найден."
+        if row.status != ReportJobStatus.done or not row.file_path:
+            return False, "Файл больше недоступен, сформируйте отчёт заново."
+        if not os.path.exists(row.file_path):
+            return False, "Файл больше недоступен, сформируйте отчёт заново."
+
+        _, filename, caption = EXPORT_FORMATS[row.fmt]
+        await self.bot.send_document(
+            chat_id, FSInputFile(row.file_path, filename=filename), caption=caption
+        )
+        audit.info("report.job.resend | user_id=%s | job_id=%s", user.id, job_id)
+        return True, "Готово"
+
+    # ----- scheduling -----
+    async def _enqueue(self, job: ExportJob, reserved: bool = False) -> None:
+        # `reserved`: место пользователя уже занято в submit
+        self._jobs[job.id] = job
+        if not reserved:
+            self._per_user[job.user_id] = self._per_user.get(job.user_id, 0) + 1
+        async with self._cond:
+            self._queues.setdefault(job.user_id, deque()).append(job)
+            self._cond.notify()
+
+    def _next_job(self) -> ExportJob:
+        # берём первого пользователя в очереди и переставляем его в конец
+        user_id = next(iter(self._queues))
+        q = self._queues.pop(user_id)
+        job = q.popleft()
+        if q:
+            self._queues[user_id] = q
+        return job
+
+    def _forget(self, job: ExportJob) -> None:
+        self._jobs.pop(job.id, None)
+        self._release_user(job.user_id)
+
+    def _release_user(self, user_id: int) -> None:
+        left = self._per_user.get(user_id, 1) - 1
+        if left > 0:
+            self._per_user[user_id] = left
+        else:
+            self._per_user.pop(user_id, None)
+
+    # ----- execution -----
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(fn, *args)
+        )
+
+    async def _update(self, job: ExportJob, **fields) -> None:
+        async with self.session_maker() as session:
+            await Repo(session, job.tenant_id).update_report_job(job.id, **fields)
+            await session.commit()
+
+    async def _finish(self, job: ExportJob, status: ReportJobStatus, **fields) -> None:
+        await self._update(
+            job, status=status, finished_at=datetime.now(timezone.utc), **fields
+        )
+
+    async def _edit(self, job: ExportJob, text: str, reply_markup=None) -> None:
+        if not job.message_id:
+            return
+        try:
+            # статус задачи — не срочно, пропускаем ответы пользователям
+            with bulk_priority():
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id=job.chat_id,
+                    message_id=job.message_id,
+                    reply_markup=reply_markup,
+                )
+        except TelegramBadRequest as e:
+            # "message is not modified" / сообщение удалено — не критично
+            logger.debug("Progress edit skipped: job_id=%s err=%s", job.id, e)
+
+    async def build(self, repo: Repo, job: ExportJob) -> tuple[str, int]:
+        writer_cls = EXPORT_FORMATS[job.fmt][0]
+        writer = await self._run(writer_cls)
+        last_progress = time.monotonic()
+        try:
+            async for batch in repo.stream_operation_rows(
+                job.op_types, job.start, job.end, job.created_by_id
+            ):
+                if job.cancelled:
+                    raise JobCancelled()
+                await self._run(writer.append_rows, batch)
+
+                if time.monotonic() - last_progress >= PROGRESS_EVERY_SEC:
+                    last_progress = time.monotonic()
+                    await self._edit(
+                        job,
+                        f"⏳ Готовлю файл… Обработано строк: {writer.rows}",
+                        report_job_progress_kb(job.id).as_markup(),
+                    )
+                    await self._update(job, rows_done=writer.rows)
+
+            # архивные месяцы читаем из файлов (новые раньше старых —
+            # порядок строк тот же, что у запроса)
+            archived: dict[tuple, list[int]] = {}
+            for period in await repo.list_archived_periods(job.start, job.end):
+                reader = await self._run(
+                    ArchiveReader,
+                    period.file_path,
+                    job.op_types,
+                    job.start,
+                    job.end,
+                    job.created_by_id,
+                )
+                try:
+                    while batch := await self._run(reader.next_batch):
+                        if job.cancelled:
+                            raise JobCancelled()
+                        await self._run(writer.append_rows, batch)
+                        for row in batch:
+                            acc = archived.setdefault((row[1], row[3]), [0, 0])
+                            acc[0] += 1
+                            acc[1] += row[2]
+                finally:
+                    await self._run(reader.close)
+
+            totals = None
+            if job.fmt == "xlsx":
+                totals = await repo.operation_totals(
+                    job.op_types, job.start, job.end, job.created_by_id
+                )
+                totals = _merge_totals(totals, archived)
+            tmp_path = await self._run(writer.finish, totals)
+        except BaseException:
+            await self._run(writer.abort)
+            raise
+
+        path = os.path.join(self.artifacts_dir, f"{job.id}.{job.fmt}")
+        await self._run(os.replace, tmp_path, path)
+        return path, writer.rows
+
+    async def _process(self, job: ExportJob) -> None:
+        _, filename, caption = EXPORT_FORMATS[job.fmt]
+        await self._update(job, status=ReportJobStatus.running)
+        await self._edit(
+            job,
+            "⏳ Готовлю файл…",
+            report_job_progress_kb(job.id).as_markup(),
+        )
+
+        async with self.session_maker() as session:
+            repo = Repo(session, job.tenant_id)
+            # версия — оттуда же, откуда строки: отстающая реплика даст
+            # старую версию, и файл не закэшируется (см. _remember_file_id)
+            version = await repo.max_operation_id(replica=True)
+            path, rows = await self.build(repo, job)
+            # версия и строки с разных серверов — полноту файла не проверить
+            if len(session.info.get(REPLICA_ROUTED, ())) > 1:
+                version = None
+
+        sent = await self.bot.send_document(
+            job.chat_id,
+            FSInputFile(path, filename=filename),
+            caption=job.caption or caption,
+            reply_markup=report_job_done_kb(job.id).as_markup(),
+        )
+        await self._finish(job, ReportJobStatus.done, rows_done=rows, file_path=path)
+        await self._remember_file_id(job, sent.document.file_id, rows, version)
+        await self._edit(job, f"✅ Файл готов. Строк: {rows}")
+
+        audit.info(
+            "report.export.%s | chat_id=%s | job_id=%s | kind=%s | ops=%s",
+            job.fmt,
+            job.chat_id,
+            job.id,
+            job.kind,
+            rows,
+        )
+
+    async def _remember_file_id(
+        self, job: ExportJob, file_id: str, rows: int, version: int | None
+    ) -> None:
+        if version is None:
+            return
+        async with self.session_maker() as session:
+            repo = Repo(session, job.tenant_id)
+            # пока строили файл, могли добавить операции (или реплика
+            # отставала) — такой не кэшируем; проверка — на основном
+            if await repo.max_operation_id() != version:
+                return
+            await repo.save_report_artifact(
+                fmt=job.fmt,
+                kind=job.kind,
+                start=job.start,
+                end=job.end,
+                scope_user_id=job.created_by_id,
+                file_id=file_id,
+                rows=rows,
+            )
+            await session.commit()
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: bool(self._queues))
+                job = self._next_job()
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except JobCancelled:
+                await self._finish(job, ReportJobStatus.cancelled)
+                await self._edit(job, "✖️ Выгрузка отменена.")
+            except Exception as e:
+                logger.exception(
+                    "Export failed: job_id=%s chat_id=%s fmt=%s",
+                    job.id,
+                    job.chat_id,
+                    job.fmt,
+                )
+                try:
+                    await self._finish(
+                        job, ReportJobStatus.failed, error=str(e)[:500]
+                    )
+                    await self._edit(
+                        job, "❗ Не удалось сформировать файл. Попробуйте позже."
+                    )
+                except Exception:
+                    logger.exception("Failed to report export error")
+            finally:
+                self._forget(job)
+
+    async def _janitor(self) -> None:
+        """Deletes expired artifacts from disk."""
+        while True:
+            try:
+                before = datetime.now(timezone.utc) - self.artifact_ttl
+                async with self.session_maker() as session:
+                    repo = Repo(session)
+                    for row in await repo.list_expired_report_artifacts(before):
+                        try:
+                            os.unlink(row.file_path)
+                        except FileNotFoundError:
+                            pass
+                        await repo.update_report_job(row.id, file_path=None)
+                    await session.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Report artifacts cleanup failed")
+            await asyncio.sleep(JANITOR_EVERY_SEC)
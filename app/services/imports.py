@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from app.importer import import_history
+from app.services.outbox import bulk_priority
+
+logger = logging.getLogger(__name__)
+audit = logging.getLogger("audit")
+
+PROGRESS_EVERY_SEC = 3.0
+MAX_ERRORS_SHOWN = 30
+
+
+@dataclass
+class ImportJob:
+    chat_id: int
+    tg_id: int
+    user_id: int
+    tenant_id: int
+    path: str  # временный файл, удаляется после импорта
+    message_id: int | None = None
+
+
+class ImportService:
+    """Background `/import`: history files are loaded off the update handler.
+
+    The handler only downloads the file and queues a job, so a big XLSX does
+    not hold the chat's queue slot or a pooled session. One worker runs the
+    jobs in order, each in its own session and transaction; parsing happens
+    in a thread (see `import_history`). The status message is edited with
+    progress and the result. Jobs are not persisted: the file is a temp file,
+    after a restart the owner sends it again.
+    """
+
+    def __init__(self, bot: Bot, session_maker, *, queue_size: int):
+        self.bot = bot
+        self.session_maker = session_maker
+        self._queue: asyncio.Queue[ImportJob] = asyncio.Queue(maxsize=queue_size)
+        self._pending: set[int] = set()  # гаражи с импортом в очереди
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._worker(), name="import-worker")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        while not self._queue.empty():
+            self._discard(self._queue.get_nowait())
+
+    def submit(self, job: ImportJob) -> tuple[bool, str]:
+        if job.tenant_id in self._pending:
+            return False, "Импорт этого гаража уже идёт, дождитесь результата."
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False, "Очередь импорта заполнена, попробуйте позже."
+        self._pending.add(job.tenant_id)
+        return True, "⏳ Импорт в очереди…"
+
+    def _discard(self, job: ImportJob) -> None:
+        self._pending.discard(job.tenant_id)
+        try:
+            os.unlink(job.path)
+        except FileNotFoundError:
+            pass
+
+    async def _edit(self, job: ImportJob, text: str) -> None:
+        if not job.message_id:
+            return
+        try:
+            with bulk_priority():
+                await self.bot.edit_message_text(
+                    text, chat_id=job.chat_id, message_id=job.message_id
+                )
+        except TelegramBadRequest as e:
+            logger.debug("Import status edit skipped: err=%s", e)
+
+    async def _process(self, job: ImportJob) -> None:
+        last_edit = time.monotonic()
+
+        async def progress(done: int) -> None:
+            nonlocal last_edit
+            if time.monotonic() - last_edit < PROGRESS_EVERY_SEC:
+                return
+            last_edit = time.monotonic()
+            await self._edit(job, f"⏳ Импорт: обработано {done} строк…")
+
+        await self._edit(job, "⏳ Импорт: читаю файл…")
+        async with self.session_maker() as session:
+            try:
+                stats = await import_history(
+                    session,
+                    job.path,
+                    job.user_id,
+                    progress=progress,
+                    tenant_id=job.tenant_id,
+                )
+            except ValueError as e:
+                await session.rollback()
+                await self._edit(job, f"❗ Не удалось прочитать файл: {e}")
+                return
+
+            if stats["error_count"]:
+                await session.rollback()
+                errors = "\n".join(
+                    f"• {e}" for e in stats["errors"][:MAX_ERRORS_SHOWN]
+                )
+                await self._edit(
+                    job,
+                    f"❗ Ошибок: {stats['error_count']}, ничего не импортировано."
+                    f"\n\n{errors}",
+                )
+                audit.info(
+                    "import.failed | tg_id=%s | errors=%s",
+                    job.tg_id,
+                    stats["error_count"],
+                )
+                return
+            await session.commit()
+
+        await self._edit(job, f"✅ Импортировано операций: {stats['imported']}")
+        audit.info(
+            "import.done | tg_id=%s | imported=%s", job.tg_id, stats["imported"]
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    "Import failed: chat_id=%s tenant_id=%s", job.chat_id, job.tenant_id
+                )
+                try:
+                    await self._edit(job, "❗ Импорт не удался. Попробуйте позже.")
+                except Exception:
+                    logger.exception("Failed to report import error")
+            finally:
+                self._discard(job)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app import events
+from app.events import OperationAdded
+from app.models import OperationType, UserRole
+from app.repository import Repo
+from app.services.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+MSK = ZoneInfo("Europe/Moscow")
+
+TYPE_RU = {
+    OperationType.income.value: "Доход",
+    OperationType.expense.value: "Расход",
+    OperationType.reserve_in.value: "В резерв",
+    OperationType.reserve_out.value: "Из резерва",
+    OperationType.transfer.value: "Перевод",
+}
+
+STATS_WINDOW_DAYS = 90
+
+
+@dataclass
+class RunningStat:
+    """Exponentially weighted mean/variance of a category's amounts."""
+
+    n: int = 0
+    mean: float = 0.0
+    var: float = 0.0
+
+    def update(self, x: float, alpha: float) -> None:
+        self.n += 1
+        if self.n == 1:
+            self.mean = x
+            self.var = 0.0
+            return
+        d = x - self.mean
+        self.mean += alpha * d
+        self.var = (1 - alpha) * (self.var + alpha * d * d)
+
+
+class Notifier:
+    """Tells owners about large or unusual operations.
+
+    Operations arrive from the after-commit hook (`app.events`), so the
+    worker's reply never waits for this. Rules: the category's notify
+    threshold, deviation from the category's running average (updated per
+    event, seeded once from SQL at start), entries outside working hours.
+    Alerts collected within `batch_delay` go out as one message per owner
+    through the outbox.
+    """
+
+    def __init__(
+        self,
+        session_maker,
+        outbox: Outbox,
+        *,
+        work_start: int,
+        work_end: int,
+        deviation_k: float,
+        min_samples: int = 10,
+        alpha: float = 0.1,
+        batch_delay: float = 5.0,
+        queue_size: int = 1000,
+    ):
+        self.session_maker = session_maker
+        self.outbox = outbox
+        self.work_start = work_start
+        self.work_end = work_end
+        self.deviation_k = deviation_k
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.batch_delay = batch_delay
+        self._queue: asyncio.Queue[OperationAdded] = asyncio.Queue(queue_size)
+        self._stats: dict[int, RunningStat] = {}
+        self._task: asyncio.Task | None = None
+        self.alerts = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        since = datetime.now(timezone.utc) - timedelta(days=STATS_WINDOW_DAYS)
+        async with self.session_maker() as session:
+            rows = []
+            for tenant_id in await Repo(session).list_tenant_ids():
+                rows += await Repo(session, tenant_id).category_amount_stats(since)
+        for cid, n, avg, sd in rows:
+            self._stats[cid] = RunningStat(n=n, mean=avg, var=sd * sd)
+        events.subscribe(self.publish)
+        self._task = asyncio.create_task(self._worker(), name="notifier")
+
+    async def stop(self) -> None:
+        events.unsubscribe(self.publish)
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def publish(self, ops: list[OperationAdded]) -> None:
+        # вызывается внутри commit — только кладём в очередь
+        for ev in ops:
+            try:
+                self._queue.put_nowait(ev)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    def _reasons(self, ev: OperationAdded, threshold: int | None) -> list[str]:
+        reasons = []
+        if threshold and ev.amount >= threshold:
+            reasons.append(f"порог {threshold} ₽")
+
+        if ev.category_id is not None:
+            st = self._stats.setdefault(ev.category_id, RunningStat())
+            if st.n >= self.min_samples:
+                limit = st.mean + self.deviation_k * st.var**0.5
+                if ev.amount > limit and ev.amount > st.mean * 2:
+                    reasons.append(f"обычно ~{st.mean:.0f} ₽")
+            st.update(ev.amount, self.alpha)
+
+        hour = ev.created_at.astimezone(MSK).hour
+        if not (self.work_start <= hour < self.work_end):
+            reasons.append("нерабочее время")
+        return reasons
+
+    async def _collect(self) -> list[OperationAdded]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_delay
+        while True:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                return batch
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                return batch
+
+    async def _process(self, batch: list[OperationAdded]) -> None:
+        by_tenant: dict[int, list[OperationAdded]] = {}
+        for ev in batch:
+            by_tenant.setdefault(ev.tenant_id, []).append(ev)
+        # владельцам гаража — только о его операциях
+        for tenant_id, ops in by_tenant.items():
+            await self._process_tenant(tenant_id, ops)
+
+    async def _process_tenant(
+        self, tenant_id: int, batch: list[OperationAdded]
+    ) -> None:
+        async with self.session_maker() as session:
+            repo = Repo(session, tenant_id)
+            cats = await repo.get_categories(
+                {ev.category_id for ev in batch if ev.category_id is not None}
+            )
+            users = await repo.list_users(active_only=True)
+
+        names = {u.id: u.name for u in users}
+        owners = [u for u in users if u.role == UserRole.owner]
+
+        alerts: list[tuple[int, str]] = []
+        for ev in batch:
+            cat = cats.get(ev.category_id)
+            reasons = self._reasons(ev, cat.notify_threshold if cat else None)
+            if not reasons:
+                continue
+            at = ev.created_at.astimezone(MSK).strftime("%d.%m %H:%M")
+            alerts.append(
+                (
+                    ev.created_by_id,
+                    f"• {TYPE_RU.get(ev.op_type, ev.op_type)} {ev.amount} ₽"
+                    f" — {cat.name if cat else 'без категории'}, "
+                    f"{names.get(ev.created_by_id, '?')}, {at} "
+                    f"({', '.join(reasons)})",
+                )
+            )
+        if not alerts:
+            return
+
+        self.alerts += len(alerts)
+        for owner in owners:
+            # о своих операциях владельцу не пишем
+            lines = [text for author, text in alerts if author != owner.id]
+            if lines:
+                self.outbox.send_message(
+                    owner.telegram_id, "🔔 Обратите внимание:\n\n" + "\n".join(lines)
+                )
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._process(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notifier batch failed: size=%s", len(batch))
+
+    def stats(self) -> str:
+        return (
+            f"Уведомления: отправлено {self.alerts}, в очереди "
+            f"{self._queue.qsize()}, отброшено {self.dropped}"
+        )
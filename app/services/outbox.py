@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage, TelegramMethod
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: ответы пользователю идут раньше фоновых рассылок
+INTERACTIVE = 0
+BULK = 1
+
+send_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "send_priority", default=INTERACTIVE
+)
+
+
+@contextmanager
+def bulk_priority():
+    """Requests made inside the block yield to interactive replies."""
+    token = send_priority.set(BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def take(self) -> float:
+        """Takes a token and returns 0, or returns seconds to wait."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: throttles every chat-bound API call with a
+    global and a per-chat token bucket and retries on 429 (retry_after).
+
+    Covers both handler replies (`message.answer`) and background sends; calls
+    made under `bulk_priority()` wait while interactive ones are queued.
+    Works with any aiogram session, including a fake one in tests.
+
+    A handler reply holds the chat's queue slot and a DB transaction, so it
+    waits out a 429 only up to `interactive_max_wait` seconds and otherwise
+    fails fast; background sends wait as long as Telegram asks.
+    """
+
+    MAX_CHATS = 10_000
+
+    def __init__(
+        self,
+        *,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+        interactive_max_wait: float = 3.0,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.interactive_max_wait = interactive_max_wait
+        self._chats: OrderedDict[Any, TokenBucket] = OrderedDict()
+        self._interactive_waiting = 0
+        # set, пока нет ожидающих интерактивных запросов
+        self._interactive_idle = asyncio.Event()
+        self._interactive_idle.set()
+
+        self.sent = 0
+        self.throttled = 0
+        self.retry_after = 0
+        self.failed_fast = 0
+        self.wait_total = 0.0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+            if len(self._chats) > self.MAX_CHATS:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _acquire(self, chat_id) -> None:
+        started = time.monotonic()
+        prio = send_priority.get()
+
+        bucket = self._chat_bucket(chat_id)
+        while (delay := bucket.take()) > 0:
+            await asyncio.sleep(delay)
+
+        if prio == INTERACTIVE:
+            self._interactive_waiting += 1
+            self._interactive_idle.clear()
+        try:
+            while True:
+                if prio == BULK and self._interactive_waiting:
+                    await self._interactive_idle.wait()
+                    continue
+                delay = self.global_bucket.take()
+                if delay <= 0:
+                    break
+                # ждём ровно до следующего токена
+                await asyncio.sleep(delay)
+        finally:
+            if prio == INTERACTIVE:
+                self._interactive_waiting -= 1
+                if not self._interactive_waiting:
+                    self._interactive_idle.set()
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled += 1
+            self.wait_total += waited
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        interactive = send_priority.get() == INTERACTIVE
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                result = await make_request(bot, method)
+                self.sent += 1
+                return result
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                attempt += 1
+                logger.warning(
+                    "Telegram flood wait | chat_id=%s | retry_after=%s | attempt=%s",
+                    chat_id,
+                    e.retry_after,
+                    attempt,
+                )
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                if interactive and e.retry_after > self.interactive_max_wait:
+                    # не держим слот чата и транзакцию десятки секунд
+                    self.failed_fast += 1
+                    raise
+                if attempt > self.max_retries:
+                    raise
+
+    def stats(self) -> str:
+        avg = (self.wait_total / self.throttled * 1000) if self.throttled else 0.0
+        return (
+            f"Отправка: запросов {self.sent}, ждали лимита {self.throttled} "
+            f"(ср. {avg:.0f} мс), 429 — {self.retry_after} "
+            f"(ответов не дождались {self.failed_fast})"
+        )
+
+
+class Outbox:
+    """Queue for background (bulk) messages: scheduler, digests, broadcasts.
+
+    `submit()` never blocks a handler; `workers` tasks send queued methods
+    with bulk priority, so they go after interactive replies and respect the
+    limits of `RateLimitMiddleware`.
+    """
+
+    def __init__(self, bot: Bot, *, queue_size: int = 1000, workers: int = 2):
+        self.bot = bot
+        self.workers = workers
+        self._queue: asyncio.Queue[TelegramMethod] = asyncio.Queue(queue_size)
+        self._tasks: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"outbox-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, method: TelegramMethod) -> bool:
+        try:
+            self._queue.put_nowait(method)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Outbox full, message dropped: %s", type(method).__name__)
+            return False
+        return True
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> bool:
+        return self.submit(SendMessage(chat_id=chat_id, text=text, **kwargs))
+
+    async def _worker(self) -> None:
+        send_priority.set(BULK)
+        while True:
+            method = await self._queue.get()
+            try:
+                await self.bot(method)
+                self.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except TelegramForbiddenError:
+                # пользователь заблокировал бота
+                self.failed += 1
+                logger.info(
+                    "Outbox: bot blocked | chat_id=%s",
+                    getattr(method, "chat_id", None),
+                )
+            except Exception:
+                self.failed += 1
+                logger.exception("Outbox send failed: %s", type(method).__name__)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> str:
+        return (
+            f"Outbox: в очереди {self._queue.qsize()}, отправлено {self.sent}, "
+            f"ошибок {self.failed}, отброшено {self.dropped}"
+        )
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.repository import Repo
+
+logger = logging.getLogger(__name__)
+
+CHECK_EVERY_SEC = 24 * 3600
+
+
+class PartitionMaintainer:
+    """Keeps monthly partitions of `operations` created `months_ahead`
+    months in advance: once at start (before polling) and then daily."""
+
+    def __init__(self, session_maker, *, months_ahead: int = 3):
+        self.session_maker = session_maker
+        self.months_ahead = months_ahead
+        self._task: asyncio.Task | None = None
+
+    async def ensure(self) -> int:
+        now = datetime.now(timezone.utc)
+        async with self.session_maker() as session:
+            created = await Repo(session).ensure_operation_partitions(
+                now, now + timedelta(days=31 * self.months_ahead)
+            )
+            await session.commit()
+        if created:
+            logger.info("operations partitions created: %s", created)
+        return created
+
+    async def start(self) -> None:
+        await self.ensure()
+        self._task = asyncio.create_task(self._loop(), name="partitions")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(CHECK_EVERY_SEC)
+            try:
+                await self.ensure()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Partition maintenance failed")
@@ -19,6 +19,26 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = "db"
     POSTGRES_PORT: int = 5432
 
+    # Connection pool. Без pre-ping: мёртвое соединение выявляет первая
+    # ошибка, пул пересоздаётся (см. app.db); recycle закрывает старые
+    # соединения раньше, чем их оборвёт сервер/NAT. Пул рассчитан на
+    # MAX_PARALLEL_CHATS + фоновые задачи
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SEC: float = 30.0
+    DB_POOL_RECYCLE_SEC: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # asyncpg: кэш prepared statements на соединение (0 — для pgbouncer в
+    # режиме transaction) и кэш SQLAlchemy поверх него
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
+    # Read-only replica for reports/exports (empty host = no replica).
+    # After a write, the garage reads from the primary for this many seconds
+    POSTGRES_REPLICA_HOST: str = ""
+    POSTGRES_REPLICA_PORT: int = 5432
+    REPLICA_READ_YOUR_WRITES_SEC: float = 5.0
+
     # App
     APP_ENV: str = "prod"
     TZ: str = "Europe/Moscow"
@@ -27,6 +47,39 @@ class Settings(BaseSettings):
     DEFAULT_INCOME_CATEGORIES: str = "Услуги,Продажи"
     DEFAULT_EXPENSE_CATEGORIES: str = "Расходники,Аренда,Зарплата"
 
+    # Updates: one chat at a time, chats in parallel
+    CHAT_QUEUE_MAX_PENDING: int = 5
+    MAX_PARALLEL_CHATS: int = 16
+
+    # Outgoing messages (Telegram limits: ~30 msg/s total, ~1 msg/s per chat)
+    SEND_GLOBAL_RATE: float = 25.0
+    SEND_CHAT_RATE: float = 1.0
+    OUTBOX_QUEUE_SIZE: int = 1000
+
+    # Owner notifications (hours in MSK)
+    NOTIFY_WORK_START: int = 8
+    NOTIFY_WORK_END: int = 21
+    NOTIFY_DEVIATION_K: float = 3.0
+
+    # Scheduled digests (MSK): daily at DIGEST_HOUR, weekly on DIGEST_WEEKDAY
+    DIGEST_HOUR: int = 21
+    DIGEST_WEEKDAY: int = 0  # 0 = понедельник
+
+    # Exports (CSV/XLSX are built in a thread pool, not in the handler)
+    EXPORT_WORKERS: int = 2
+    EXPORT_QUEUE_SIZE: int = 20
+    REPORTS_DIR: str = "reports"
+    REPORT_ARTIFACT_TTL_HOURS: int = 24
+
+    # Cold archive of old months (python -m app.archiver)
+    ARCHIVE_DIR: str = "archive"
+
+    # /import: history files are loaded by a background worker
+    IMPORT_QUEUE_SIZE: int = 5
+
+    # Charts (matplotlib in separate processes)
+    CHART_WORKERS: int = 1
+
     @property
     def database_url_async(self) -> str:
         return (
@@ -34,6 +87,16 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def database_url_replica_async(self) -> str | None:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return (
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"@{self.POSTGRES_REPLICA_HOST}:{self.POSTGRES_REPLICA_PORT}"
+            f"/{self.POSTGRES_DB}"
+        )
+
     @property
     def database_url_sync(self) -> str:
         # Alembic uses sync URL
@@ -3,6 +3,7 @@ from aiogram.fsm.state import State, StatesGroup
 
 class IncomeFlow(StatesGroup):
     amount = State()
+    account = State()
     category = State()
     comment = State()
     confirm = State()
@@ -10,6 +11,7 @@ class IncomeFlow(StatesGroup):
 
 class ExpenseFlow(StatesGroup):
     amount = State()
+    account = State()
     category = State()
     counterparty = State()
     comment = State()
@@ -21,6 +23,14 @@ class ReserveFlow(StatesGroup):
     remove_amount = State()
 
 
+class TransferFlow(StatesGroup):
+    amount = State()
+
+
+class AccountFlow(StatesGroup):
+    add_name = State()
+
+
 class ReportFlow(StatesGroup):
     kind = State()
     period = State()
@@ -37,6 +47,8 @@ class UserAdminFlow(StatesGroup):
 class CategoryAdminFlow(StatesGroup):
     add_name = State()
     rename_name = State()
+    threshold = State()
+    budget = State()
 
 
 class CounterpartyFlow(StatesGroup):
@@ -54,3 +66,12 @@ class MonthlyExpenseFlow(StatesGroup):
     add_category = State()
     add_counterparty = State()
     add_comment = State()
+
+
+class BulkFlow(StatesGroup):
+    input = State()
+    confirm = State()
+
+
+class ImportFlow(StatesGroup):
+    file = State()
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import contextvars
+
+# Гараж, созданный миграцией для данных до появления тенантов
+DEFAULT_TENANT_ID = 1
+
+# Ключ в session.info: гараж, с данными которого работает сессия
+TENANT = "tenant_id"
+
+# Гараж текущего апдейта; ставит UserMiddleware по пользователю
+current_tenant: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "current_tenant", default=DEFAULT_TENANT_ID
+)
+
+
+def session_tenant(session) -> int:
+    """Tenant the session was bound to by `Repo`, else the current one."""
+    return session.info.get(TENANT) or current_tenant.get()
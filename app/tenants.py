@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bootstrap import seed_tenant
+from app.db import create_engine_and_session
+from app.models import UserRole
+from app.repository import Repo
+from app.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCOUNT = "Касса"
+
+
+async def create_garage(
+    session: AsyncSession,
+    settings: Settings,
+    name: str,
+    owner_telegram_id: int,
+    owner_name: str = "Owner",
+) -> tuple[bool, str]:
+    """Creates a tenant with its owner, default categories and a cash
+    account. Runs in the caller's transaction."""
+    if not " ".join((name or "").split()):
+        return False, "garage name is empty"
+    if await Repo(session).get_user_by_tg(owner_telegram_id):
+        return False, f"telegram_id={owner_telegram_id} already belongs to a garage"
+
+    tenant = await Repo(session).create_tenant(name)
+    repo = Repo(session, tenant.id)
+    await repo.create_user(owner_telegram_id, name=owner_name, role=UserRole.owner)
+    await seed_tenant(repo, settings)
+    await repo.create_account(DEFAULT_ACCOUNT)
+    return True, f"garage {tenant.id} created: {tenant.name}"
+
+
+async def _run(args: argparse.Namespace) -> None:
+    settings = Settings()
+    engine, session_maker = create_engine_and_session(settings)
+    try:
+        async with session_maker() as session:
+            if args.command == "add":
+                ok, msg = await create_garage(
+                    session, settings, args.name, args.owner, args.owner_name
+                )
+                if not ok:
+                    raise SystemExit(msg)
+                await session.commit()
+                print(msg)
+                return
+
+            for tenant in await Repo(session).list_tenants():
+                users = await Repo(session, tenant.id).count_users()
+                print(f"{tenant.id}\t{tenant.name}\tusers={users}")
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Garages (tenants) of the bot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="create a garage with its owner")
+    add.add_argument("name", help="garage name")
+    add.add_argument(
+        "--owner", type=int, required=True, help="owner's Telegram ID"
+    )
+    add.add_argument("--owner-name", default="Owner")
+    sub.add_parser("list", help="list garages")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+from datetime import datetime
+
+from app.models import OperationType
+
+ZSTD_LEVEL = 10
+
+# Длина строки выгрузки; в архивах до появления счетов колонок счёта нет
+ROW_WIDTH = 12
+
+
+class ArchiveWriter:
+    """zstd-compressed JSON Lines with flat export rows
+    (see `Repo.stream_operation_rows`), one file per archived month.
+
+    Methods are blocking — call them from a worker thread.
+    """
+
+    def __init__(self, path: str):
+        import zstandard
+
+        self.path = path
+        self._tmp = path + ".part"
+        self._raw = open(self._tmp, "wb")
+        self._zst = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+            self._raw
+        )
+        self._f = io.TextIOWrapper(self._zst, encoding="utf-8")
+        self.rows = 0
+
+    def append_rows(self, rows: list[tuple]) -> None:
+        for r in rows:
+            op_type, created_at = r[1], r[7]
+            rec = list(r)
+            rec[1] = getattr(op_type, "value", op_type)
+            rec[7] = created_at.isoformat()
+            self._f.write(json.dumps(rec, ensure_ascii=False))
+            self._f.write("\n")
+        self.rows += len(rows)
+
+    def finish(self) -> str:
+        self._f.flush()
+        self._zst.flush()
+        os.fsync(self._raw.fileno())
+        self._f.close()
+        os.replace(self._tmp, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self._f.close()
+        try:
+            os.unlink(self._tmp)
+        except FileNotFoundError:
+            pass
+
+
+class ArchiveReader:
+    """Reads an archive file back as export rows, applying the same filters
+    as `Repo.stream_operation_rows`. Blocking — use from a worker thread."""
+
+    def __init__(
+        self,
+        path: str,
+        op_types: list[OperationType] | None,
+        start: datetime | None,
+        end: datetime | None,
+        created_by_id: int | None = None,
+        batch_size: int = 2000,
+    ):
+        import zstandard
+
+        self._raw = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(self._raw)
+        self._f = io.TextIOWrapper(reader, encoding="utf-8")
+        self.types = {t.value for t in op_types} if op_types else None
+        self.start = start
+        self.end = end
+        self.created_by_id = created_by_id
+        self.batch_size = batch_size
+
+    def _match(self, rec: list, created_at: datetime) -> bool:
+        if self.types and rec[1] not in self.types:
+            return False
+        if self.start and created_at < self.start:
+            return False
+        if self.end and created_at > self.end:
+            return False
+        if self.created_by_id and rec[8] != self.created_by_id:
+            return False
+        return True
+
+    def next_batch(self) -> list[tuple]:
+        """Returns up to `batch_size` matching rows; [] at end of file."""
+        batch = []
+        for line in self._f:
+            rec = json.loads(line)
+            created_at = datetime.fromisoformat(rec[7])
+            if not self._match(rec, created_at):
+                continue
+            rec[1] = OperationType(rec[1])
+            rec[7] = created_at
+            rec += [None] * (ROW_WIDTH - len(rec))
+            batch.append(tuple(rec))
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    def close(self) -> None:
+        self._f.close()
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import csv
+import io
+
+from app.models import OperationType
+from app.utils.money import parse_amount
+
+# Значения колонки/первого поля "тип" -> тип операции.
+# Резерв пакетом не вносим: для него есть отдельный сценарий.
+TYPE_ALIASES = {
+    "доход": OperationType.income,
+    "income": OperationType.income,
+    "+": OperationType.income,
+    "расход": OperationType.expense,
+    "expense": OperationType.expense,
+    "-": OperationType.expense,
+}
+
+MAX_ROWS = 500
+
+
+def _norm(s: str | None) -> str:
+    return " ".join((s or "").split()).casefold()
+
+
+def build_reference(
+    income_categories, expense_categories, counterparties
+) -> dict:
+    """Справочники для проверки строк: имя (casefold) -> id.
+
+    Загружается один раз на весь пакет, а не на каждую строку.
+    """
+    return {
+        OperationType.income: {_norm(c.name): c.id for c in income_categories},
+        OperationType.expense: {_norm(c.name): c.id for c in expense_categories},
+        "counterparties": {_norm(c.name): c.id for c in counterparties},
+        "counterparty_ids": {c.id for c in counterparties},
+    }
+
+
+def _validate_row(
+    line_no: int,
+    type_raw: str,
+    amount_raw: str,
+    category_raw: str,
+    counterparty_raw: str,
+    comment_raw: str,
+    ref: dict,
+    counterparty_id_raw: str = "",
+) -> tuple[dict | None, str | None]:
+    op_type = TYPE_ALIASES.get(_norm(type_raw))
+    if op_type is None:
+        return None, f"строка {line_no}: неизвестный тип «{type_raw}» (доход/расход)"
+
+    amount = parse_amount(amount_raw)
+    if not amount:
+        return None, f"строка {line_no}: сумма «{amount_raw}» — нужно целое число > 0"
+
+    category_id = ref[op_type].get(_norm(category_raw))
+    if category_id is None:
+        return None, f"строка {line_no}: нет категории «{category_raw}»"
+
+    counterparty_id = None
+    cp_id_raw = (counterparty_id_raw or "").strip()
+    if cp_id_raw:
+        if not cp_id_raw.isdigit() or int(cp_id_raw) not in ref["counterparty_ids"]:
+            return None, f"строка {line_no}: нет контрагента #{cp_id_raw}"
+        counterparty_id = int(cp_id_raw)
+    elif _norm(counterparty_raw) not in ("", "-", "—"):
+        counterparty_id = ref["counterparties"].get(_norm(counterparty_raw))
+        if counterparty_id is None:
+            return None, f"строка {line_no}: нет контрагента «{counterparty_raw}»"
+
+    if counterparty_id is not None and op_type != OperationType.expense:
+        return None, f"строка {line_no}: контрагент указывается только для расхода"
+
+    return {
+        "line": line_no,
+        "op_type": op_type.value,
+        "amount": amount,
+        "category_id": category_id,
+        "counterparty_id": counterparty_id,
+        "comment": (comment_raw or "").strip() or None,
+    }, None
+
+
+def parse_bulk_text(text: str, ref: dict) -> tuple[list[dict], list[str]]:
+    """Разбирает многострочное сообщение.
+
+    Формат строки (разделитель ';'):
+        тип; сумма; категория[; контрагент][; комментарий]
+    Например:
+        доход; 3500; Услуги; ; заправка Kia
+        расход; 1200; Расходники; Фреон-Опт; баллон R134a
+    """
+    rows: list[dict] = []
+    errors: list[str] = []
+    for line_no, line in enumerate((text or "").splitlines(), start=1):
+        if not line.strip():
+            continue
+        parts = [p.strip() for p in line.split(";")]
+        if len(parts) < 3:
+            errors.append(
+                f"строка {line_no}: нужно минимум «тип; сумма; категория»"
+            )
+            continue
+        parts += [""] * (5 - len(parts))
+        type_raw, amount_raw, category_raw, cp_raw = parts[:4]
+        comment_raw = ";".join(parts[4:])
+        row, err = _validate_row(
+            line_no, type_raw, amount_raw, category_raw, cp_raw, comment_raw, ref
+        )
+        if err:
+            errors.append(err)
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+def parse_bulk_csv(data: bytes, ref: dict) -> tuple[list[dict], list[str]]:
+    """Разбирает CSV с колонками как у `export_operations_csv`.
+
+    Используются type, amount, category, counterparty_id/counterparty_name и
+    comment; id, дата и автор игнорируются — операции записываются от имени
+    текущего пользователя.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return [], ["файл не в кодировке UTF-8"]
+
+    reader = csv.DictReader(io.StringIO(text, newline=""))
+    required = {"type", "amount", "category"}
+    if not reader.fieldnames or not required.issubset(reader.fieldnames):
+        return [], ["в CSV нет колонок type, amount, category"]
+
+    rows: list[dict] = []
+    errors: list[str] = []
+    # строка 1 — заголовок
+    for line_no, rec in enumerate(reader, start=2):
+        row, err = _validate_row(
+            line_no,
+            rec.get("type") or "",
+            rec.get("amount") or "",
+            rec.get("category") or "",
+            rec.get("counterparty_name") or "",
+            rec.get("comment") or "",
+            ref,
+            counterparty_id_raw=rec.get("counterparty_id") or "",
+        )
+        if err:
+            errors.append(err)
+        else:
+            rows.append(row)
+    return rows, errors
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import io
+from datetime import date, timedelta
+
+MAX_PIE_SLICES = 7
+
+
+def warm_up() -> None:
+    """Imports matplotlib in a fresh worker process, so the first chart does
+    not pay for it."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_period_chart(
+    title: str,
+    start: date,
+    end: date,
+    daily: list[tuple[date, str, int]],
+    categories: list[tuple[str | None, int]],
+    opening: int,
+) -> bytes:
+    """Renders one PNG with daily income/expense bars, an expense-by-category
+    pie and the balance line.
+
+    Pure CPU work on plain data: runs in a worker process (see
+    `app.services.charts`), never in the event loop.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    index = {d: i for i, d in enumerate(days)}
+    income = [0] * len(days)
+    expense = [0] * len(days)
+    for d, op_type, total in daily:
+        i = index.get(d)
+        if i is None:
+            continue
+        if op_type == "income":
+            income[i] += total
+        elif op_type == "expense":
+            expense[i] += total
+
+    balance = []
+    running = opening
+    for inc, exp in zip(income, expense):
+        running += inc - exp
+        balance.append(running)
+
+    fig = plt.figure(figsize=(10, 8), dpi=100)
+    grid = fig.add_gridspec(2, 2, height_ratios=[1, 1])
+    ax_bars = fig.add_subplot(grid[0, :])
+    ax_pie = fig.add_subplot(grid[1, 0])
+    ax_line = fig.add_subplot(grid[1, 1])
+    fig.suptitle(title)
+
+    x = range(len(days))
+    labels = [d.strftime("%d.%m") for d in days]
+    step = max(1, len(days) // 10)
+    ax_bars.bar(
+        [i - 0.2 for i in x], income, width=0.4, color="#2e9e44", label="Доходы"
+    )
+    ax_bars.bar(
+        [i + 0.2 for i in x], expense, width=0.4, color="#d64541", label="Расходы"
+    )
+    ax_bars.set_xticks(list(x)[::step], labels[::step])
+    ax_bars.legend()
+    ax_bars.set_title("По дням, ₽")
+
+    slices = sorted(
+        ((name or "Без категории", total) for name, total in categories if total > 0),
+        key=lambda s: s[1],
+        reverse=True,
+    )
+    if len(slices) > MAX_PIE_SLICES:
+        rest = sum(t for _, t in slices[MAX_PIE_SLICES - 1 :])
+        slices = slices[: MAX_PIE_SLICES - 1] + [("Прочее", rest)]
+    if slices:
+        ax_pie.pie(
+            [t for _, t in slices],
+            labels=[n for n, _ in slices],
+            autopct="%1.0f%%",
+            textprops={"fontsize": 8},
+        )
+    else:
+        ax_pie.text(0.5, 0.5, "Расходов нет", ha="center", va="center")
+        ax_pie.axis("off")
+    ax_pie.set_title("Расходы по категориям")
+
+    ax_line.plot(list(x), balance, color="#3b6fd4")
+    ax_line.axhline(0, color="#999999", linewidth=0.8)
+    ax_line.set_xticks(list(x)[::step], labels[::step], rotation=45)
+    ax_line.set_title("Баланс на конец дня, ₽")
+
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import csv
+import os
 import tempfile
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -9,6 +10,21 @@ from app.models import Operation
 
 MSK = ZoneInfo("Europe/Moscow")
 
+HEADER = [
+    "id",
+    "type",
+    "amount",
+    "category",
+    "counterparty_id",
+    "counterparty_name",
+    "comment",
+    "created_at_msk",
+    "created_by_id",
+    "created_by_name",
+    "account",
+    "to_account",
+]
+
 
 def _fmt_dt(dt: datetime) -> str:
     try:
@@ -17,50 +33,94 @@ def _fmt_dt(dt: datetime) -> str:
         return dt.strftime("%Y-%m-%d %H:%M:%S")
 
 
-def export_operations_csv(ops: list[Operation]) -> str:
-    """Returns path to temporary CSV file (Excel-friendly)."""
-    tmp = tempfile.NamedTemporaryFile(
-        mode="w", suffix=".csv", delete=False, encoding="utf-8", newline=""
-    )
-    path = tmp.name
-    tmp.close()
+class CsvOperationsWriter:
+    """Streaming CSV writer for flat export rows
+    (see `Repo.stream_operation_rows`).
 
-    with open(path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(
-            [
-                "id",
-                "type",
-                "amount",
-                "category",
-                "counterparty_id",
-                "counterparty_name",
-                "comment",
-                "created_at_msk",
-                "created_by_id",
-                "created_by_name",
-            ]
-        )
-        for op in ops:
-            cat = op.category.name if getattr(op, "category", None) else ""
-            dt = op.created_at
-            dt_str = _fmt_dt(dt) if isinstance(dt, datetime) else str(dt)
+    Methods are blocking — call them from a worker thread.
+    """
 
-            created_by = getattr(op, "created_by", None)
-            created_by_name = getattr(created_by, "name", "") or ""
-            writer.writerow(
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        self._f = open(self.path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._f)
+        self._writer.writerow(HEADER)
+        self.rows = 0
+
+    def append_rows(self, rows: list[tuple]) -> None:
+        for (
+            op_id,
+            op_type,
+            amount,
+            cat_name,
+            cp_id,
+            cp_name,
+            comment,
+            created_at,
+            created_by_id,
+            created_by_name,
+            account_name,
+            to_account_name,
+        ) in rows:
+            dt_str = (
+                _fmt_dt(created_at)
+                if isinstance(created_at, datetime)
+                else str(created_at)
+            )
+            self._writer.writerow(
                 [
-                    op.id,
-                    op.op_type.value,
-                    op.amount,
-                    cat,
-                    (op.counterparty_id or ""),
-                    (getattr(getattr(op, "counterparty", None), "name", "") or ""),
-                    op.comment or "",
+                    op_id,
+                    getattr(op_type, "value", op_type),
+                    amount,
+                    cat_name or "",
+                    (cp_id or ""),
+                    cp_name or "",
+                    comment or "",
                     dt_str,
-                    op.created_by_id,
-                    created_by_name,
+                    created_by_id,
+                    created_by_name or "",
+                    account_name or "",
+                    to_account_name or "",
                 ]
             )
+        self.rows += len(rows)
+
+    def finish(self, totals=None) -> str:
+        """Closes the file and returns its path. `totals` is unused (CSV has
+        no summary sheet) and accepted for parity with the XLSX writer."""
+        self._f.close()
+        return self.path
 
-    return path
+    def abort(self) -> None:
+        """Closes and removes an unfinished file."""
+        self._f.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def export_operations_csv(ops: list[Operation]) -> str:
+    """Returns path to temporary CSV file (Excel-friendly)."""
+    writer = CsvOperationsWriter()
+    writer.append_rows(
+        [
+            (
+                op.id,
+                op.op_type,
+                op.amount,
+                op.category.name if getattr(op, "category", None) else "",
+                op.counterparty_id,
+                getattr(getattr(op, "counterparty", None), "name", "") or "",
+                op.comment,
+                op.created_at,
+                op.created_by_id,
+                getattr(getattr(op, "created_by", None), "name", "") or "",
+                getattr(getattr(op, "account", None), "name", "") or "",
+                getattr(getattr(op, "to_account", None), "name", "") or "",
+            )
+            for op in ops
+        ]
+    )
+    return writer.finish()
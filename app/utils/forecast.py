@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+# Сколько последних дней истории берём для скользящего среднего
+DEFAULT_WINDOW_DAYS = 56
+
+
+@dataclass
+class Forecast:
+    days: list[date]
+    balance: np.ndarray  # "доступно" на конец каждого дня
+    income_rate: float  # ожидаемый доход в день
+    expense_rate: float  # ожидаемый расход в день (без шаблонов)
+    scheduled: list[tuple[date, str, int]]  # (день, шаблон, сумма)
+    first_negative: date | None
+
+
+def daily_rates(
+    rows: list[tuple[date, str, int | None, int]],
+    today: date,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+) -> dict[tuple[str, int | None], float]:
+    """Moving average of daily amounts per (op_type, category_id).
+
+    `rows` are daily SQL aggregates (day, op_type, category_id, sum). Days
+    without operations count as zero; the window ends yesterday, so an
+    unfinished today does not drag the average down.
+    """
+    if not rows:
+        return {}
+
+    start = today - timedelta(days=window_days)
+    keys = sorted({(t, cid) for _, t, cid, _ in rows}, key=str)
+    index = {k: i for i, k in enumerate(keys)}
+
+    # матрица серия × день, заполняется одним векторным присваиванием
+    series = np.zeros((len(keys), window_days))
+    day_idx = np.array([(d - start).days for d, _, _, _ in rows])
+    key_idx = np.array([index[(t, cid)] for _, t, cid, _ in rows])
+    amounts = np.array([s for _, _, _, s in rows], dtype=float)
+    inside = (day_idx >= 0) & (day_idx < window_days)
+    np.add.at(series, (key_idx[inside], day_idx[inside]), amounts[inside])
+
+    means = series.mean(axis=1)
+    return {k: float(means[i]) for k, i in index.items()}
+
+
+def template_dates(
+    templates: list[tuple[int, str, int, int]],
+    applied: set[int],
+    today: date,
+    horizon: int,
+) -> list[tuple[date, str, int]]:
+    """Expands monthly templates (id, title, day_of_month, amount) into dated
+    payments within [today, today + horizon). A template already applied
+    this month (its id in `applied`) is skipped for the current month."""
+    end = today + timedelta(days=horizon)
+    out = []
+    y, m = today.year, today.month
+    while date(y, m, 1) < end:
+        last = calendar.monthrange(y, m)[1]
+        for me_id, title, dom, amount in templates:
+            d = date(y, m, min(dom, last))
+            if (y, m) == (today.year, today.month):
+                if me_id in applied:
+                    continue
+                # срок прошёл, а трата не внесена — ждём её сегодня
+                d = max(d, today)
+            if today <= d < end:
+                out.append((d, title, amount))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return sorted(out)
+
+
+def project(
+    available: int,
+    rates: dict[tuple[str, int | None], float],
+    scheduled: list[tuple[date, str, int]],
+    today: date,
+    horizon: int,
+) -> Forecast:
+    income_rate = sum(v for (t, _), v in rates.items() if t == "income")
+    expense_rate = sum(v for (t, _), v in rates.items() if t == "expense")
+
+    flow = np.full(horizon, income_rate - expense_rate)
+    if scheduled:
+        idx = np.array([(d - today).days for d, _, _ in scheduled])
+        np.subtract.at(flow, idx, np.array([a for _, _, a in scheduled], float))
+    balance = available + np.cumsum(flow)
+
+    days = [today + timedelta(days=i) for i in range(horizon)]
+    negative = np.flatnonzero(balance < 0)
+    return Forecast(
+        days=days,
+        balance=balance,
+        income_rate=income_rate,
+        expense_rate=expense_rate,
+        scheduled=scheduled,
+        first_negative=days[negative[0]] if negative.size else None,
+    )
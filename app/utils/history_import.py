@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import csv
+from datetime import datetime
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+from app.models import OperationType
+
+MSK = ZoneInfo("Europe/Moscow")
+
+# Каноническое имя колонки -> допустимые заголовки (регистр не важен).
+# Первые варианты совпадают с колонками `export_operations_csv`, есть и
+# заголовки XLSX-выгрузки
+HEADER_ALIASES = {
+    "type": ("type", "тип"),
+    "amount": ("amount", "сумма", "сумма, ₽"),
+    "category": ("category", "категория"),
+    "counterparty": ("counterparty_name", "counterparty", "контрагент"),
+    "comment": ("comment", "комментарий"),
+    "created_at": ("created_at_msk", "created_at", "дата", "дата (мск)"),
+    "account": ("account", "счёт", "счет"),
+    "to_account": ("to_account", "счёт зачисления", "счет зачисления"),
+}
+
+TYPE_VALUES = {
+    "income": OperationType.income,
+    "доход": OperationType.income,
+    "expense": OperationType.expense,
+    "расход": OperationType.expense,
+    "reserve_in": OperationType.reserve_in,
+    "в резерв": OperationType.reserve_in,
+    "reserve_out": OperationType.reserve_out,
+    "из резерва": OperationType.reserve_out,
+    "transfer": OperationType.transfer,
+    "перевод": OperationType.transfer,
+}
+
+DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%d.%m.%Y",
+)
+
+
+def _map_header(header) -> dict[int, str]:
+    lookup = {
+        alias: key for key, aliases in HEADER_ALIASES.items() for alias in aliases
+    }
+    mapping = {}
+    for idx, name in enumerate(header):
+        key = lookup.get(str(name or "").strip().casefold())
+        if key and key not in mapping.values():
+            mapping[idx] = key
+    return mapping
+
+
+def _iter_rows(rows: Iterator) -> Iterator[tuple[int, dict]]:
+    header = next(rows, None)
+    if header is None:
+        return
+    mapping = _map_header(header)
+    missing = {"type", "amount", "created_at"} - set(mapping.values())
+    if missing:
+        raise ValueError(f"нет колонок: {', '.join(sorted(missing))}")
+
+    # строка 1 — заголовок
+    for line_no, row in enumerate(rows, start=2):
+        if not row or all(v in (None, "") for v in row):
+            continue
+        yield line_no, {
+            key: (row[idx] if idx < len(row) else None)
+            for idx, key in mapping.items()
+        }
+
+
+def iter_source_records(path: str) -> Iterator[tuple[int, dict]]:
+    """Потоково читает CSV или XLSX, не загружая файл целиком."""
+    if path.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            yield from _iter_rows(ws.iter_rows(values_only=True))
+        finally:
+            wb.close()
+        return
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        yield from _iter_rows(csv.reader(f))
+
+
+def _parse_amount(value) -> int | None:
+    if isinstance(value, (int, float)):
+        amount = int(value)
+        return amount if amount > 0 and amount == value else None
+    cleaned = str(value or "").strip().replace(" ", "").replace("\xa0", "")
+    if not cleaned.isdigit():
+        return None
+    amount = int(cleaned)
+    return amount if amount > 0 else None
+
+
+def _parse_datetime(value) -> datetime | None:
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        raw = str(value or "").strip()
+        dt = None
+        for fmt in DATE_FORMATS:
+            try:
+                dt = datetime.strptime(raw, fmt)
+                break
+            except ValueError:
+                continue
+        if dt is None:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=MSK)
+    return dt
+
+
+def _text(value) -> str:
+    return " ".join(str(value or "").split())
+
+
+def parse_record(line_no: int, rec: dict) -> tuple[dict | None, str | None]:
+    op_type = TYPE_VALUES.get(_text(rec.get("type")).casefold())
+    if op_type is None:
+        return None, f"строка {line_no}: неизвестный тип «{rec.get('type')}»"
+
+    amount = _parse_amount(rec.get("amount"))
+    if amount is None:
+        return None, f"строка {line_no}: неверная сумма «{rec.get('amount')}»"
+
+    created_at = _parse_datetime(rec.get("created_at"))
+    if created_at is None:
+        return None, f"строка {line_no}: неверная дата «{rec.get('created_at')}»"
+
+    category = _text(rec.get("category"))
+    if len(category) > 64:
+        return None, f"строка {line_no}: слишком длинная категория"
+    counterparty = _text(rec.get("counterparty"))
+    if counterparty in ("-", "—"):
+        counterparty = ""
+    if len(counterparty) > 128:
+        return None, f"строка {line_no}: слишком длинный контрагент"
+
+    account = _text(rec.get("account"))
+    to_account = _text(rec.get("to_account"))
+    if op_type == OperationType.transfer:
+        if not account or not to_account:
+            return None, f"строка {line_no}: у перевода нужны оба счёта"
+        if account.casefold() == to_account.casefold():
+            return None, f"строка {line_no}: перевод на тот же счёт"
+    else:
+        to_account = ""
+
+    return {
+        "op_type": op_type,
+        "amount": amount,
+        "category": category,
+        "counterparty": counterparty,
+        "comment": str(rec.get("comment") or "").strip() or None,
+        "created_at": created_at,
+        "account": account,
+        "to_account": to_account,
+    }, None
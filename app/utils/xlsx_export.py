@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.models import OperationType
+
+MSK = ZoneInfo("Europe/Moscow")
+
+HEADER = [
+    "id",
+    "Тип",
+    "Сумма, ₽",
+    "Категория",
+    "ID контрагента",
+    "Контрагент",
+    "Комментарий",
+    "Дата (МСК)",
+    "ID автора",
+    "Автор",
+    "Счёт",
+    "Счёт зачисления",
+]
+
+TYPE_RU = {
+    OperationType.income: "Доход",
+    OperationType.expense: "Расход",
+    OperationType.reserve_in: "В резерв",
+    OperationType.reserve_out: "Из резерва",
+    OperationType.transfer: "Перевод",
+}
+
+DATE_FORMAT = "DD.MM.YYYY HH:MM"
+MONEY_FORMAT = "#,##0"
+
+
+class XlsxOperationsWriter:
+    """Write-only (streaming) XLSX: rows are flushed to disk as they come,
+    memory use does not depend on the number of operations.
+
+    Methods are blocking — call them from a worker thread.
+    """
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self._wb = Workbook(write_only=True)
+        self._ops = self._wb.create_sheet("Операции")
+        self._ops.freeze_panes = "A2"
+        self._ops.append(HEADER)
+        self.rows = 0
+
+    def _cell(self, ws, value, number_format: str | None = None):
+        from openpyxl.cell import WriteOnlyCell
+
+        cell = WriteOnlyCell(ws, value=value)
+        if number_format:
+            cell.number_format = number_format
+        return cell
+
+    def append_rows(self, rows: list[tuple]) -> None:
+        ws = self._ops
+        for (
+            op_id,
+            op_type,
+            amount,
+            cat_name,
+            cp_id,
+            cp_name,
+            comment,
+            created_at,
+            created_by_id,
+            created_by_name,
+            account_name,
+            to_account_name,
+        ) in rows:
+            # Excel не умеет в timezone — пишем "наивное" время по МСК
+            dt = (
+                created_at.astimezone(MSK).replace(tzinfo=None)
+                if isinstance(created_at, datetime)
+                else created_at
+            )
+            ws.append(
+                [
+                    op_id,
+                    TYPE_RU.get(op_type, str(op_type)),
+                    self._cell(ws, amount, MONEY_FORMAT),
+                    cat_name or "",
+                    cp_id,
+                    cp_name or "",
+                    comment or "",
+                    self._cell(ws, dt, DATE_FORMAT),
+                    created_by_id,
+                    created_by_name or "",
+                    account_name or "",
+                    to_account_name or "",
+                ]
+            )
+        self.rows += len(rows)
+
+    def finish(self, totals: list[tuple[OperationType, str | None, int, int]]) -> str:
+        """Adds the summary sheet and saves. Returns path to a temp file."""
+        ws = self._wb.create_sheet("Итоги")
+        ws.append(["Тип", "Категория", "Операций", "Сумма, ₽"])
+        by_type: dict[OperationType, int] = {}
+        for op_type, cat_name, cnt, total in totals:
+            by_type[op_type] = by_type.get(op_type, 0) + total
+            ws.append(
+                [
+                    TYPE_RU.get(op_type, str(op_type)),
+                    cat_name or "—",
+                    cnt,
+                    self._cell(ws, total, MONEY_FORMAT),
+                ]
+            )
+
+        ws.append([])
+        for op_type, label in TYPE_RU.items():
+            total = by_type.get(op_type, 0)
+            ws.append([label, "Итого", None, self._cell(ws, total, MONEY_FORMAT)])
+
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        self._wb.save(path)
+        return path
+
+    def abort(self) -> None:
+        """Drops an unfinished workbook. Nothing is saved, temp data of
+        write-only sheets is released with the workbook object."""
+        self._wb = None
+        self._ops = None
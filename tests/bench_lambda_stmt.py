@@ -0,0 +1,88 @@
+"""select() vs lambda_stmt for the per-update repository queries, executed
+through an ORM Session on in-memory SQLite: the difference is SQLAlchemy's
+own overhead (building the statement, its cache key, binding parameters),
+which does not depend on the database.
+
+    python -m tests.bench_lambda_stmt
+
+With SQLAlchemy 2.0 lambda_stmt builds the statement and its cache key ~5x
+faster, but every execution then clones the statement to substitute the
+closure values, and end to end it was 5-35% slower than select(), whose
+compiled form is cached anyway. The repository therefore uses plain select().
+"""
+
+import timeit
+
+from sqlalchemy import create_engine, func, lambda_stmt, select
+from sqlalchemy.orm import Session
+
+from app.models import Account, Category, CategoryKind, Operation, Tenant, User
+from app.repository import BALANCE_TYPES
+
+N = 2_000
+REPEAT = 15
+
+
+def queries(tenant_id: int, telegram_id: int, kind: CategoryKind) -> dict:
+    """name -> (select() version, lambda_stmt version)."""
+    return {
+        # сущность целиком (get_user_by_tg, get_category_by_name)
+        "entity": (
+            lambda: select(User).where(
+                User.telegram_id == telegram_id, User.is_active == True
+            ),
+            lambda: lambda_stmt(
+                lambda: select(User).where(
+                    User.telegram_id == telegram_id, User.is_active == True
+                )
+            ),
+        ),
+        # колонки (list_categories)
+        "columns": (
+            lambda: select(Category.id, Category.name)
+            .where(Category.tenant_id == tenant_id, Category.kind == kind)
+            .order_by(Category.name.asc()),
+            lambda: lambda_stmt(
+                lambda: select(Category.id, Category.name)
+                .where(Category.tenant_id == tenant_id, Category.kind == kind)
+                .order_by(Category.name.asc())
+            ),
+        ),
+        # агрегат (net_totals)
+        "aggregate": (
+            lambda: select(Operation.op_type, func.sum(Operation.amount))
+            .where(
+                Operation.tenant_id == tenant_id,
+                Operation.op_type.in_(BALANCE_TYPES),
+            )
+            .group_by(Operation.op_type),
+            lambda: lambda_stmt(
+                lambda: select(Operation.op_type, func.sum(Operation.amount))
+                .where(
+                    Operation.tenant_id == tenant_id,
+                    Operation.op_type.in_(BALANCE_TYPES),
+                )
+                .group_by(Operation.op_type)
+            ),
+        ),
+    }
+
+
+def main() -> None:
+    engine = create_engine("sqlite://")
+    tables = [t.__table__ for t in (Tenant, Account, User, Category, Operation)]
+    User.metadata.create_all(engine, tables=tables)
+
+    with Session(engine) as s:
+        pairs = queries(1, 123456789, CategoryKind.expense)
+        for name, (plain, cached) in pairs.items():
+            for label, build in (("select", plain), ("lambda_stmt", cached)):
+                run = lambda: s.execute(build()).all()  # noqa: E731
+                run()  # прогрев кэша компиляции
+                best = min(timeit.repeat(run, number=N, repeat=REPEAT))
+                print(f"{name:>9} {label:>11}: {best / N * 1e6:6.1f} мкс")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""ChatQueueMiddleware: one chat in order, chats in parallel, overflow dropped."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from app.middlewares.chat_queue import ChatQueueMiddleware  # noqa: E402
+
+
+class Handler:
+    """Records start/finish of every update; each waits for its gate."""
+
+    def __init__(self):
+        self.log: list[tuple[str, str]] = []
+        self.gates: dict[str, asyncio.Event] = {}
+
+    def gate(self, name: str) -> asyncio.Event:
+        return self.gates.setdefault(name, asyncio.Event())
+
+    async def __call__(self, event, data):
+        self.log.append(("start", event))
+        await self.gate(event).wait()
+        self.log.append(("end", event))
+        return event
+
+
+def chat(chat_id: int) -> dict:
+    return {"event_chat": SimpleNamespace(id=chat_id)}
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_one_chat_is_processed_in_order():
+    async def main():
+        mw, handler = ChatQueueMiddleware(), Handler()
+        tasks = [
+            asyncio.create_task(mw(handler, name, chat(1))) for name in "abc"
+        ]
+        await settle()
+        assert handler.log == [("start", "a")]
+        for name in "abc":
+            handler.gate(name).set()
+        assert await asyncio.gather(*tasks) == ["a", "b", "c"]
+        assert handler.log == [
+            ("start", "a"), ("end", "a"),
+            ("start", "b"), ("end", "b"),
+            ("start", "c"), ("end", "c"),
+        ]
+        assert (mw.processed, mw.waited, mw.depth_max) == (3, 2, 3)
+        assert not mw._pending and not mw._locks
+
+    asyncio.run(main())
+
+
+def test_chats_run_in_parallel_up_to_the_limit():
+    async def main():
+        mw, handler = ChatQueueMiddleware(max_parallel=2), Handler()
+        tasks = [
+            asyncio.create_task(mw(handler, name, chat(i)))
+            for i, name in enumerate("abc")
+        ]
+        await settle()
+        assert handler.log == [("start", "a"), ("start", "b")]
+        handler.gate("a").set()
+        await settle()
+        assert ("start", "c") in handler.log
+        handler.gate("b").set()
+        handler.gate("c").set()
+        assert await asyncio.gather(*tasks) == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+def test_overflow_is_dropped():
+    async def main():
+        mw, handler = ChatQueueMiddleware(max_pending=2), Handler()
+        tasks = [
+            asyncio.create_task(mw(handler, name, chat(1))) for name in "abc"
+        ]
+        await settle()
+        # третий апдейт не встаёт в очередь чата
+        assert tasks[2].done() and tasks[2].result() is None
+        assert mw.dropped == 1
+        # очередь другого чата не затронута
+        other = asyncio.create_task(mw(handler, "d", chat(2)))
+        for name in "abd":
+            handler.gate(name).set()
+        assert await asyncio.gather(*tasks[:2], other) == ["a", "b", "d"]
+        assert ("start", "c") not in handler.log
+        assert not mw._pending and not mw._locks
+
+    asyncio.run(main())
+
+
+def test_updates_without_chat_bypass_the_queue():
+    async def main():
+        mw, handler = ChatQueueMiddleware(max_pending=1), Handler()
+        tasks = [asyncio.create_task(mw(handler, name, {})) for name in "ab"]
+        await settle()
+        assert handler.log == [("start", "a"), ("start", "b")]
+        for name in "ab":
+            handler.gate(name).set()
+        assert await asyncio.gather(*tasks) == ["a", "b"]
+        assert mw.dropped == 0
+
+    asyncio.run(main())
+
+
+def test_private_chat_falls_back_to_the_user():
+    async def main():
+        mw, handler = ChatQueueMiddleware(max_pending=1), Handler()
+        data = {"event_from_user": SimpleNamespace(id=7)}
+        first = asyncio.create_task(mw(handler, "a", data))
+        await settle()
+        assert await mw(handler, "b", dict(data)) is None
+        handler.gate("a").set()
+        assert await first == "a"
+
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Routing of `replica=True` reads, with two SQLite engines standing in for
+the primary and the replica."""
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+from sqlalchemy import create_engine, literal, select  # noqa: E402
+
+from app.cache import DATA_CHANGED  # noqa: E402
+from app.db import (  # noqa: E402
+    REPLICA,
+    REPLICA_ROUTED,
+    RoutingSession,
+    replica_routing,
+)
+from app.tenancy import TENANT  # noqa: E402
+
+REPORT = select(literal(1)).execution_options(replica=True)
+PLAIN = select(literal(1))
+
+
+@pytest.fixture
+def engines():
+    primary, replica = create_engine("sqlite://"), create_engine("sqlite://")
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_routing(monkeypatch):
+    monkeypatch.setattr(replica_routing, "_written", {})
+    monkeypatch.setattr(replica_routing, "window", 5.0)
+
+
+def session(engines, tenant_id=1):
+    primary, replica = engines
+    return RoutingSession(bind=primary, info={REPLICA: replica, TENANT: tenant_id})
+
+
+def test_marked_reads_go_to_replica(engines):
+    s = session(engines)
+    assert s.get_bind(clause=REPORT) is engines[1]
+    assert s.get_bind(clause=PLAIN) is engines[0]
+
+
+def test_no_replica_configured(engines):
+    s = RoutingSession(bind=engines[0])
+    assert s.get_bind(clause=REPORT) is engines[0]
+
+
+def test_uncommitted_write_reads_primary(engines):
+    s = session(engines)
+    s.info[DATA_CHANGED] = True
+    assert s.get_bind(clause=REPORT) is engines[0]
+
+
+def test_recent_write_keeps_only_its_tenant_on_primary(engines):
+    replica_routing.note_write(1)
+    assert session(engines, 1).get_bind(clause=REPORT) is engines[0]
+    assert session(engines, 2).get_bind(clause=REPORT) is engines[1]
+
+
+def test_write_window_expires(engines):
+    replica_routing.window = 0.0
+    replica_routing.note_write(1)
+    assert session(engines, 1).get_bind(clause=REPORT) is engines[1]
+
+
+def test_mixed_routing_is_recorded(engines):
+    s = session(engines)
+    s.get_bind(clause=REPORT)
+    assert s.info[REPLICA_ROUTED] == {True}
+    replica_routing.note_write(1)
+    s.get_bind(clause=REPORT)
+    assert s.info[REPLICA_ROUTED] == {True, False}
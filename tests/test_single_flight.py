@@ -0,0 +1,122 @@
+"""SingleFlight.do: concurrent identical reads share one query."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.cache import DATA_CHANGED, SingleFlight  # noqa: E402
+from app.tenancy import TENANT  # noqa: E402
+
+
+class Loader:
+    """Counts calls; every call waits for `release` and returns `value`."""
+
+    def __init__(self, value=42, error: Exception | None = None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def session(tenant_id=1, **info):
+    return SimpleNamespace(info={TENANT: tenant_id, **info})
+
+
+def test_concurrent_callers_share_one_call():
+    async def main():
+        flight, load = SingleFlight("t"), Loader()
+        tasks = [
+            asyncio.create_task(flight.do("k", session(), load)) for _ in range(10)
+        ]
+        await asyncio.sleep(0)
+        load.release.set()
+        assert await asyncio.gather(*tasks) == [42] * 10
+        assert load.calls == 1
+        assert (flight.leaders, flight.followers) == (1, 9)
+        assert not flight._inflight
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def main():
+        flight, load = SingleFlight("t"), Loader()
+        leader = asyncio.create_task(flight.do("k", session(), load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", session(), load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        load.release.set()
+        assert await follower == 42
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert load.calls == 1
+        assert not flight._inflight
+
+    asyncio.run(main())
+
+
+def test_cancelled_lone_leader_cancels_the_query():
+    async def main():
+        flight, load = SingleFlight("t"), Loader()
+        leader = asyncio.create_task(flight.do("k", session(), load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert not flight._inflight
+        # следующий вызов выполняет запрос заново
+        load.release.set()
+        assert await flight.do("k", session(), load) == 42
+        assert load.calls == 2
+
+    asyncio.run(main())
+
+
+def test_error_reaches_every_caller_and_releases_the_key():
+    async def main():
+        flight, load = SingleFlight("t"), Loader(error=ValueError("boom"))
+        tasks = [
+            asyncio.create_task(flight.do("k", session(), load)) for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        load.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError] * 3
+        assert load.calls == 1
+        assert not flight._inflight
+
+        load.error = None
+        assert await flight.do("k", session(), load) == 42
+        assert load.calls == 2
+
+    asyncio.run(main())
+
+
+def test_tenants_and_uncommitted_writes_are_not_shared():
+    async def main():
+        flight, load = SingleFlight("t"), Loader()
+        tasks = [
+            asyncio.create_task(flight.do("k", session(1), load)),
+            asyncio.create_task(flight.do("k", session(2), load)),
+            asyncio.create_task(
+                flight.do("k", session(1, **{DATA_CHANGED: True}), load)
+            ),
+        ]
+        await asyncio.sleep(0)
+        load.release.set()
+        assert await asyncio.gather(*tasks) == [42] * 3
+        assert load.calls == 3
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""/stats: process-wide counters only for the bot owner (`process_owner_id`)."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+from app.handlers.admin import runtime_stats  # noqa: E402
+from app.models import UserRole  # noqa: E402
+
+BOT_OWNER = 1000
+
+
+class FakeMessage:
+    def __init__(self, tg_id: int):
+        self.from_user = SimpleNamespace(id=tg_id)
+        self.answers: list[str] = []
+
+    async def answer(self, text: str, **kwargs):
+        self.answers.append(text)
+
+
+class FakeQueue:
+    def stats(self) -> str:
+        return "Очередь чатов: ..."
+
+
+def user(tg_id: int, role=UserRole.owner):
+    return SimpleNamespace(
+        id=tg_id, telegram_id=tg_id, tenant_id=1, is_active=True, role=role
+    )
+
+
+def stats(tg_id: int, role=UserRole.owner, process_owner_id=BOT_OWNER) -> str:
+    message = FakeMessage(tg_id)
+    asyncio.run(
+        runtime_stats(
+            message,
+            user(tg_id, role),
+            chat_queue=FakeQueue(),
+            process_owner_id=process_owner_id,
+        )
+    )
+    (text,) = message.answers
+    return text
+
+
+def test_bot_owner_sees_process_counters():
+    text = stats(BOT_OWNER)
+    assert text.startswith("📈 Статистика процесса")
+    assert "Очередь чатов" in text
+    assert "Single-flight" in text
+
+
+def test_garage_owner_sees_only_own_garage():
+    text = stats(2000)
+    assert text.startswith("📈 Статистика гаража")
+    assert "Очередь чатов" not in text
+    assert "Single-flight" not in text
+
+
+def test_unknown_bot_owner_hides_process_counters():
+    assert stats(BOT_OWNER, process_owner_id=None).startswith(
+        "📈 Статистика гаража"
+    )
+
+
+def test_non_owner_is_denied():
+    assert stats(BOT_OWNER, role=UserRole.worker).startswith("⛔")
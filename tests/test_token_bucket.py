@@ -0,0 +1,64 @@
+"""TokenBucket of the outbox rate limiter, on a fake clock."""
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from app.services import outbox  # noqa: E402
+from app.services.outbox import TokenBucket  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outbox, "time", clock)
+    return clock
+
+
+def test_burst_up_to_capacity_then_wait(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+
+
+def test_refills_at_rate_and_caps_at_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    for _ in range(3):
+        bucket.take()
+    clock.now += 0.5
+    assert bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(0.5)
+
+    clock.now += 60
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() > 0
+
+
+def test_waiting_does_not_consume(clock):
+    bucket = TokenBucket(rate=1.0, capacity=1)
+    bucket.take()
+    clock.now += 0.25
+    assert bucket.take() == pytest.approx(0.75)
+    assert bucket.take() == pytest.approx(0.75)
+    clock.now += 0.75
+    assert bucket.take() == 0.0
+
+
+def test_pause_blocks_until_it_ends(clock):
+    bucket = TokenBucket(rate=10.0, capacity=5)
+    bucket.pause(3)
+    assert bucket.take() == pytest.approx(3)
+    clock.now += 1
+    # более короткая пауза не сокращает текущую
+    bucket.pause(1)
+    assert bucket.take() == pytest.approx(2)
+    clock.now += 2
+    assert bucket.take() == 0.0